@@ -0,0 +1,573 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+End-to-end DHCP load benchmark: leases per second through dnsmasq, the
+dhcp_leases script and the DHCP lease DB.
+
+A veth pair joins two network namespaces. dnsmasq runs in the server
+namespace with the arguments ops_dhcp_tftp renders, for the tables of
+--snapshot if given, plus a DHCP range on the veth subnet, bound to the
+veth. In the client namespace, a DHCP client simulator runs DISCOVER,
+OFFER, REQUEST, ACK (DORA) flows for random locally administered MAC
+addresses, --concurrency of them at a time, over one UDP socket bound
+to the veth. The clients ask for broadcast replies, so they need no
+address and no raw socket.
+
+It prints the DORA latency percentiles, the leases per second, and the
+lag from the ACK until the lease is in the DHCP_Lease table, watched
+with an OVSDB monitor. The leases of the run are deleted from the lease
+DB afterwards unless --keep-leases.
+
+Needs root, iproute2, a dnsmasq executable (--dnsmasq, a locally built
+one works) and the ovsdb-server of the DHCP lease DB the dhcp_leases
+script writes to.
+
+Usage: bench_dhcp_dora.py [--clients N] [--concurrency C] [--dnsmasq PATH]
+                          [--snapshot FILE] [--subnet NET/LEN] [--no-ping]
+'''
+
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import heapq
+import os
+import random
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import ovs.db.error  # noqa
+import ovs.db.idl  # noqa
+import ovs.jsonrpc  # noqa
+import ovs.poller  # noqa
+import ovs.stream  # noqa
+import idl_snapshot  # noqa
+import dnsmasq_render  # noqa
+import dnsmasq_supervisor  # noqa
+import dhcp_lease_db  # noqa
+
+SERVER_NS = "dora-server"
+CLIENT_NS = "dora-client"
+SERVER_VETH = "dora-s"
+CLIENT_VETH = "dora-c"
+
+CLONE_NEWNET = 0x40000000
+SO_BINDTODEVICE = getattr(socket, "SO_BINDTODEVICE", 25)
+
+# BOOTP header up to the magic cookie, RFC 2131
+BOOTP_FORMAT = "!BBBBIHH4s4s4s4s16s64s128s"
+BOOTP_SIZE = 300
+BOOTREQUEST = 1
+BOOTREPLY = 2
+BROADCAST_FLAG = 0x8000
+MAGIC_COOKIE = "\x63\x82\x53\x63"
+ANY = "\0\0\0\0"
+
+# DHCP options and message types
+OPTION_PAD = 0
+OPTION_REQUESTED_ADDRESS = 50
+OPTION_MESSAGE_TYPE = 53
+OPTION_SERVER_ID = 54
+OPTION_PARAMETERS = 55
+OPTION_END = 255
+DHCPDISCOVER = 1
+DHCPOFFER = 2
+DHCPREQUEST = 3
+DHCPACK = 5
+DHCPNAK = 6
+
+# Subnet mask, router, DNS servers and lease time
+PARAMETERS = "\x01\x03\x06\x33"
+
+DISCOVERING = 0
+REQUESTING = 1
+
+
+def ip(*argv):
+    subprocess.check_call(["ip"] + list(argv))
+
+
+def setup_namespaces(server_address, prefix):
+    ip("netns", "add", SERVER_NS)
+    ip("netns", "add", CLIENT_NS)
+    ip("link", "add", SERVER_VETH, "type", "veth", "peer", "name",
+       CLIENT_VETH)
+    ip("link", "set", SERVER_VETH, "netns", SERVER_NS)
+    ip("link", "set", CLIENT_VETH, "netns", CLIENT_NS)
+    ip("-n", SERVER_NS, "addr", "add", "%s/%d" % (server_address, prefix),
+       "dev", SERVER_VETH)
+    ip("-n", SERVER_NS, "link", "set", SERVER_VETH, "up")
+    ip("-n", CLIENT_NS, "link", "set", CLIENT_VETH, "up")
+
+
+def teardown_namespaces():
+    # The veth pair goes with the namespaces
+    with open(os.devnull, "w") as devnull:
+        for netns in (SERVER_NS, CLIENT_NS):
+            subprocess.call(["ip", "netns", "del", netns], stderr=devnull)
+
+
+def client_socket():
+    '''
+    UDP socket of the DHCP client port, bound to the client veth of the
+    client namespace.
+    '''
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",
+                       use_errno=True)
+    with open("/proc/self/ns/net") as own:
+        with open("/var/run/netns/" + CLIENT_NS) as netns:
+            if libc.setns(netns.fileno(), CLONE_NEWNET) != 0:
+                code = ctypes.get_errno()
+                raise OSError(code, os.strerror(code))
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+            sock.setsockopt(socket.SOL_SOCKET, SO_BINDTODEVICE,
+                            CLIENT_VETH + "\0")
+            sock.bind(("0.0.0.0", 68))
+        finally:
+            libc.setns(own.fileno(), CLONE_NEWNET)
+
+    sock.setblocking(False)
+    return sock
+
+
+def dhcp_request(message_type, xid, mac, options=""):
+    '''
+    DHCP request of a client asking for broadcast replies.
+    '''
+    packet = struct.pack(BOOTP_FORMAT, BOOTREQUEST, 1, 6, 0, xid, 0,
+                         BROADCAST_FLAG, ANY, ANY, ANY, ANY, mac, "", "")
+    packet += MAGIC_COOKIE
+    packet += chr(OPTION_MESSAGE_TYPE) + "\x01" + chr(message_type)
+    packet += options
+    packet += chr(OPTION_PARAMETERS) + chr(len(PARAMETERS)) + PARAMETERS
+    packet += chr(OPTION_END)
+    return packet.ljust(BOOTP_SIZE, "\0")
+
+
+def dhcp_reply(packet):
+    '''
+    Transaction ID, offered address and options of a DHCP reply, or None.
+    '''
+    if len(packet) < 240 or ord(packet[0]) != BOOTREPLY or \
+       packet[236:240] != MAGIC_COOKIE:
+        return None
+
+    options = {}
+    i = 240
+    while i < len(packet):
+        code = ord(packet[i])
+        if code == OPTION_END:
+            break
+        if code == OPTION_PAD:
+            i += 1
+            continue
+        length = ord(packet[i + 1])
+        options[code] = packet[i + 2:i + 2 + length]
+        i += 2 + length
+
+    return struct.unpack("!I", packet[4:8])[0], packet[16:20], options
+
+
+def mac_string(mac):
+    return ":".join("%02x" % (ord(c)) for c in mac[:6])
+
+
+class Flow(object):
+    __slots__ = ("mac", "state", "start", "packet", "sends", "tries")
+
+    def __init__(self, mac, packet):
+        self.mac = mac
+        self.state = DISCOVERING
+        self.start = time.time()
+        self.packet = packet
+        # Sends of the flow, and sends of its current request
+        self.sends = 0
+        self.tries = 0
+
+
+class DoraClients(object):
+    '''
+    DHCP client simulator. The flows are told apart by their transaction
+    ID, and a request without a reply is sent again after timeout
+    seconds, up to retries times.
+    '''
+    def __init__(self, sock, clients, concurrency, timeout, retries):
+        self.sock = sock
+        self.clients = clients
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.flows = {}
+        self.deadlines = []
+        self.started = 0
+        self.latencies = []
+        # ACK time by MAC address string
+        self.acks = {}
+        self.naks = 0
+        self.timeouts = 0
+
+    def done(self):
+        return self.started == self.clients and not self.flows
+
+    def send(self, xid, flow):
+        try:
+            self.sock.sendto(flow.packet, ("255.255.255.255", 67))
+        except socket.error as e:
+            if e.errno not in (errno.EAGAIN, errno.ENOBUFS):
+                raise
+        flow.sends += 1
+        flow.tries += 1
+        heapq.heappush(self.deadlines,
+                       (time.time() + self.timeout, xid, flow.sends))
+
+    def start_flows(self):
+        while self.started < self.clients and \
+                len(self.flows) < self.concurrency:
+            xid = random.getrandbits(32)
+            if xid in self.flows:
+                continue
+            # Locally administered unicast addresses
+            mac = "\x02" + os.urandom(5)
+            flow = Flow(mac, dhcp_request(DHCPDISCOVER, xid, mac))
+            self.flows[xid] = flow
+            self.started += 1
+            self.send(xid, flow)
+
+    def receive(self):
+        while True:
+            try:
+                packet = self.sock.recv(2048)
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EINTR):
+                    return
+                raise
+
+            reply = dhcp_reply(packet)
+            if reply is None:
+                continue
+            xid, address, options = reply
+            flow = self.flows.get(xid)
+            message_type = options.get(OPTION_MESSAGE_TYPE)
+            if flow is None or message_type is None:
+                continue
+
+            message_type = ord(message_type)
+            if message_type == DHCPOFFER and flow.state == DISCOVERING:
+                server = options.get(OPTION_SERVER_ID, "")
+                flow.state = REQUESTING
+                flow.packet = dhcp_request(
+                    DHCPREQUEST, xid, flow.mac,
+                    chr(OPTION_REQUESTED_ADDRESS) + "\x04" + address +
+                    chr(OPTION_SERVER_ID) + chr(len(server)) + server)
+                flow.tries = 0
+                self.send(xid, flow)
+            elif message_type == DHCPACK and flow.state == REQUESTING:
+                now = time.time()
+                self.latencies.append(now - flow.start)
+                self.acks[mac_string(flow.mac)] = now
+                del self.flows[xid]
+            elif message_type == DHCPNAK:
+                self.naks += 1
+                del self.flows[xid]
+
+    def expire(self):
+        now = time.time()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, xid, sends = heapq.heappop(self.deadlines)
+            flow = self.flows.get(xid)
+            # Only the deadline of the last send of a flow counts
+            if flow is None or flow.sends != sends:
+                continue
+            if flow.tries > self.retries:
+                self.timeouts += 1
+                del self.flows[xid]
+            else:
+                self.send(xid, flow)
+
+    def wait(self, poller):
+        if self.started < self.clients and \
+                len(self.flows) < self.concurrency:
+            poller.immediate_wake()
+        poller.fd_wait(self.sock.fileno(), ovs.poller.POLLIN)
+        if self.deadlines:
+            poller.timer_wait(max(0, int((self.deadlines[0][0] -
+                                          time.time()) * 1000)))
+
+
+class LeaseMonitor(object):
+    '''
+    Time at which every MAC address is first seen in the DHCP_Lease
+    table, from the updates of an OVSDB monitor. The leases already in
+    the table when the monitor starts are ignored.
+    '''
+    def __init__(self, remote):
+        error, stream = ovs.stream.Stream.open_block(
+            ovs.stream.Stream.open(remote))
+        if error:
+            raise ovs.db.error.Error("cannot connect to %s: %s"
+                                     % (remote, os.strerror(error)))
+        self.rpc = ovs.jsonrpc.Connection(stream)
+        database = dhcp_lease_db.get_schema_json()["name"]
+        self.rpc.send(ovs.jsonrpc.Message.create_request(
+            "monitor", [database, None,
+                        {dhcp_lease_db.DHCP_LEASES_TABLE:
+                         {"columns": [dhcp_lease_db.MAC_ADDR]}}]))
+        self.seen = {}
+
+    def run(self):
+        self.rpc.run()
+        while True:
+            error, msg = self.rpc.recv()
+            if error or msg is None:
+                return
+
+            if msg.type == ovs.jsonrpc.Message.T_NOTIFY and \
+               msg.method == "update":
+                now = time.time()
+                updates = msg.params[1].get(
+                    dhcp_lease_db.DHCP_LEASES_TABLE, {})
+                for row in updates.itervalues():
+                    new = row.get("new")
+                    if new is not None and not row.get("old"):
+                        mac = str(new.get(dhcp_lease_db.MAC_ADDR))
+                        self.seen.setdefault(mac, now)
+
+    def wait(self, poller):
+        self.rpc.wait(poller)
+        self.rpc.recv_wait(poller)
+
+    def close(self):
+        self.rpc.close()
+
+
+def delete_leases(remote, macs):
+    '''
+    Deletes the leases of the run from the lease DB, in one transaction.
+    '''
+    lease_db = dhcp_lease_db.DHCPLeaseDB(remote=remote)
+    txn = ovs.db.idl.Transaction(lease_db.idl)
+    for row in lease_db.idl.tables[
+            dhcp_lease_db.DHCP_LEASES_TABLE].rows.values():
+        if row.mac_address in macs:
+            row.delete()
+    status = txn.commit_block()
+    lease_db.close()
+    return status
+
+
+def percentiles(values):
+    '''
+    Median, 90th, 99th percentile and maximum of seconds, in milliseconds.
+    '''
+    if not values:
+        return "none"
+    values = sorted(values)
+    last = len(values) - 1
+    return "p50 %.1f, p90 %.1f, p99 %.1f, max %.1f" % tuple(
+        values[last * p // 100] * 1000 for p in (50, 90, 99, 100))
+
+
+def address_int(address):
+    return struct.unpack("!I", socket.inet_aton(address))[0]
+
+
+def int_address(value):
+    return socket.inet_ntoa(struct.pack("!I", value))
+
+
+def dnsmasq_config(args, tmp_dir, network, prefix):
+    '''
+    Rendered dnsmasq config of the snapshot tables plus a DHCP range on
+    the veth subnet, bound to the server veth.
+    '''
+    if args.snapshot is not None:
+        with open(args.snapshot) as f:
+            tables = idl_snapshot.load(f)
+    else:
+        tables = idl_snapshot.empty_tables()
+
+    size = 1 << (32 - prefix)
+    tables["DHCPSrv_Range"].rows["dora"] = idl_snapshot.Row(
+        "DHCPSrv_Range", "dora",
+        start_ip_address=int_address(network + 10),
+        end_ip_address=[int_address(network + size - 2)],
+        netmask=[int_address(0xffffffff << (32 - prefix) & 0xffffffff)],
+        lease_duration=[args.lease_minutes])
+    other_config = {"lease_max": str(size)}
+    if args.no_ping:
+        other_config["no_ping"] = "true"
+    tables["DHCP_Server"].rows["dora"] = idl_snapshot.Row(
+        "DHCP_Server", "dora", other_config=other_config)
+
+    command = [args.dnsmasq]
+    for argument in dnsmasq_render.DNSMASQ_COMMAND[1:]:
+        if argument.startswith("--dhcp-script="):
+            argument = "--dhcp-script=" + args.lease_script
+        command.append(argument)
+    log = ["--log-facility=" + os.path.join(tmp_dir, "dnsmasq.log")]
+
+    config, _ = dnsmasq_render.render(tables, command, log, 1)
+    return config.replace(
+        interfaces=["--bind-interfaces", "--interface=" + SERVER_VETH,
+                    "--pid-file=" + os.path.join(tmp_dir, "dnsmasq.pid")])
+
+
+def start_dnsmasq(config):
+    '''
+    Starts dnsmasq in the server namespace and waits until it has its
+    DHCP socket.
+    '''
+    # ip netns exec executes dnsmasq in place, the PID is the dnsmasq one
+    with open(os.devnull, "w") as devnull:
+        process = subprocess.Popen(["ip", "netns", "exec", SERVER_NS] +
+                                   config.argv(), stdout=devnull,
+                                   close_fds=True,
+                                   env=dnsmasq_supervisor.CHILD_ENV)
+
+    deadline = time.time() + dnsmasq_supervisor.READY_TIMEOUT
+    while process.poll() is None and time.time() < deadline:
+        if dnsmasq_supervisor.is_ready(process.pid):
+            return process
+        time.sleep(0.05)
+
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+    raise RuntimeError("dnsmasq not ready, command %s" % (config))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=5000,
+                        help="DORA flows, each for a new MAC address.")
+    parser.add_argument("--concurrency", type=int, default=500,
+                        help="Flows in progress at a time.")
+    parser.add_argument("--timeout", type=float, default=2.0,
+                        help="Seconds before a request is sent again.")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--dnsmasq", default="/usr/bin/dnsmasq",
+                        help="dnsmasq executable.")
+    parser.add_argument("--lease-script", default="/usr/bin/dhcp_leases",
+                        help="--dhcp-script of dnsmasq.")
+    parser.add_argument("--snapshot", metavar="FILE",
+                        help="Tables to render the rest of the dnsmasq "
+                             "config from, as ops_dhcp_tftp render takes.")
+    parser.add_argument("--subnet", default="10.254.0.0/16",
+                        help="Subnet of the veth pair and of the range.")
+    parser.add_argument("--lease-minutes", type=int, default=60)
+    parser.add_argument("--no-ping", action="store_true",
+                        help="Offer addresses without an ICMP check.")
+    parser.add_argument("-d", "--database", default=dhcp_lease_db.def_db,
+                        help="ovsdb-server of the DHCP lease DB.")
+    parser.add_argument("--no-lease-db", action="store_true",
+                        help="Do not watch the DHCP lease DB.")
+    parser.add_argument("--lease-wait", type=float, default=30.0,
+                        help="Seconds to wait for the last leases in the "
+                             "DHCP lease DB.")
+    parser.add_argument("--keep-leases", action="store_true",
+                        help="Leave the leases of the run in the lease DB.")
+    args = parser.parse_args()
+
+    subnet, prefix = args.subnet.split("/")
+    prefix = int(prefix)
+    network = address_int(subnet) & (0xffffffff << (32 - prefix))
+    if (1 << (32 - prefix)) - 12 < args.clients:
+        parser.error("subnet %s too small for %d clients"
+                     % (args.subnet, args.clients))
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_dhcp_dora.")
+    config = dnsmasq_config(args, tmp_dir, network, prefix)
+    monitor = None
+    dnsmasq = None
+    clients = None
+    teardown_namespaces()
+    try:
+        setup_namespaces(int_address(network + 1), prefix)
+        if not args.no_lease_db:
+            monitor = LeaseMonitor(args.database)
+        dnsmasq = start_dnsmasq(config)
+
+        clients = DoraClients(client_socket(), args.clients,
+                              args.concurrency, args.timeout, args.retries)
+        start = time.time()
+        while not clients.done():
+            clients.receive()
+            clients.expire()
+            clients.start_flows()
+            if monitor is not None:
+                monitor.run()
+
+            poller = ovs.poller.Poller()
+            clients.wait(poller)
+            if monitor is not None:
+                monitor.wait(poller)
+            if not clients.done():
+                poller.block()
+        elapsed = time.time() - start
+
+        # The dhcp_leases script runs after the ACK, wait for the leases
+        lease_deadline = time.time() + args.lease_wait
+        while monitor is not None and time.time() < lease_deadline and \
+                not set(clients.acks).issubset(monitor.seen):
+            monitor.run()
+            poller = ovs.poller.Poller()
+            monitor.wait(poller)
+            poller.timer_wait(100)
+            poller.block()
+    finally:
+        if dnsmasq is not None and dnsmasq.poll() is None:
+            dnsmasq.kill()
+            dnsmasq.wait()
+        teardown_namespaces()
+        shutil.rmtree(tmp_dir)
+
+    print("clients: %d, concurrency: %d, acked: %d, naks: %d, "
+          "timeouts: %d" % (args.clients, args.concurrency,
+                            len(clients.acks), clients.naks,
+                            clients.timeouts))
+    print("throughput: %.1f leases/s over %.2f s"
+          % (len(clients.acks) / elapsed, elapsed))
+    print("DORA latency ms: %s" % (percentiles(clients.latencies)))
+
+    if monitor is not None:
+        lags = [monitor.seen[mac] - acked
+                for mac, acked in clients.acks.iteritems()
+                if mac in monitor.seen]
+        print("lease DB lag ms: %s" % (percentiles(lags)))
+        print("lease DB rows: %d of %d acked"
+              % (len(lags), len(clients.acks)))
+        monitor.close()
+        if not args.keep_leases and clients.acks:
+            delete_leases(args.database, set(clients.acks))
+
+    return 0 if clients.acks else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
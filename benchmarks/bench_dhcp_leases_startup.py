@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+Startup regression benchmark for the dhcp_leases script.
+
+dnsmasq runs dhcp_leases serially for every lease event. This benchmark
+runs the no-op "tftp" command in a fresh interpreter, lists the modules it
+imports on top of the bare interpreter and measures the wall time against
+a bare interpreter run. It exits non-zero when a heavy module is imported
+or when the median startup overhead exceeds the bound.
+
+Usage: bench_dhcp_leases_startup.py [--runs N] [--max-overhead-ms MS]
+'''
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules a trivial command must never load
+HEAVY_MODULES = ("ovs", "argparse", "json", "subprocess", "mmap",
+                 "dhcp_lease_db", "dhcp_lease_stats",
+                 "dhcp_lease_analytics", "numpy")
+
+BARE = "import sys; print('\\n'.join(sorted(sys.modules)))"
+
+COMMAND = ("import sys; sys.path.insert(0, %r); import dhcp_leases; "
+           "dhcp_leases.main(['dhcp_leases', %r]); "
+           "print('\\n'.join(sorted(sys.modules)))")
+
+
+def run(code):
+    start = time.time()
+    out = subprocess.check_output([sys.executable, "-S", "-c", code])
+    return time.time() - start, set(out.decode().split())
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--command", default="tftp")
+    parser.add_argument("--max-overhead-ms", type=float, default=15.0,
+                        help="Allowed median startup time on top of a "
+                             "bare interpreter.")
+    args = parser.parse_args()
+
+    code = COMMAND % (REPO, args.command)
+    bare_times, bare_modules = [], set()
+    cmd_times, cmd_modules = [], set()
+    for _ in range(args.runs):
+        elapsed, bare_modules = run(BARE)
+        bare_times.append(elapsed)
+        elapsed, cmd_modules = run(code)
+        cmd_times.append(elapsed)
+
+    extra = sorted(cmd_modules - bare_modules)
+    heavy = [m for m in extra if m.split(".")[0] in HEAVY_MODULES]
+    overhead = (median(cmd_times) - median(bare_times)) * 1000
+
+    print("bare interpreter   : %.1f ms" % (median(bare_times) * 1000))
+    print("dhcp_leases %-6s : %.1f ms" % (args.command,
+                                         median(cmd_times) * 1000))
+    print("overhead           : %.1f ms (bound %.1f ms)"
+          % (overhead, args.max_overhead_ms))
+    print("extra modules (%d) : %s" % (len(extra), " ".join(extra)))
+
+    failed = False
+    if heavy:
+        print("FAIL: heavy modules imported: %s" % " ".join(heavy))
+        failed = True
+    if overhead > args.max_overhead_ms:
+        print("FAIL: startup overhead above bound")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
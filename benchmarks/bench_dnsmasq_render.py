@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+Render time of the dnsmasq command line.
+
+Synthetic DHCPSrv_Range, DHCPSrv_Static_Host, DHCPSrv_Option and
+DHCPSrv_Match rows are rendered into the dnsmasq argv, and the best time
+of the repeats is printed in milliseconds. The rows are spread 20%
+ranges, 60% static hosts, 15% options and 5% matches. With --debug the
+render debug logs are enabled and written to /dev/null.
+
+Usage: bench_dnsmasq_render.py [--rows N] [--repeat R] [--debug]
+'''
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import ovs.vlog  # noqa
+import dnsmasq_render  # noqa
+import idl_snapshot  # noqa
+
+
+def tables(count):
+    return idl_snapshot.synthetic(hosts=count * 60 // 100,
+                                  ranges=count * 20 // 100,
+                                  options=count * 15 // 100,
+                                  matches=count * 5 // 100)
+
+
+def render(idl_tables):
+    config, _ = dnsmasq_render.render(idl_tables, ["/usr/bin/dnsmasq"], [], 1)
+    return config.argv()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--debug", action="store_true",
+                        help="Enable the render debug logs.")
+    args = parser.parse_args()
+
+    if args.debug:
+        ovs.vlog.Vlog.init(os.devnull)
+        ovs.vlog.Vlog.set_level("dnsmasq_render", "file", "dbg")
+
+    idl_tables = tables(args.rows)
+    times = []
+    for _ in range(args.repeat):
+        start = time.time()
+        argv = render(idl_tables)
+        times.append((time.time() - start) * 1000)
+
+    print("rows: %d, arguments: %d, debug logs: %s"
+          % (args.rows, len(argv), "on" if args.debug else "off"))
+    print("render: %.1f ms" % (min(times)))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
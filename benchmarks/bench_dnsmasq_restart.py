@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+Restart path benchmark of the DHCP-TFTP daemon.
+
+The main loop of ops_dhcp_tftp is driven against an in-memory IDL
+holding a synthetic config, with fake_dnsmasq.py executed in place of
+dnsmasq. After the first start, every scenario scripts OVSDB changes:
+
+  single-host   one static host edited
+  burst         --burst static hosts edited --interval apart
+  system-churn  --burst changes to a System:other_config key that
+                dnsmasq does not use
+
+For every scenario it prints the dnsmasq restarts the daemon issued,
+the dnsmasq checks (--test) and starts it ran, the outage, from the kill
+of a running dnsmasq until its replacement is ready, and the CPU time
+of the daemon and of its children.
+
+The daemon modules are imported as they are on the switch image, so
+ovs, ops_eventlog and ops_diagdump must be importable. The PID and state
+files of dnsmasq go to a temporary directory.
+
+Usage: bench_dnsmasq_restart.py [--hosts N] [--delay SECS] [--burst N]
+                                [--interval MS] [--lease-script PATH]
+'''
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+import ovs.poller  # noqa
+import idl_snapshot  # noqa
+import dnsmasq_render  # noqa
+import dnsmasq_supervisor  # noqa
+import ops_dhcp_tftp  # noqa
+
+FAKE_DNSMASQ = os.path.join(BENCHMARKS, "fake_dnsmasq.py")
+
+SYSTEM_TABLE = "System"
+HOST_TABLE = "DHCPSrv_Static_Host"
+
+
+def free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def watch_shards(kills, starts):
+    '''
+    Has the dnsmasq shards note when they kill a running dnsmasq, in
+    kills, and the shard of every dnsmasq they start, in starts.
+    '''
+    shard_class = dnsmasq_supervisor.DnsmasqShard
+    stop = shard_class.stop
+    start = shard_class.start
+
+    def watched_stop(shard):
+        if shard.is_running():
+            kills.append((time.time(), shard.index))
+        stop(shard)
+
+    def watched_start(shard):
+        start(shard)
+        if shard.process is not None:
+            starts[shard.process.pid] = shard.index
+
+    shard_class.stop = watched_stop
+    shard_class.start = watched_start
+
+
+def drive(idl, edits, interval):
+    '''
+    Runs the main loop of the daemon while the edits are made interval
+    seconds apart, until the daemon has applied them all and its dnsmasq
+    are ready.
+    '''
+    edits = list(edits)
+    next_edit = time.time()
+    while True:
+        now = time.time()
+        while edits and now >= next_edit:
+            table, uuid, columns = edits.pop(0)
+            idl.update(table, uuid, **columns)
+            next_edit += interval
+        if not edits and not idl.pending and \
+           ops_dhcp_tftp.seqno == idl.change_seqno and \
+           all(shard.starting is None
+               for shard in ops_dhcp_tftp.dnsmasq_shards):
+            return
+
+        poller = ovs.poller.Poller()
+        if edits:
+            poller.timer_wait(max(0, int((next_edit - now) * 1000)))
+        ops_dhcp_tftp.dhcp_tftp_run(poller)
+
+
+def outage(kills, starts, records, end):
+    '''
+    Seconds from every kill of a running dnsmasq until a dnsmasq the
+    same shard started next is ready, or until end. The kill of a dnsmasq
+    still starting is part of the outage of the kill before it.
+    '''
+    ready = sorted((record["time"], starts[record["pid"]])
+                   for record in records
+                   if record["event"] == "ready" and record["pid"] in starts)
+    total = 0.0
+    down_until = {}
+    for killed, index in sorted(kills):
+        if killed < down_until.get(index, 0.0):
+            continue
+        up = [t for t, shard in ready if shard == index and t >= killed]
+        down_until[index] = up[0] if up else end
+        total += down_until[index] - killed
+    return total
+
+
+def measure(name, edits, run, record_path, kills, starts):
+    '''
+    Runs a scenario and prints its restarts, outage and CPU time.
+    '''
+    kill_count = len(kills)
+    restarts = sum(shard.stats["restarts"]
+                   for shard in ops_dhcp_tftp.dnsmasq_shards)
+    offset = os.path.getsize(record_path)
+    times = os.times()
+    start = time.time()
+
+    run()
+
+    end = time.time()
+    cpu = [after - before for after, before in zip(os.times(), times)]
+    restarts = sum(shard.stats["restarts"]
+                   for shard in ops_dhcp_tftp.dnsmasq_shards) - restarts
+    with open(record_path) as f:
+        f.seek(offset)
+        records = [json.loads(line) for line in f]
+    events = [record["event"] for record in records]
+
+    print("%-13s %5d %8d %6d %6d %10.1f %10.1f %10.1f %10.1f"
+          % (name, edits, restarts, events.count("test"),
+             events.count("start"),
+             outage(kills[kill_count:], starts, records, end) * 1000,
+             (end - start) * 1000, (cpu[0] + cpu[1]) * 1000,
+             (cpu[2] + cpu[3]) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=1000,
+                        help="Static hosts of the synthetic config.")
+    parser.add_argument("--delay", type=float, default=0.2,
+                        help="Startup delay of the fake dnsmasq, seconds.")
+    parser.add_argument("--burst", type=int, default=20,
+                        help="Edits of the burst and churn scenarios.")
+    parser.add_argument("--interval", type=float, default=5.0,
+                        help="Milliseconds between the edits of a burst.")
+    parser.add_argument("--lease-script", default="/bin/true",
+                        help="Script the fake dnsmasq runs at startup "
+                             "in place of dhcp_leases.")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_dnsmasq_restart.")
+    record_path = os.path.join(tmp_dir, "dnsmasq.records")
+    open(record_path, "w").close()
+    port = free_port()
+
+    dnsmasq_supervisor.PID_FILE = os.path.join(tmp_dir, "dnsmasq.pid")
+    dnsmasq_supervisor.SHARD_PID_FILE = os.path.join(tmp_dir,
+                                                     "dnsmasq-%d.pid")
+    dnsmasq_supervisor.STATE_FILE = os.path.join(tmp_dir, "dnsmasq.state")
+    dnsmasq_supervisor.DHCP_SERVER_PORTS = (port,)
+
+    command = [sys.executable, FAKE_DNSMASQ,
+               "--fake-record=" + record_path,
+               "--fake-delay=%g" % (args.delay), "--fake-port=%d" % (port)]
+    for argument in dnsmasq_render.DNSMASQ_COMMAND[1:]:
+        if argument.startswith("--dhcp-script="):
+            argument = "--dhcp-script=" + args.lease_script
+        command.append(argument)
+    ops_dhcp_tftp.dnsmasq_default_command = command
+
+    tables = idl_snapshot.synthetic(args.hosts)
+    system = tables[SYSTEM_TABLE].rows["system"]
+    system.other_config["tftp_server_path"] = tmp_dir
+    idl = idl_snapshot.Idl(tables)
+    ops_dhcp_tftp.idl = idl
+    ops_dhcp_tftp.sigchld_init()
+
+    kills = []
+    starts = {}
+    watch_shards(kills, starts)
+
+    interval = args.interval / 1000.0
+    hosts = [(HOST_TABLE, "host%d" % i,
+              {"client_hostname": ["burst%d" % i]})
+             for i in xrange(min(args.burst, args.hosts))]
+    churn = [(SYSTEM_TABLE, "system",
+              {"other_config": dict(system.other_config,
+                                    bench_churn=str(i))})
+             for i in xrange(args.burst)]
+
+    def startup():
+        while not ops_dhcp_tftp.dnsmasq_started:
+            ops_dhcp_tftp.dnsmasq_run()
+        drive(idl, [], interval)
+
+    single = [(HOST_TABLE, "host0", {"client_hostname": ["edited"]})]
+    scenarios = [
+        ("startup", 0, startup),
+        ("single-host", 1, lambda: drive(idl, single, interval)),
+        ("burst", len(hosts), lambda: drive(idl, hosts, interval)),
+        ("system-churn", len(churn), lambda: drive(idl, churn, interval)),
+    ]
+
+    print("hosts: %d, dnsmasq startup delay: %.0f ms"
+          % (args.hosts, args.delay * 1000))
+    print("%-13s %5s %8s %6s %6s %10s %10s %10s %10s"
+          % ("scenario", "edits", "restarts", "checks", "starts",
+             "outage ms", "wall ms", "cpu ms", "child ms"))
+    try:
+        for name, edits, run in scenarios:
+            measure(name, edits, run, record_path, kills, starts)
+    finally:
+        for shard in ops_dhcp_tftp.dnsmasq_shards:
+            shard.stop()
+        shutil.rmtree(tmp_dir)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+Per-row cost of the dhcpsrv_range and dhcpsrv_static_host validators.
+
+Synthetic IPv4 and IPv6 rows are validated with the address cache cold
+(every row distinct) and warm (the same rows validated again), and the
+average time per row is printed in microseconds. The rows are then
+validated as a single bulk transaction, which adds the cross-row conflict
+checks, and the total time is printed in milliseconds.
+
+Usage: bench_opsplugins_rows.py [--rows N] [--repeat R]
+'''
+
+import argparse
+import sys
+import time
+
+import validator_standins
+validator_standins.install()
+
+import typedaddress  # noqa
+from dhcpsrv_range import DHCPSrvRangeValidator  # noqa
+from dhcpsrv_static_host import DHCPSrvStaticHostValidator  # noqa
+
+Row = validator_standins.Row
+ValidationArgs = validator_standins.ValidationArgs
+
+
+def range_rows(count):
+    rows = []
+    for i in xrange(count):
+        if i % 4 == 3:
+            prefix = "2001:db8:%x::" % i
+            rows.append(Row(name="r%d" % i, start_ip_address=prefix + "10",
+                            end_ip_address=[prefix + "ff"],
+                            lease_duration=[60], set_tag=[], match_tags=[],
+                            netmask=[], broadcast=[], prefix_len=[64]))
+        else:
+            net = "10.%d.%d." % (i >> 8 & 0xff, i & 0xff)
+            rows.append(Row(name="r%d" % i, start_ip_address=net + "10",
+                            end_ip_address=[net + "200"],
+                            lease_duration=[60], set_tag=["tag"],
+                            match_tags=["m1", "m2"],
+                            netmask=["255.255.255.0"],
+                            broadcast=[net + "255"], prefix_len=[]))
+    return rows
+
+
+def static_host_rows(count):
+    rows = []
+    for i in xrange(count):
+        # Inside the range row of the same index
+        if i % 4 == 3:
+            ip = "2001:db8:%x::20" % i
+        else:
+            ip = "10.%d.%d.100" % (i >> 8 & 0xff, i & 0xff)
+        mac = ":".join("%02x" % (i >> shift & 0xff)
+                       for shift in (40, 32, 24, 16, 8, 0))
+        rows.append(Row(ip_address=ip, mac_addresses=[mac],
+                        set_tags=["tag"], client_hostname=["host%d" % i],
+                        client_id=[], lease_duration=[3600]))
+    return rows
+
+
+def per_row_us(validator, rows, idl=None):
+    start = time.time()
+    for row in rows:
+        validator.validate_modification(ValidationArgs(row, idl))
+    return (time.time() - start) * 1e6 / len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = [("dhcpsrv_range", DHCPSrvRangeValidator(),
+              range_rows(args.rows)),
+             ("dhcpsrv_static_host", DHCPSrvStaticHostValidator(),
+              static_host_rows(args.rows))]
+
+    print("%-20s %10s %10s" % ("resource", "cold us", "warm us"))
+    for name, validator, rows in cases:
+        # A range row holds up to four addresses, keep them all cached
+        cached = rows[:typedaddress.CACHE_SIZE // 4]
+        cold = []
+        warm = []
+        for _ in range(args.repeat):
+            typedaddress.address_cache.clear()
+            typedaddress.netmask_cache.clear()
+            cold.append(per_row_us(validator, rows))
+            per_row_us(validator, cached)
+            warm.append(per_row_us(validator, cached))
+        print("%-20s %10.2f %10.2f" % (name, min(cold), min(warm)))
+
+    ranges = cases[0][2]
+    hosts = cases[1][2]
+    idl = validator_standins.Idl(
+        DHCP_Server=[Row(ranges=ranges, static_hosts=hosts)],
+        DHCPSrv_Range=ranges, DHCPSrv_Static_Host=hosts)
+    bulk = []
+    for _ in range(args.repeat):
+        idl.change_seqno += 1
+        start = time.time()
+        for name, validator, rows in cases:
+            per_row_us(validator, rows, idl)
+        bulk.append((time.time() - start) * 1000)
+    print("bulk transaction of %d rows: %.1f ms"
+          % (len(ranges) + len(hosts), min(bulk)))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
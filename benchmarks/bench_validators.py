@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+Throughput regression benchmark for the opsplugins validators.
+
+Synthetic range, static host, option and match rows are generated at
+several scales and validated as new rows of a single transaction, with the
+REST daemon modules replaced by the stand-ins of validator_standins. The
+rows per second of each validator and scale are printed.
+
+Throughput depends on the machine, so every result is also divided by the
+speed of a fixed pure python calibration loop. These normalized scores are
+compared against the stored baseline, and the benchmark exits non-zero
+when one of them drops by more than the tolerance. --update-baseline
+stores the scores of the current run instead.
+
+Both are timed in CPU time of the process, so that the time the process
+waits for the CPU while the machine is busy is not counted. Other load
+still slows the CPU down for a while, so every case is measured --repeat
+times, each measurement between two runs of the calibration loop, and
+the score of the case is the median of the ratios of each measurement to
+the calibration speed around it. The garbage collector is disabled while
+measuring.
+
+Usage: bench_validators.py [--scales 10,1000,10000] [--tolerance 0.3]
+                           [--repeat 9] [--baseline FILE]
+                           [--update-baseline]
+'''
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+import validator_standins
+validator_standins.install()
+
+import typedaddress  # noqa
+from bench_opsplugins_rows import range_rows  # noqa
+from bench_opsplugins_rows import static_host_rows  # noqa
+from dhcpsrv_match import DHCPSrvMatchValidator  # noqa
+from dhcpsrv_option import DHCPSrvOptionValidator  # noqa
+from dhcpsrv_range import DHCPSrvRangeValidator  # noqa
+from dhcpsrv_static_host import DHCPSrvStaticHostValidator  # noqa
+
+Row = validator_standins.Row
+ValidationArgs = validator_standins.ValidationArgs
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "bench_validators_baseline.json")
+
+DEFAULT_SCALES = (10, 1000, 10000)
+
+# Minimum CPU time spent per measurement, small scales are repeated
+MIN_TIME = 0.1
+
+# Measurements of every case, the median is kept
+DEFAULT_REPEAT = 9
+
+# Iterations of the calibration loop, about as long as a measurement
+CALIBRATION_LOOPS = 200000
+
+OPTIONS = (
+    (["router"], [], ["10.0.0.1,10.0.0.2"], []),
+    (["mtu"], [], ["1500"], []),
+    (["domain-name"], [], ["example.net"], []),
+    (["lease-time"], [], ["12h"], []),
+    (["dns-server"], [], ["2001:db8::53"], [True]),
+    ([], [42], ["10.0.0.123"], []),
+    ([], [200], ["0a:0b:0c"], []),
+)
+
+MATCHES = (
+    (["client-arch"], [], ["7"]),
+    (["user-class"], [], ["iPXE"]),
+    ([], [77], []),
+    ([], [93], ["9"]),
+)
+
+
+def option_rows(count):
+    rows = []
+    for i in xrange(count):
+        name, number, value, ipv6 = OPTIONS[i % len(OPTIONS)]
+        rows.append(Row(option_name=name, option_number=number,
+                        option_value=value, ipv6=ipv6,
+                        match_tags=["tag%d" % (i % 16)]))
+    return rows
+
+
+def match_rows(count):
+    rows = []
+    for i in xrange(count):
+        name, number, value = MATCHES[i % len(MATCHES)]
+        rows.append(Row(set_tag="tag%d" % (i % 16), option_name=name,
+                        option_number=number, option_value=value))
+    return rows
+
+
+CASES = (
+    ("dhcpsrv_range", DHCPSrvRangeValidator, range_rows),
+    ("dhcpsrv_static_host", DHCPSrvStaticHostValidator, static_host_rows),
+    ("dhcpsrv_option", DHCPSrvOptionValidator, option_rows),
+    ("dhcpsrv_match", DHCPSrvMatchValidator, match_rows),
+)
+
+
+def calibrate():
+    '''
+    Iterations per CPU second of a fixed loop of dict, string and integer
+    operations, the kind of work the validators do.
+    '''
+    start = time.clock()
+    table = {}
+    for i in xrange(CALIBRATION_LOOPS):
+        key = "k%d" % (i & 1023)
+        table[key] = table.get(key, 0) + (i >> 3 & 0xff)
+    return CALIBRATION_LOOPS / (time.clock() - start)
+
+
+def rows_per_second(validator, rows, idl):
+    done = 0
+    start = time.clock()
+    while True:
+        # Every round validates a new transaction with a cold cache
+        idl.change_seqno += 1
+        typedaddress.address_cache.clear()
+        typedaddress.netmask_cache.clear()
+        for row in rows:
+            validator.validate_modification(ValidationArgs(row, idl))
+        done += len(rows)
+        elapsed = time.clock() - start
+        if elapsed >= MIN_TIME:
+            return done / elapsed
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def measure(validator, rows, idl, repeat):
+    '''
+    Median throughput of the validator over repeat measurements, and the
+    median of their ratios to the calibration speed around them.
+    '''
+    rates = []
+    ratios = []
+    gc.disable()
+    try:
+        for _ in xrange(repeat):
+            before = calibrate()
+            rate = rows_per_second(validator, rows, idl)
+            after = calibrate()
+            rates.append(rate)
+            ratios.append(rate * 2 / (before + after))
+    finally:
+        gc.enable()
+    return median(rates), median(ratios)
+
+
+def run(scales, repeat):
+    '''
+    The rows per second and the normalized score of every case.
+    '''
+    results = {}
+    scores = {}
+    for scale in scales:
+        rows = dict((name, generate(scale)) for name, _, generate in CASES)
+        idl = validator_standins.Idl(
+            DHCP_Server=[Row(ranges=rows["dhcpsrv_range"],
+                             static_hosts=rows["dhcpsrv_static_host"])],
+            DHCPSrv_Range=rows["dhcpsrv_range"],
+            DHCPSrv_Static_Host=rows["dhcpsrv_static_host"])
+        for name, validator, _ in CASES:
+            key = "%s/%d" % (name, scale)
+            results[key], scores[key] = measure(validator(), rows[name],
+                                                idl, repeat)
+    return results, scores
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales",
+                        default=",".join(str(s) for s in DEFAULT_SCALES))
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="Allowed relative drop of a normalized score.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="Measurements of every case.")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",")]
+    results, scores = run(scales, max(1, args.repeat))
+
+    baseline = {}
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    failed = []
+    print("%-26s %12s %10s %10s" % ("validator/rows", "rows/s", "score",
+                                    "baseline"))
+    for key in sorted(results, key=lambda k: (k.split("/")[0],
+                                              int(k.split("/")[1]))):
+        expected = baseline.get(key)
+        print("%-26s %12.0f %10.4f %10s"
+              % (key, results[key], scores[key],
+                 "-" if expected is None else "%.4f" % expected))
+        if expected is not None and \
+           scores[key] < expected * (1 - args.tolerance):
+            failed.append(key)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(dict((key, round(value, 4))
+                           for key, value in scores.items()),
+                      f, indent=4, sort_keys=True, separators=(",", ": "))
+            f.write("\n")
+        print("baseline written to %s" % args.baseline)
+
+    if failed:
+        print("FAIL: throughput regression: %s" % " ".join(failed))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
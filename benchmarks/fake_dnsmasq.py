@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+Stand-in for the dnsmasq executable, for the restart benchmark of the
+DHCP-TFTP daemon.
+
+It takes the dnsmasq arguments the daemon renders and behaves as
+dnsmasq does towards the daemon: --test exits at once, otherwise it
+runs the --dhcp-script with "init" as dnsmasq does at startup, waits the
+startup delay and binds the UDP port the daemon checks for readiness,
+then runs until it is killed. Its own options come first:
+
+  --fake-record=FILE  append a JSON line to FILE for the start, the
+                      check, the readiness and every signal received
+  --fake-delay=SECS   startup delay before binding the port
+  --fake-port=PORT    UDP port to bind instead of the DHCP server port
+
+Every record holds the event, the PID, the time and, for a start or a
+check, the full argv.
+'''
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+RECORDED_SIGNALS = {signal.SIGHUP: 'SIGHUP', signal.SIGINT: 'SIGINT',
+                    signal.SIGTERM: 'SIGTERM', signal.SIGUSR1: 'SIGUSR1',
+                    signal.SIGUSR2: 'SIGUSR2'}
+
+record_file = None
+
+
+def record(event, **fields):
+    if record_file is None:
+        return
+    fields.update(event=event, pid=os.getpid(), time=time.time())
+    # One write per line, the shards append to the same file
+    os.write(record_file, json.dumps(fields) + '\n')
+
+
+def on_signal(signum, frame):
+    record('signal', signal=RECORDED_SIGNALS[signum])
+    if signum in (signal.SIGINT, signal.SIGTERM):
+        sys.exit(0)
+
+
+def main(argv):
+    global record_file
+
+    delay = 0.0
+    port = 67
+    script = None
+    test = False
+    for argument in argv[1:]:
+        if argument.startswith('--fake-record='):
+            record_file = os.open(argument.split('=', 1)[1],
+                                  os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                                  0644)
+        elif argument.startswith('--fake-delay='):
+            delay = float(argument.split('=', 1)[1])
+        elif argument.startswith('--fake-port='):
+            port = int(argument.split('=', 1)[1])
+        elif argument.startswith('--dhcp-script='):
+            script = argument.split('=', 1)[1]
+        elif argument == '--test':
+            test = True
+
+    if test:
+        record('test', argv=argv)
+        sys.stderr.write('dnsmasq: syntax check OK.\n')
+        return 0
+
+    record('start', argv=argv)
+    for signum in RECORDED_SIGNALS:
+        signal.signal(signum, on_signal)
+
+    if script is not None:
+        with open(os.devnull, 'w') as devnull:
+            subprocess.call([script, 'init'], stdout=devnull,
+                            close_fds=True)
+
+    time.sleep(delay)
+
+    # The daemon sees dnsmasq ready once it has this socket, the shards
+    # share the port
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('127.0.0.1', port))
+    record('ready')
+
+    while True:
+        signal.pause()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
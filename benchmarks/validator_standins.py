@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+Minimal stand-ins for the REST daemon modules the opsplugins validators
+import (opsvalidator.base, opsvalidator.error and opsrest.utils.utils), so
+that the validators can be benchmarked without a switch image. Only the
+names the validators use are provided.
+'''
+
+import os
+import sys
+import types
+import uuid
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPSPLUGINS = os.path.join(REPO, "opsplugins")
+
+VERIFICATION_FAILED = "verification_failed"
+
+
+class BaseValidator(object):
+    resource = None
+
+    def validate_modification(self, validation_args):
+        pass
+
+    def validate_deletion(self, validation_args):
+        pass
+
+
+class ValidationError(Exception):
+    def __init__(self, code, details):
+        Exception.__init__(self, details)
+        self.code = code
+        self.details = details
+
+
+def get_column_data_from_row(row, column):
+    return getattr(row, column)
+
+
+class ValidationArgs(object):
+    def __init__(self, resource_row, idl=None, p_resource_row=None,
+                 is_new=True):
+        self.resource_row = resource_row
+        self.idl = idl
+        self.p_resource_row = p_resource_row
+        self.is_new = is_new
+
+
+class Row(object):
+    '''
+    Stand-in for an ovs.db.idl.Row: columns are plain attributes and
+    optional columns are lists, as the validators see them.
+    '''
+    def __init__(self, **columns):
+        self.uuid = uuid.uuid4()
+        self._changes = {}
+        self.__dict__.update(columns)
+
+
+class Table(object):
+    def __init__(self, rows=()):
+        self.rows = dict((row.uuid, row) for row in rows)
+
+
+class Idl(object):
+    '''
+    Stand-in for an ovs.db.idl.Idl with a transaction in progress.
+    '''
+    def __init__(self, **tables):
+        self.tables = dict((name, Table(rows))
+                           for name, rows in tables.iteritems())
+        self.txn = object()
+        self.change_seqno = 1
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    '''
+    Register the stand-in modules and put opsplugins on sys.path. Real
+    modules that are already importable are left alone.
+    '''
+    if OPSPLUGINS not in sys.path:
+        sys.path.insert(0, OPSPLUGINS)
+
+    try:
+        import opsvalidator.base  # noqa
+        import opsrest.utils.utils  # noqa
+        return
+    except ImportError:
+        pass
+
+    error = _module("opsvalidator.error",
+                    VERIFICATION_FAILED=VERIFICATION_FAILED,
+                    ValidationError=ValidationError)
+    base = _module("opsvalidator.base", BaseValidator=BaseValidator)
+    _module("opsvalidator", error=error, base=base)
+
+    utils = _module("opsrest.utils.utils",
+                    get_column_data_from_row=get_column_data_from_row)
+    _module("opsrest.utils", utils=utils)
+    _module("opsrest", utils=sys.modules["opsrest.utils"])
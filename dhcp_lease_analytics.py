@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+NOTES:
+ - Fleet level analytics over the DHCP leases DB. Leases are loaded into
+   columnar arrays (IPv4 as uint32, IPv6 as two uint64 halves, expiry as
+   uint64, MAC as uint64 and hostnames as interned uint32 codes) and the
+   aggregates are computed with vectorized NumPy operations.
+ - NumPy is optional. When it is not installed the same report is
+   computed with plain python containers, only slower.
+'''
+
+import socket
+import struct
+import time
+from collections import Counter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Upper edges (in seconds from now) of the expiry histogram buckets.
+# Leases with expiry_time 0 never expire and are reported separately.
+EXPIRY_BUCKETS = [0, 300, 900, 3600, 4 * 3600, 12 * 3600, 24 * 3600,
+                  7 * 24 * 3600]
+EXPIRY_BUCKET_NAMES = ["expired", "5m", "15m", "1h", "4h", "12h", "1d", "7d",
+                       "later"]
+
+# Window used to derive the churn rate from lease expiries
+CHURN_WINDOW = 3600
+
+DEFAULT_TOP_HOSTNAMES = 10
+
+NO_HOSTNAME = "*"
+
+
+class LeaseColumns(object):
+    '''
+    Columnar view of the DHCP lease table.
+
+    ip4 holds the IPv4 leases, ip6_hi/ip6_lo the two 64 bit halves of the
+    IPv6 leases. expiry, mac and hostname are indexed like the lease rows
+    and hostname holds codes into the hostnames list (code 0 is "*").
+    '''
+    def __init__(self, ip4, ip6_hi, ip6_lo, expiry, mac, hostname,
+                 hostnames):
+        self.ip4 = ip4
+        self.ip6_hi = ip6_hi
+        self.ip6_lo = ip6_lo
+        self.expiry = expiry
+        self.mac = mac
+        self.hostname = hostname
+        self.hostnames = hostnames
+
+    def __len__(self):
+        return len(self.expiry)
+
+
+def ipv4_to_int(ip):
+    return struct.unpack("!I", socket.inet_pton(socket.AF_INET, ip))[0]
+
+
+def ipv6_to_halves(ip):
+    return struct.unpack("!QQ", socket.inet_pton(socket.AF_INET6, ip))
+
+
+def mac_to_int(mac):
+    try:
+        return int(mac.replace(":", ""), 16)
+    except ValueError:
+        return 0
+
+
+def int_to_ipv4(value):
+    return socket.inet_ntop(socket.AF_INET, struct.pack("!I", value))
+
+
+def int_to_ipv6_prefix(hi):
+    return socket.inet_ntop(socket.AF_INET6, struct.pack("!QQ", hi, 0))
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _column(values, dtype):
+    if numpy is not None:
+        return numpy.array(values, dtype=dtype)
+    return values
+
+
+def load_columns(rows):
+    '''
+    Build the columnar view from an iterable of DHCP_Lease IDL rows.
+    '''
+    ip4 = []
+    ip6_hi = []
+    ip6_lo = []
+    expiry = []
+    mac = []
+    hostname = []
+    hostnames = [NO_HOSTNAME]
+    codes = {NO_HOSTNAME: 0}
+
+    for ovs_rec in rows:
+        ip = ovs_rec.ip_address
+        if ip and ":" in ip:
+            try:
+                hi, lo = ipv6_to_halves(ip)
+            except socket.error:
+                pass
+            else:
+                ip6_hi.append(hi)
+                ip6_lo.append(lo)
+        elif ip:
+            try:
+                ip4.append(ipv4_to_int(ip))
+            except socket.error:
+                pass
+
+        expiry.append(_to_int(ovs_rec.expiry_time))
+        mac.append(mac_to_int(ovs_rec.mac_address or ""))
+
+        name = NO_HOSTNAME
+        if ovs_rec.client_hostname:
+            name = ovs_rec.client_hostname[0]
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(hostnames)
+            hostnames.append(name)
+        hostname.append(code)
+
+    return LeaseColumns(_column(ip4, "uint32"), _column(ip6_hi, "uint64"),
+                        _column(ip6_lo, "uint64"), _column(expiry, "uint64"),
+                        _column(mac, "uint64"), _column(hostname, "uint32"),
+                        hostnames)
+
+
+def synthetic_columns(count, now=None, seed=0):
+    '''
+    Generate count random leases, used to size and benchmark the
+    analytics without a populated leases DB. Requires NumPy.
+    '''
+    if now is None:
+        now = int(time.time())
+
+    rng = numpy.random.RandomState(seed)
+    nhosts = max(1, count // 20)
+    hostnames = [NO_HOSTNAME] + ["host-%d" % i for i in range(nhosts)]
+    nip6 = count // 10
+
+    return LeaseColumns(
+        (0x0a000000 + rng.randint(0, 1 << 20, count - nip6)).astype("uint32"),
+        numpy.full(nip6, 0x20010db800000000, dtype="uint64") +
+        rng.randint(0, 16, nip6).astype("uint64"),
+        rng.randint(0, 1 << 62, nip6).astype("uint64"),
+        (now - 600 + rng.randint(0, 2 * 24 * 3600, count)).astype("uint64"),
+        rng.randint(0, 1 << 48, count, dtype="int64").astype("uint64"),
+        rng.randint(0, len(hostnames), count).astype("uint32"),
+        hostnames)
+
+
+def _unique_counts(values):
+    '''
+    Sort based equivalent of numpy.unique(values, return_counts=True).
+    '''
+    if not len(values):
+        return values, numpy.zeros(0, dtype="int64")
+    ordered = numpy.sort(values)
+    starts = numpy.flatnonzero(numpy.diff(ordered)) + 1
+    starts = numpy.concatenate(([0], starts))
+    counts = numpy.diff(numpy.concatenate((starts, [len(ordered)])))
+    return ordered[starts], counts
+
+
+def _analyze_numpy(columns, now, top):
+    expiry = columns.expiry
+    finite = expiry[expiry != 0].astype("int64") - now
+
+    buckets = numpy.searchsorted(numpy.array(EXPIRY_BUCKETS), finite,
+                                 side="left")
+    histogram = numpy.bincount(buckets, minlength=len(EXPIRY_BUCKET_NAMES))
+
+    subnets, subnet_counts = _unique_counts(columns.ip4 >> numpy.uint32(8))
+    prefixes, prefix_counts = _unique_counts(columns.ip6_hi)
+    macs, _ = _unique_counts(columns.mac)
+
+    host_counts = numpy.bincount(columns.hostname,
+                                 minlength=len(columns.hostnames))
+    host_counts[0] = 0
+    order = numpy.argsort(-host_counts, kind="mergesort")[:top]
+
+    return {
+        "leases": int(len(expiry)),
+        "infinite": int(len(expiry) - len(finite)),
+        "expiry_histogram": dict(zip(EXPIRY_BUCKET_NAMES,
+                                     [int(c) for c in histogram])),
+        "leases_per_24": dict(
+            ("%s/24" % int_to_ipv4(int(s) << 8), int(c))
+            for s, c in zip(subnets, subnet_counts)),
+        "leases_per_64": dict(
+            ("%s/64" % int_to_ipv6_prefix(int(p)), int(c))
+            for p, c in zip(prefixes, prefix_counts)),
+        "churn_per_hour": int(numpy.count_nonzero(
+            (finite > 0) & (finite <= CHURN_WINDOW)) * 3600 // CHURN_WINDOW),
+        "unique_macs": int(len(macs)),
+        "top_hostnames": [[columns.hostnames[i], int(host_counts[i])]
+                          for i in order if host_counts[i] > 0],
+    }
+
+
+def _analyze_python(columns, now, top):
+    histogram = [0] * len(EXPIRY_BUCKET_NAMES)
+    infinite = 0
+    churn = 0
+    for expiry in columns.expiry:
+        if expiry == 0:
+            infinite += 1
+            continue
+        remaining = expiry - now
+        bucket = 0
+        while bucket < len(EXPIRY_BUCKETS) and \
+                remaining > EXPIRY_BUCKETS[bucket]:
+            bucket += 1
+        histogram[bucket] += 1
+        if 0 < remaining <= CHURN_WINDOW:
+            churn += 1
+
+    subnets = Counter(ip >> 8 for ip in columns.ip4)
+    prefixes = Counter(columns.ip6_hi)
+    hosts = Counter(columns.hostname)
+    hosts.pop(0, None)
+
+    return {
+        "leases": len(columns.expiry),
+        "infinite": infinite,
+        "expiry_histogram": dict(zip(EXPIRY_BUCKET_NAMES, histogram)),
+        "leases_per_24": dict(("%s/24" % int_to_ipv4(s << 8), c)
+                              for s, c in subnets.items()),
+        "leases_per_64": dict(("%s/64" % int_to_ipv6_prefix(p), c)
+                              for p, c in prefixes.items()),
+        "churn_per_hour": churn * 3600 // CHURN_WINDOW,
+        "unique_macs": len(set(columns.mac)),
+        "top_hostnames": [[columns.hostnames[code], count]
+                          for code, count in sorted(
+                              hosts.items(),
+                              key=lambda item: (-item[1], item[0]))[:top]],
+    }
+
+
+def analyze(columns, now=None, top=DEFAULT_TOP_HOSTNAMES):
+    '''
+    Compute the fleet report for the given columns. The result only holds
+    plain python types so that it can be serialized with json directly.
+    '''
+    if now is None:
+        now = int(time.time())
+
+    if numpy is not None and not isinstance(columns.expiry, list):
+        report = _analyze_numpy(columns, now, top)
+        report["backend"] = "numpy"
+    else:
+        report = _analyze_python(columns, now, top)
+        report["backend"] = "python"
+
+    report["now"] = now
+    return report
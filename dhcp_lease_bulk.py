@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+NOTES:
+ - Bulk export and import of the DHCP leases DB, used to migrate a switch
+   or to restore the leases after a DB wipe.
+ - Dumps are streamed one lease per line, either as JSON Lines or as CSV
+   with a header row, so an export never holds the whole DB in memory.
+ - Imports are committed in chunks of multi-row transactions and upsert
+   by MAC address, so re-running an import is idempotent. Imports are
+   streamed too: a chunk is reduced to the last entry of every MAC
+   address in it, and a MAC repeated in a later chunk updates the row the
+   earlier chunk upserted, found through the MAC index, so the last entry
+   of a MAC wins and memory is bounded by the chunk size.
+'''
+
+import collections
+import csv
+import itertools
+import json
+import sys
+import time
+
+import ovs.db.idl
+
+from dhcp_lease_db import CLIENT_HOSTNAME
+from dhcp_lease_db import CLIENT_ID
+from dhcp_lease_db import DHCP_LEASES_TABLE
+from dhcp_lease_db import EXPIRY_TIME
+from dhcp_lease_db import IP_ADDR
+from dhcp_lease_db import MAC_ADDR
+
+FORMAT_JSONL = "jsonl"
+FORMAT_CSV = "csv"
+FORMATS = (FORMAT_JSONL, FORMAT_CSV)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Column order of the dumps
+FIELDS = (EXPIRY_TIME, MAC_ADDR, IP_ADDR, CLIENT_HOSTNAME, CLIENT_ID)
+
+
+def guess_format(path):
+    if path and path.endswith("." + FORMAT_CSV):
+        return FORMAT_CSV
+    return FORMAT_JSONL
+
+
+def _encode(value):
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    return value
+
+
+def row_to_entry(ovs_rec):
+    '''
+    Convert a DHCP_Lease row to a lease entry, the optional columns
+    holding "*" when unset as in "dhcp_leases show".
+    '''
+    entry = {}
+    for column in FIELDS:
+        value = getattr(ovs_rec, column)
+        if isinstance(value, list):
+            value = value[0] if value else "*"
+        entry[column] = _encode(value) if value else "*"
+
+    return entry
+
+
+def export_leases(dhcp_leases, out, fmt=FORMAT_JSONL):
+    '''
+    Write every lease of the DB to the out stream. Returns the number of
+    leases written.
+    '''
+    rows = dhcp_leases.idl.tables[DHCP_LEASES_TABLE].rows.itervalues()
+    count = 0
+
+    if fmt == FORMAT_CSV:
+        writer = csv.writer(out)
+        writer.writerow(FIELDS)
+        for ovs_rec in rows:
+            entry = row_to_entry(ovs_rec)
+            writer.writerow([entry[column] for column in FIELDS])
+            count += 1
+    else:
+        for ovs_rec in rows:
+            out.write(json.dumps(row_to_entry(ovs_rec), sort_keys=True))
+            out.write("\n")
+            count += 1
+
+    return count
+
+
+def read_leases(stream, fmt=FORMAT_JSONL):
+    '''
+    Yield the lease entries of a dump. Lines without a MAC address are
+    reported on stderr and skipped.
+    '''
+    if fmt == FORMAT_CSV:
+        records = csv.DictReader(stream)
+    else:
+        records = (json.loads(line) for line in stream if line.strip())
+
+    for lineno, record in enumerate(records, 1):
+        entry = {}
+        for column in FIELDS:
+            value = record.get(column)
+            entry[column] = _encode(value) if value else "*"
+
+        if entry[MAC_ADDR] == "*":
+            sys.stderr.write("dhcp_leases import: record %d has no %s, "
+                             "skipped\n" % (lineno, MAC_ADDR))
+            continue
+
+        yield entry
+
+
+def import_leases(dhcp_leases, entries, chunk_size=DEFAULT_CHUNK_SIZE,
+                  progress=None):
+    '''
+    Upsert the lease entries in transactions of up to chunk_size leases.
+    progress, when given, is a stream receiving one line per chunk.
+
+    Returns a dict with the number of inserted, updated, unchanged and
+    failed leases, a MAC address repeated across chunks being counted
+    once per chunk.
+    '''
+    index = dhcp_leases.build_mac_index()
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0, "failed": 0}
+    start = time.time()
+    entries = iter(entries)
+    done = 0
+
+    while True:
+        # The last entry of a MAC in the chunk wins, as it would have been
+        # applied last
+        unique = collections.OrderedDict()
+        for entry in itertools.islice(entries, chunk_size):
+            unique[entry[MAC_ADDR]] = entry
+        if not unique:
+            break
+        chunk = unique.values()
+
+        status, inserted, updated, unchanged = \
+            dhcp_leases.upsert_rows(chunk, index)
+
+        if status in (ovs.db.idl.Transaction.SUCCESS,
+                      ovs.db.idl.Transaction.UNCHANGED):
+            totals["inserted"] += inserted
+            totals["updated"] += updated
+            totals["unchanged"] += unchanged
+        else:
+            totals["failed"] += len(chunk)
+
+        done += len(chunk)
+        if progress is not None:
+            elapsed = time.time() - start
+            progress.write("dhcp_leases import: %d leases, %d inserted, "
+                           "%d updated, %d unchanged, %d failed, "
+                           "%.0f leases/s\n"
+                           % (done, totals["inserted"], totals["updated"],
+                              totals["unchanged"], totals["failed"],
+                              done / elapsed if elapsed else 0))
+
+    return totals
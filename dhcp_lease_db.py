@@ -16,11 +16,15 @@
 
 import os
 import sys
-from time import sleep
 
 import ovs.dirs
+from ovs.db import error
 import ovs.db.idl
+import ovs.json
+import ovs.poller
+import ovs.timeval
 import ovs.vlog
+from dhcp_lease_stats import phase
 
 vlog = ovs.vlog.Vlog("dhcp_lease_db")
 
@@ -33,6 +37,15 @@ def_db = 'unix:/var/run/openvswitch/db.sock'
 # OPS_TODO: Need to pull this from the build env
 dhcp_lease_db_schema = '/usr/share/openvswitch/dhcp_leases.ovsschema'
 
+# Milliseconds to wait for the initial contents of the DHCP lease DB
+DEFAULT_CONNECT_TIMEOUT = 10000
+
+# Parsed dhcp_lease_db_schema, shared by every connection of the process
+schema_json = None
+
+# Process wide connection returned by get_lease_db()
+lease_db = None
+
 # DHCP lease tabe names
 DHCP_LEASES_TABLE = "DHCP_Lease"
 
@@ -44,19 +57,65 @@ CLIENT_HOSTNAME = "client_hostname"
 CLIENT_ID = "client_id"
 
 
+def get_schema_json():
+    '''
+    Parse the DHCP lease DB schema once per process.
+    '''
+    global schema_json
+
+    if schema_json is None:
+        schema_json = ovs.json.from_file(dhcp_lease_db_schema)
+        if isinstance(schema_json, basestring):
+            raise error.Error("%s: %s" % (dhcp_lease_db_schema, schema_json))
+
+    return schema_json
+
+
+def get_lease_db(timeout=DEFAULT_CONNECT_TIMEOUT):
+    '''
+    Return the process wide DHCP lease DB connection, connecting on first
+    use. Later calls pick up any change made since the previous operation.
+    '''
+    global lease_db
+
+    if lease_db is None:
+        lease_db = DHCPLeaseDB(timeout=timeout)
+    else:
+        lease_db.idl.run()
+
+    return lease_db
+
+
+def close_lease_db():
+    global lease_db
+
+    if lease_db is not None:
+        lease_db.close()
+        lease_db = None
+
+
 class DHCPLeaseDB(object):
-    def __init__(self, location=None):
+    def __init__(self, location=None, remote=None,
+                 timeout=DEFAULT_CONNECT_TIMEOUT):
         '''
         Create a IDL connection to the DHCP lease DB and register all the
-        columns with schema helper.
+        columns with schema helper. Waits up to timeout milliseconds for
+        the DB contents and raises ovs.db.error.Error if they don't arrive.
         '''
         self.idl = None
         self.txn = None
-        self.schema_helper = ovs.db.idl.SchemaHelper(
-            location=dhcp_lease_db_schema)
+        if location is None:
+            self.schema_helper = ovs.db.idl.SchemaHelper(
+                schema_json=get_schema_json())
+        else:
+            self.schema_helper = ovs.db.idl.SchemaHelper(location=location)
         self.schema_helper.register_table(DHCP_LEASES_TABLE)
 
-        self.idl = ovs.db.idl.Idl(def_db, self.schema_helper)
+        if remote is None:
+            remote = def_db
+
+        with phase('connect'):
+            self.idl = ovs.db.idl.Idl(remote, self.schema_helper)
 
         self.expiry_time = None
         self.mac_address = None
@@ -64,8 +123,32 @@ class DHCPLeaseDB(object):
         self.client_hostname = None
         self.client_id = None
 
+        with phase('sync'):
+            self.wait_for_contents(remote, timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, unused_type, unused_value, unused_traceback):
+        self.close()
+
+    def wait_for_contents(self, remote, timeout):
+        '''
+        Block in the poller until the first DB update is processed, or
+        until the deadline expires.
+        '''
+        deadline = ovs.timeval.msec() + timeout
+
         while not self.idl.run():
-            sleep(.1)
+            if ovs.timeval.msec() >= deadline:
+                self.idl.close()
+                raise error.Error("timed out after %d ms connecting to %s"
+                                  % (timeout, remote))
+
+            poller = ovs.poller.Poller()
+            self.idl.wait(poller)
+            poller.timer_wait_until(deadline)
+            poller.block()
 
     def find_row_by_mac_addr(self, mac_addr):
         '''
@@ -84,6 +167,34 @@ class DHCPLeaseDB(object):
 
         return ovs_rec, tbl_found
 
+    def build_mac_index(self):
+        '''
+        Map the MAC address of every lease to its row UUID, for bulk
+        operations that would otherwise walk the table once per lease.
+        '''
+        index = {}
+        for ovs_rec in self.idl.tables[DHCP_LEASES_TABLE].rows.itervalues():
+            index[ovs_rec.mac_address] = ovs_rec.uuid
+
+        return index
+
+    def __row_matches(self, row, entry):
+
+        for column in (EXPIRY_TIME, MAC_ADDR, IP_ADDR, CLIENT_HOSTNAME,
+                       CLIENT_ID):
+            if entry[column] is None:
+                continue
+
+            value = getattr(row, column)
+            if isinstance(value, list):
+                value = value[0] if value else None
+
+            # Lease entries hold "*" for the columns left unset
+            if (value or "*") != entry[column]:
+                return False
+
+        return True
+
     def __set_column_value(self, row, entry):
 
         if entry[EXPIRY_TIME] != None:
@@ -101,6 +212,10 @@ class DHCPLeaseDB(object):
         if entry[CLIENT_ID] != None:
             setattr(row, CLIENT_ID, entry[CLIENT_ID])
 
+    def __commit(self):
+        with phase('commit'):
+            return self.txn.commit_block()
+
     def insert_row(self, entry):
         '''
         Insert a new row in dhcp_lease_db and update the columns with
@@ -112,7 +227,7 @@ class DHCPLeaseDB(object):
 
         self.__set_column_value(row, entry)
 
-        status = self.txn.commit_block()
+        status = self.__commit()
 
         return row, status
 
@@ -123,16 +238,69 @@ class DHCPLeaseDB(object):
         self.txn = ovs.db.idl.Transaction(self.idl)
         row, row_found = self.find_row_by_mac_addr(mac_addr)
 
-        if row_found:
-            self.__set_column_value(row, entry)
+        if not row_found:
+            # Insert in the same transaction, an IDL only allows one
+            # transaction at a time
+            row = self.txn.insert(self.idl.tables[DHCP_LEASES_TABLE])
 
-            status = self.txn.commit_block()
+        self.__set_column_value(row, entry)
 
-        else:
-            row, status = self.insert_row(entry)
+        status = self.__commit()
 
         return row, status
 
+    def upsert_rows(self, entries, index):
+        '''
+        Insert or update one row per entry, keyed by MAC address, in a
+        single transaction. Rows already holding the entry values are left
+        untouched, so that importing the same leases twice is a no-op.
+
+        The entries must hold distinct MAC addresses. index maps MAC
+        addresses to row UUIDs (see build_mac_index()) and is updated from
+        the IDL with the rows inserted by a successful commit.
+
+        Returns the commit status and the number of inserted, updated and
+        unchanged rows.
+        '''
+        table = self.idl.tables[DHCP_LEASES_TABLE]
+        self.txn = ovs.db.idl.Transaction(self.idl)
+        status = ovs.db.idl.Transaction.UNCHANGED
+        pending = {}
+        inserted = updated = unchanged = 0
+
+        for entry in entries:
+            mac_addr = entry[MAC_ADDR]
+            row = pending.get(mac_addr)
+
+            if row is None:
+                row = table.rows.get(index.get(mac_addr))
+                if row is None:
+                    row = self.txn.insert(table)
+                    inserted += 1
+                elif self.__row_matches(row, entry):
+                    unchanged += 1
+                    continue
+                else:
+                    updated += 1
+                pending[mac_addr] = row
+
+            self.__set_column_value(row, entry)
+
+        if pending:
+            status = self.__commit()
+        else:
+            self.txn.abort()
+
+        if status == ovs.db.idl.Transaction.SUCCESS:
+            # The update carrying the inserted rows may arrive after the
+            # commit reply, the next chunk looks them up in the IDL
+            self.idl.run()
+            for mac_addr, row in pending.iteritems():
+                index[mac_addr] = self.txn.get_insert_uuid(row.uuid) or \
+                    row.uuid
+
+        return status, inserted, updated, unchanged
+
     def delete_row(self, mac_addr):
         '''
         Delete a specific row from dhcp_lease_db based on
@@ -147,7 +315,10 @@ class DHCPLeaseDB(object):
 
         if row_found:
             row.delete()
-            status = self.txn.commit_block()
+            status = self.__commit()
+        else:
+            # Release the transaction so that the connection can be reused
+            self.txn.abort()
 
         return row_found, status
 
@@ -169,7 +340,9 @@ class DHCPLeaseDB(object):
                 break
 
         if row_deleted == True:
-            status = self.txn.commit_block()
+            status = self.__commit()
+        else:
+            self.txn.abort()
 
         return status
 
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+NOTES:
+ - Ownership of the leases of the DHCP lease DB by the dnsmasq shards.
+   Every shard runs the dhcp_leases script on its lease events, so a
+   shard must only load the leases it serves at init, and must not
+   delete a lease another shard serves when its own copy of it expires.
+ - A lease belongs to the shard serving the interface on the network of
+   its address, the interface of the longest matching prefix, as the
+   supervisor splits the DHCP ranges. Leases on no local network belong
+   to shard 0.
+ - The supervisor passes the shard and the networks of the interfaces,
+   each with the shard serving it, in the environment of the dnsmasq of
+   every shard, which dnsmasq passes on to the script. Without them, as
+   with a single dnsmasq, every lease is owned.
+ - The module only needs os and socket, it is loaded by the dhcp_leases
+   script on every lease event.
+'''
+
+import os
+import socket
+
+SHARD_ENV = 'DHCP_LEASES_SHARD'
+NETWORKS_ENV = 'DHCP_LEASES_NETWORKS'
+
+
+def address_value(address):
+    '''
+    Family and integer value of an address, raises socket.error if it is
+    not an address.
+    '''
+    family = socket.AF_INET6 if ':' in address else socket.AF_INET
+    value = 0
+    for byte in bytearray(socket.inet_pton(family, address)):
+        value = value << 8 | byte
+    return family, value
+
+
+def format_networks(networks):
+    '''
+    Environment value of (shard, family, network, prefix) networks, the
+    network being the address value shifted right by its host bits.
+    '''
+    items = []
+    for shard, family, network, prefix in networks:
+        bits = 32 if family == socket.AF_INET else 128
+        value = network << (bits - prefix)
+        packed = ''.join(chr(value >> shift & 0xff)
+                         for shift in xrange(bits - 8, -8, -8))
+        items.append('%d=%s/%d' % (shard, socket.inet_ntop(family, packed),
+                                   prefix))
+    return ' '.join(items)
+
+
+def parse_networks(text):
+    '''
+    The (shard, family, network, prefix) of an environment value written
+    by format_networks, skipping the malformed ones.
+    '''
+    networks = []
+    for item in text.split():
+        try:
+            shard, _, cidr = item.partition('=')
+            address, _, prefix = cidr.partition('/')
+            family, value = address_value(address)
+            bits = 32 if family == socket.AF_INET else 128
+            prefix = int(prefix)
+            networks.append((int(shard), family, value >> (bits - prefix),
+                             prefix))
+        except (socket.error, ValueError):
+            continue
+    return networks
+
+
+def address_shard(address, networks):
+    '''
+    Shard owning an address, the shard of the network of the longest
+    matching prefix, 0 if none matches.
+    '''
+    try:
+        family, value = address_value(address)
+    except (socket.error, TypeError):
+        return 0
+
+    bits = 32 if family == socket.AF_INET else 128
+    best = None
+    for network in networks:
+        if network[1] == family and \
+           value >> (bits - network[3]) == network[2] and \
+           (best is None or network[3] > best[3]):
+            best = network
+    return 0 if best is None else best[0]
+
+
+def shard_env(shard, networks):
+    '''
+    Environment telling the dhcp_leases script run by the dnsmasq of a
+    shard which leases it owns, as NAME=value strings.
+    '''
+    return ['%s=%d' % (SHARD_ENV, shard),
+            '%s=%s' % (NETWORKS_ENV, format_networks(networks))]
+
+
+class LeaseOwner(object):
+    '''
+    Tells the leases the dnsmasq running the script owns, from its
+    environment.
+    '''
+    def __init__(self, environ=None):
+        if environ is None:
+            environ = os.environ
+        try:
+            self.shard = int(environ[SHARD_ENV])
+        except (KeyError, ValueError):
+            self.shard = None
+        self.networks = parse_networks(environ.get(NETWORKS_ENV, ''))
+
+    def owns(self, address):
+        if self.shard is None:
+            return True
+        return address_shard(address, self.networks) == self.shard
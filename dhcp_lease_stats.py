@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+NOTES:
+ - Latency instrumentation of the dhcp_leases script. Each run records
+   its wall time, broken out by phase, in a fixed size ring of records in
+   an mmap'ed file that "dhcp_leases stats" summarizes.
+ - Several writers may append at once: every dnsmasq shard runs the
+   script on its own lease events. A writer reserves the next sequence
+   number, and with it a slot, under an flock of the file, clearing the
+   slot stamp and publishing the sequence number in the header before
+   releasing it. It then writes the record and sets the slot stamp
+   without the lock. Readers drop records whose stamp is not their
+   sequence number before and after they were read, so records being
+   written are skipped. Readers map the file read only, take no lock and
+   never resize or reset it.
+ - dnsmasq queues script runs while one is in progress. A run starting
+   right after the previous one ended was queued, so the number of
+   back-to-back runs is recorded as the queue depth. With several shards
+   the previous record may be of another shard, so the depth is an
+   estimate. Events about leases that expired a while ago, and deep
+   queues, are flagged as backlog.
+ - Only the runs of the commands dnsmasq runs the script with are
+   recorded, not those of the operator commands.
+'''
+
+import fcntl
+import math
+import mmap
+import os
+import struct
+import time
+
+# OPS_TODO: Need to pull this from the build env
+stats_file = '/var/run/dhcp_leases.stats'
+
+STATS_MAGIC = 'DLST'
+STATS_VERSION = 1
+STATS_SLOTS = 1024
+
+# magic, version, slots, sequence number of the last record
+HEADER = struct.Struct('<4sIIQ')
+
+PHASES = ('startup', 'import', 'connect', 'sync', 'commit')
+
+# stamp, start time, command, one duration per phase, total duration,
+# age of the event, queue depth, flags
+RECORD = struct.Struct('<Qd8s%ddddII' % len(PHASES))
+
+FLAG_BACKLOG = 0x1
+
+# An event older than this (seconds) or this many queued runs is a backlog
+BACKLOG_AGE = 5.0
+BACKLOG_DEPTH = 10
+
+# Runs starting within this many seconds of the previous one were queued
+QUEUED_GAP = 0.05
+
+# Phase durations of the current run
+phase_times = {}
+
+
+class phase(object):
+    '''
+    Context manager adding the time spent in its block to a phase of the
+    current run.
+    '''
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, unused_type, unused_value, unused_traceback):
+        phase_times[self.name] = phase_times.get(self.name, 0.0) + \
+            time.time() - self.start
+
+
+def process_start_time():
+    '''
+    Wall clock time the current process was started at, so that the
+    interpreter startup is accounted for. None if /proc is unavailable.
+    '''
+    try:
+        with open('/proc/self/stat') as stat:
+            fields = stat.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as uptime:
+            up = float(uptime.read().split()[0])
+    except (IOError, IndexError, ValueError):
+        return None
+
+    # starttime is the 22nd field, the 20th after the command name
+    started = float(fields[19]) / os.sysconf('SC_CLK_TCK')
+    return time.time() - up + started
+
+
+def lease_event_age(now, environ=None):
+    '''
+    Seconds between the moment dnsmasq generated the event and now, when
+    it can be derived from the lease expiry time, else None. An event
+    about a lease that already expired was generated at its expiry time
+    at the latest.
+    '''
+    if environ is None:
+        environ = os.environ
+
+    try:
+        expires = int(environ['DNSMASQ_LEASE_EXPIRES'])
+    except (KeyError, ValueError):
+        return None
+
+    if 'DNSMASQ_LEASE_LENGTH' in environ:
+        try:
+            return max(0.0, now - expires +
+                       int(environ['DNSMASQ_LEASE_LENGTH']))
+        except ValueError:
+            pass
+
+    # Infinite leases are passed with an expiry time of 0
+    if expires and expires <= now:
+        return now - expires
+
+    return None
+
+
+class StatsRing(object):
+    '''
+    The ring in the stats file. A writer creates the file and resets a
+    ring of another format; a readonly ring maps an existing file for
+    reading only and raises ValueError if it does not hold a ring.
+    '''
+    def __init__(self, path=None, slots=STATS_SLOTS, readonly=False):
+        if path is None:
+            path = stats_file
+
+        self.fd = None
+        if readonly:
+            self.__map_readonly(path)
+            return
+
+        size = HEADER.size + slots * RECORD.size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0644)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self.fd).st_size < size:
+                    os.ftruncate(self.fd, size)
+                self.map = mmap.mmap(self.fd, size)
+
+                magic, version, nslots, seq = HEADER.unpack_from(self.map,
+                                                                 0)
+                if magic != STATS_MAGIC or version != STATS_VERSION or \
+                   nslots != slots:
+                    self.map[:size] = '\0' * size
+                    HEADER.pack_into(self.map, 0, STATS_MAGIC,
+                                     STATS_VERSION, slots, 0)
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+        except Exception:
+            os.close(self.fd)
+            raise
+        self.slots = slots
+
+    def __map_readonly(self, path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            if size < HEADER.size:
+                raise ValueError("%s holds no stats ring" % (path))
+            self.map = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+        magic, version, slots, seq = HEADER.unpack_from(self.map, 0)
+        if magic != STATS_MAGIC or version != STATS_VERSION or \
+           not slots or size < HEADER.size + slots * RECORD.size:
+            self.map.close()
+            raise ValueError("%s holds no stats ring" % (path))
+        self.slots = slots
+
+    def close(self):
+        self.map.close()
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def sequence(self):
+        return HEADER.unpack_from(self.map, 0)[3]
+
+    def __offset(self, seq):
+        return HEADER.size + ((seq - 1) % self.slots) * RECORD.size
+
+    def read(self, seq):
+        '''
+        Return the record with sequence number seq, or None if it was
+        overwritten or is being written.
+        '''
+        offset = self.__offset(seq)
+        record = RECORD.unpack_from(self.map, offset)
+        if record[0] != seq or \
+           struct.unpack_from('<Q', self.map, offset)[0] != seq:
+            return None
+        return record
+
+    def reserve(self):
+        '''
+        Reserve the next sequence number, and its slot, for a record.
+        '''
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            seq = self.sequence() + 1
+            struct.pack_into('<Q', self.map, self.__offset(seq), 0)
+            HEADER.pack_into(self.map, 0, STATS_MAGIC, STATS_VERSION,
+                             self.slots, seq)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        return seq
+
+    def append(self, start, command, phases, total, age, depth, flags):
+        seq = self.reserve()
+        offset = self.__offset(seq)
+
+        RECORD.pack_into(self.map, offset, 0, start, command[:8],
+                         *([phases.get(name, 0.0) for name in PHASES] +
+                           [total, age, depth, flags]))
+        struct.pack_into('<Q', self.map, offset, seq)
+
+    def records(self):
+        '''
+        Yield the records still in the ring, oldest first, as dicts.
+        '''
+        last = self.sequence()
+        for seq in xrange(max(1, last - self.slots + 1), last + 1):
+            record = self.read(seq)
+            if record is None:
+                continue
+
+            values = list(record[3:])
+            entry = {'seq': seq, 'start': record[1],
+                     'command': record[2].rstrip('\0')}
+            for name in PHASES + ('total', 'age'):
+                entry[name] = values.pop(0)
+            entry['depth'], entry['flags'] = values
+            yield entry
+
+
+def record_run(command, start, end=None, path=None):
+    '''
+    Append the current run to the ring. Instrumentation must never fail
+    a lease event, so errors are ignored.
+    '''
+    if end is None:
+        end = time.time()
+
+    try:
+        ring = StatsRing(path)
+    except (IOError, OSError, ValueError, mmap.error):
+        return
+
+    try:
+        phases = dict(phase_times)
+        started = process_start_time()
+        if started is not None and started <= start:
+            phases['startup'] = start - started
+            start = started
+
+        depth = 0
+        last = ring.sequence()
+        previous = ring.read(last) if last else None
+        if previous is not None:
+            previous_end = previous[1] + previous[3 + len(PHASES)]
+            if start - previous_end <= QUEUED_GAP:
+                depth = previous[-2] + 1
+
+        age = lease_event_age(end)
+        flags = 0
+        if (age is not None and age > BACKLOG_AGE) or \
+           depth >= BACKLOG_DEPTH:
+            flags |= FLAG_BACKLOG
+
+        ring.append(start, command, phases, end - start,
+                    float('nan') if age is None else age, depth, flags)
+    except (IOError, OSError, ValueError, struct.error):
+        pass
+    finally:
+        ring.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1,
+                      int(math.ceil(fraction * len(values))) - 1)]
+
+
+def summarize(records):
+    '''
+    Summarize the records as p50/p99 latencies (milliseconds) per command
+    and per phase.
+    '''
+    by_command = {}
+    for entry in records:
+        by_command.setdefault(entry['command'], []).append(entry)
+
+    summary = {}
+    for command, entries in by_command.iteritems():
+        stats = {'count': len(entries),
+                 'backlog': sum(1 for e in entries
+                                if e['flags'] & FLAG_BACKLOG),
+                 'max_depth': max(e['depth'] for e in entries)}
+        ages = [e['age'] for e in entries if not math.isnan(e['age'])]
+        stats['max_age'] = max(ages) if ages else None
+        for name in PHASES + ('total',):
+            values = [e[name] * 1000 for e in entries]
+            stats[name] = {'p50': round(percentile(values, 0.5), 3),
+                           'p99': round(percentile(values, 0.99), 3)}
+        summary[command] = stats
+
+    return summary
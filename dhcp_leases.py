@@ -14,19 +14,44 @@
 #    License for the specific language governing permissions and limitations
 #    under the License..
 
-import argparse
+'''
+NOTES:
+ - dnsmasq runs this script serially for every lease event, so the
+   startup cost is paid once per event. Only os and sys are imported at
+   module load; every command imports what it needs, and commands that
+   have nothing to do (tftp) return before any OVS module is loaded.
+ - With several dnsmasq shards every shard runs the script. init only
+   prints the leases of the shard and del leaves the leases of other
+   shards alone, see dhcp_lease_shard.
+ - The lease commands dnsmasq runs are timed for "dhcp_leases stats".
+   dhcp_lease_stats, and the mmap module it needs, is loaded by the lease
+   commands only.
+'''
+
 import os
-import json
 import sys
-import subprocess
 
-import ovs.dirs
-from ovs.db import error
-from ovs.db import types
-import ovs.db.idl
-from dhcp_lease_db import DHCPLeaseDB
+vlog = None
+
+
+def get_vlog():
+    global vlog
 
-vlog = ovs.vlog.Vlog("dhcp_leases")
+    if vlog is None:
+        import ovs.vlog
+        vlog = ovs.vlog.Vlog("dhcp_leases")
+
+    return vlog
+
+
+def phase(name):
+    '''
+    Times a block of a lease command as a phase of the run, see
+    dhcp_lease_stats.phase. The phases of the operator commands are not
+    recorded.
+    '''
+    import dhcp_lease_stats
+    return dhcp_lease_stats.phase(name)
 
 
 def print_to_stdout(dhcp_lease_entry):
@@ -38,15 +63,20 @@ def print_to_stdout(dhcp_lease_entry):
            dhcp_lease_entry["client_id"])
 
 
-def dhcp_leases_show():
+def dhcp_leases_show(unused_dhcp_lease_entry, owner=None):
+    with phase('import'):
+        from dhcp_lease_db import get_lease_db
 
-    dhcp_leases = DHCPLeaseDB()
+    dhcp_leases = get_lease_db()
 
     dhcp_lease_entry = {}
 
     # OPS_TODO:
     # Print dhcp_leases.idl.change_seqno
     for ovs_rec in dhcp_leases.idl.tables["DHCP_Lease"].rows.itervalues():
+        if owner is not None and not owner.owns(ovs_rec.ip_address):
+            continue
+
         dhcp_lease_entry = {"expiry_time": "*", "mac_address": "*",
                             "ip_address": "*", "client_hostname": "*",
                             "client_id": "*"}
@@ -64,7 +94,16 @@ def dhcp_leases_show():
 
         print_to_stdout(dhcp_lease_entry)
 
-    dhcp_leases.close()
+
+def dhcp_leases_init(dhcp_lease_entry):
+    '''
+    Print the leases dnsmasq loads at startup, with several dnsmasq
+    shards only the ones of the shard running the script.
+    '''
+    with phase('import'):
+        from dhcp_lease_shard import LeaseOwner
+
+    dhcp_leases_show(dhcp_lease_entry, LeaseOwner())
 
 '''
 Using ovsdb-client as python IDL doesn't scale well for large
@@ -85,141 +124,345 @@ OPS-TODO
 
 
 def dhcp_leases_add(dhcp_lease_entry):
-
-    add_row_cmd = 'ovsdb-client transact \'["dhcp_leases",{"op":"insert", \
-                  "table":"DHCP_Lease", "row":{ "expiry_time":"%s", \
-                  "mac_address":"%s", "ip_address":"%s", \
-                  "client_hostname":"%s", "client_id": "%s" } }]\'' % (
-                  dhcp_lease_entry["expiry_time"],
-                  dhcp_lease_entry["mac_address"],
-                  dhcp_lease_entry["ip_address"],
-                  dhcp_lease_entry["client_hostname"],
-                  dhcp_lease_entry["client_id"])
-
-    dhcp_leases_insert_process = subprocess.Popen(add_row_cmd,
-                                                  stdout=subprocess.PIPE,
-                                                  stderr=subprocess.PIPE,
-                                                  shell=True)
-
-    if "error" in dhcp_leases_insert_process.stdout.read():
-        vlog.err("dhcp_leases add_row_cmd failed")
+    with phase('import'):
+        import json
+        import subprocess
+
+    # The hostname and client_id come from the client, the transaction is
+    # passed as a single argument, without a shell
+    row = dict((column, dhcp_lease_entry[column])
+               for column in ("expiry_time", "mac_address", "ip_address",
+                              "client_hostname", "client_id"))
+    add_row_cmd = ["ovsdb-client", "transact",
+                   json.dumps(["dhcp_leases",
+                               {"op": "insert", "table": "DHCP_Lease",
+                                "row": row}])]
+
+    with phase('commit'):
+        dhcp_leases_insert_process = subprocess.Popen(add_row_cmd,
+                                                      stdout=subprocess.PIPE,
+                                                      stderr=subprocess.PIPE,
+                                                      close_fds=True)
+        output, err = dhcp_leases_insert_process.communicate()
+
+    if dhcp_leases_insert_process.returncode != 0 or "error" in output:
+        get_vlog().err("dhcp_leases add_row_cmd failed: %s"
+                       % (err.strip() or output.strip()))
 
 
 def dhcp_leases_update(dhcp_lease_entry):
+    with phase('import'):
+        import ovs.db.idl
+        from dhcp_lease_db import get_lease_db
 
-    dhcp_leases = DHCPLeaseDB()
+    dhcp_leases = get_lease_db()
 
     row, status = dhcp_leases.update_row(dhcp_lease_entry["mac_address"],
                                          dhcp_lease_entry)
 
     if status != ovs.db.idl.Transaction.SUCCESS:
-        vlog.err("dhcp_leases update_row failed")
-
-    dhcp_leases.close()
+        get_vlog().err("dhcp_leases update_row failed")
 
 
 def dhcp_leases_delete(dhcp_lease_entry):
-
-    dhcp_leases = DHCPLeaseDB()
+    with phase('import'):
+        import ovs.db.idl
+        from dhcp_lease_db import get_lease_db
+        from dhcp_lease_shard import LeaseOwner
+
+    dhcp_leases = get_lease_db()
+
+    # With several dnsmasq shards, the lease of the MAC address may have
+    # moved to another shard, which still serves it
+    row, row_found = dhcp_leases.find_row_by_mac_addr(
+        dhcp_lease_entry["mac_address"])
+    if row_found and not LeaseOwner().owns(row.ip_address):
+        get_vlog().dbg("dhcp_leases lease of %s owned by another shard, "
+                       "not deleted" % (dhcp_lease_entry["mac_address"]))
+        return
 
     row, status = dhcp_leases.delete_row(dhcp_lease_entry["mac_address"])
 
     if status != ovs.db.idl.Transaction.SUCCESS:
-        vlog.err("dhcp_leases delete_row failed")
-
-    dhcp_leases.close()
+        get_vlog().err("dhcp_leases delete_row failed")
 
 
-def dhcp_leases_clear_db():
+def dhcp_leases_clear_db(unused_dhcp_lease_entry):
     '''
     We need to clear the db if the dhcp config is not present and
     dnsmasq is starting for the first time
     '''
-    dhcp_leases = DHCPLeaseDB()
+    with phase('import'):
+        import ovs.db.idl
+        from dhcp_lease_db import get_lease_db
+
+    dhcp_leases = get_lease_db()
 
     status = dhcp_leases.clear_db()
 
     if status != ovs.db.idl.Transaction.SUCCESS:
-        vlog.err("dhcp_leases clear_db failed")
+        get_vlog().err("dhcp_leases clear_db failed")
 
-    dhcp_leases.close()
 
+def dhcp_leases_analytics(argv):
+    '''
+    Print fleet level lease statistics as JSON. With --synthetic the
+    report is computed over randomly generated leases instead of the DB.
+    '''
+    import argparse
+    import json
+    import time
+    import dhcp_lease_analytics as analytics
+
+    parser = argparse.ArgumentParser(prog="dhcp_leases analytics")
+    parser.add_argument("--top", type=int,
+                        default=analytics.DEFAULT_TOP_HOSTNAMES,
+                        help="Number of hostnames to report.")
+    parser.add_argument("--synthetic", type=int, metavar="COUNT",
+                        help="Analyze COUNT generated leases.")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    if args.synthetic is not None:
+        if analytics.numpy is None:
+            get_vlog().err("dhcp_leases analytics --synthetic requires NumPy")
+            sys.exit(1)
+        columns = analytics.synthetic_columns(args.synthetic)
+    else:
+        from dhcp_lease_db import get_lease_db
 
-def main():
+        dhcp_leases = get_lease_db()
+        columns = analytics.load_columns(
+            dhcp_leases.idl.tables["DHCP_Lease"].rows.itervalues())
 
-    dhcp_lease_entry = {"expiry_time": "*", "mac_address": "*",
-                        "ip_address": "*",
-                        "client_hostname": "*", "client_id": "*"}
+    report = analytics.analyze(columns, top=args.top)
+    report["elapsed"] = round(time.time() - start, 6)
 
-    argv = sys.argv
-    num_args = len(argv)
+    print json.dumps(report, sort_keys=True, indent=2)
 
-    if num_args < 2:
-        vlog.err("Error in arguments passed to dhcp_leases script, Exiting")
-        sys.exit()
 
-    parser = argparse.ArgumentParser()
+def dhcp_leases_export(argv):
+    '''
+    Stream every lease to a JSON Lines or CSV dump.
+    '''
+    import argparse
+    import dhcp_lease_bulk as bulk
+    from dhcp_lease_db import get_lease_db
+
+    parser = argparse.ArgumentParser(prog="dhcp_leases export")
+    parser.add_argument("--format", choices=bulk.FORMATS,
+                        help="Dump format, guessed from the file name by "
+                             "default.")
+    parser.add_argument("file", nargs="?", default="-",
+                        help="Dump file, - for stdout.")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or bulk.guess_format(args.file)
+    if args.file == "-":
+        bulk.export_leases(get_lease_db(), sys.stdout, fmt)
+    else:
+        with open(args.file, "wb") as out:
+            bulk.export_leases(get_lease_db(), out, fmt)
+
 
+def dhcp_leases_import(argv):
+    '''
+    Stream a dump written by "dhcp_leases export" back into the DB.
+    '''
+    import argparse
+    import dhcp_lease_bulk as bulk
+    from dhcp_lease_db import get_lease_db
+
+    parser = argparse.ArgumentParser(prog="dhcp_leases import")
+    parser.add_argument("--format", choices=bulk.FORMATS,
+                        help="Dump format, guessed from the file name by "
+                             "default.")
+    parser.add_argument("--chunk-size", type=int,
+                        default=bulk.DEFAULT_CHUNK_SIZE,
+                        help="Leases committed per transaction.")
+    parser.add_argument("--progress", action="store_true",
+                        help="Report progress on stderr after each chunk.")
+    parser.add_argument("file", nargs="?", default="-",
+                        help="Dump file, - for stdin.")
+    args = parser.parse_args(argv)
+
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be positive")
+
+    fmt = args.format or bulk.guess_format(args.file)
+    progress = sys.stderr if args.progress else None
+    if args.file == "-":
+        totals = bulk.import_leases(get_lease_db(),
+                                    bulk.read_leases(sys.stdin, fmt),
+                                    args.chunk_size, progress)
+    else:
+        with open(args.file, "rb") as stream:
+            totals = bulk.import_leases(get_lease_db(),
+                                        bulk.read_leases(stream, fmt),
+                                        args.chunk_size, progress)
+
+    print "%(inserted)d inserted, %(updated)d updated, " \
+          "%(unchanged)d unchanged, %(failed)d failed" % totals
+
+    if totals["failed"]:
+        get_vlog().err("dhcp_leases import failed for %d leases"
+                       % totals["failed"])
+        sys.exit(1)
+
+
+def dhcp_leases_stats(argv):
+    '''
+    Summarize the latency of the recorded runs as p50/p99 per command.
+    '''
+    import argparse
+    import json
+
+    import dhcp_lease_stats
+
+    parser = argparse.ArgumentParser(prog="dhcp_leases stats")
+    parser.add_argument("--json", action="store_true",
+                        help="Print the summary as JSON.")
+    args = parser.parse_args(argv)
+
+    try:
+        ring = dhcp_lease_stats.StatsRing(readonly=True)
+    except (EnvironmentError, ValueError):
+        print "No dhcp_leases runs recorded"
+        return
+
+    summary = dhcp_lease_stats.summarize(ring.records())
+    ring.close()
+
+    if args.json:
+        print json.dumps(summary, sort_keys=True, indent=2)
+        return
+
+    print "%-8s %7s %7s %9s %9s %s" % ("Command", "Count", "Backlog",
+                                        "Max depth", "Max age", "Latency "
+                                        "p50/p99 (ms)")
+    for command in sorted(summary):
+        entry = summary[command]
+        max_age = "-" if entry["max_age"] is None else \
+            "%.1fs" % entry["max_age"]
+        latency = " ".join("%s %.1f/%.1f" % (name, entry[name]["p50"],
+                                            entry[name]["p99"])
+                           for name in dhcp_lease_stats.PHASES +
+                           ("total",))
+        print "%-8s %7d %7d %9d %9s %s" % (command, entry["count"],
+                                           entry["backlog"],
+                                           entry["max_depth"], max_age,
+                                           latency)
+
+
+# Positional lease arguments passed by dnsmasq after the command
+LEASE_ARGS = ("mac_address", "ip_address", "client_hostname", "client_id")
+
+
+def dhcp_lease_entry_from_argv(argv):
     '''
     Dnsmasq invokes this script as:
       - dhcp_leases init
       - dhcp_leases add <mac_addr> <ip_addr> <hostname> <client-id>
       - dhcp_leases del <mac_addr> <ip_addr> <hostname> <client-id>
       - dhcp_leases old <mac_addr> <ip_addr> <hostname> <client-id>
+      - dhcp_leases tftp <size> <ip_addr> <file>
     If the DHCP clients don't send hostname or client-id, dnsmasq wouldn't
     pass the values for it while invoking dhcp_leases script. So, the number
-    of arguments would vary for any command.
-
-    OPS_TODO:
-      Fix the folllowing argument parsing - instead of parsing it based on
-      the number of arguments, do it in a generic way that handles all the
-      cases.
-    '''
-    parser.add_argument(action="store", dest='command')
-    if num_args > 2:
-        parser.add_argument(action="store", dest='mac_address')
-    if num_args > 3:
-        parser.add_argument(action="store", dest='ip_address')
-    if num_args > 4:
-        parser.add_argument(action="store", dest='client_hostname')
-    if num_args > 5:
-        parser.add_argument(action="store", dest='client_id')
-
-    args = parser.parse_args()
-
-    if num_args > 2:
-        dhcp_lease_entry["mac_address"] = args.mac_address
-        dhcp_lease_entry["expiry_time"] = os.environ["DNSMASQ_LEASE_EXPIRES"]
-    if num_args > 3:
-        dhcp_lease_entry["ip_address"] = args.ip_address
-    if num_args > 4:
-        dhcp_lease_entry["client_hostname"] = args.client_hostname
-    if num_args > 5:
-        dhcp_lease_entry["client_id"] = args.client_id
-
-    command = args.command
-
-    if command == "init" or command == "show":
-        dhcp_leases_show()
-    elif command == "add":
-        dhcp_leases_add(dhcp_lease_entry)
-    elif command == "del":
-        dhcp_leases_delete(dhcp_lease_entry)
-    elif command == "old":
-        dhcp_leases_update(dhcp_lease_entry)
-    elif command == "tftp":
-        sys.exit()
-    elif command == "clear":
-        dhcp_leases_clear_db()
-    else:
-        vlog.err("Invalid command %s to dhcp_leases script.... Exiting"
-                 % (command))
-        sys.exit()
+    of arguments would vary for any command and the missing trailing
+    values are left as "*".
+    '''
+    dhcp_lease_entry = {"expiry_time": "*", "mac_address": "*",
+                        "ip_address": "*",
+                        "client_hostname": "*", "client_id": "*"}
+
+    for key, value in zip(LEASE_ARGS, argv[2:]):
+        dhcp_lease_entry[key] = value
+
+    if len(argv) > 2:
+        dhcp_lease_entry["expiry_time"] = \
+            os.environ.get("DNSMASQ_LEASE_EXPIRES", "*")
+
+    return dhcp_lease_entry
+
+
+# Commands taking the lease entry parsed from the positional arguments
+LEASE_COMMANDS = {
+    "init": dhcp_leases_init,
+    "show": dhcp_leases_show,
+    "add": dhcp_leases_add,
+    "del": dhcp_leases_delete,
+    "old": dhcp_leases_update,
+    "clear": dhcp_leases_clear_db,
+}
+
+# Commands dnsmasq runs the script with, timed for "dhcp_leases stats"
+RECORDED_COMMANDS = ("init", "add", "del", "old")
+
+# Commands parsing their own options
+OPTION_COMMANDS = {
+    "analytics": dhcp_leases_analytics,
+    "export": dhcp_leases_export,
+    "import": dhcp_leases_import,
+    "stats": dhcp_leases_stats,
+}
+
+
+def main(argv=None):
+    '''
+    Operators can also run:
+      - dhcp_leases show
+      - dhcp_leases clear
+      - dhcp_leases analytics [--top N] [--synthetic COUNT]
+      - dhcp_leases export [--format jsonl|csv] [FILE]
+      - dhcp_leases import [--format jsonl|csv] [--chunk-size N]
+                           [--progress] [FILE]
+      - dhcp_leases stats [--json]
+    The lease commands dnsmasq runs are timed and recorded for
+    "dhcp_leases stats", the operator ones are not.
+    '''
+    if argv is None:
+        argv = sys.argv
+
+    if len(argv) < 2:
+        get_vlog().err("Error in arguments passed to dhcp_leases script, "
+                       "Exiting")
+        return
+
+    command = argv[1]
+
+    # TFTP transfer notifications have nothing to record
+    if command == "tftp":
+        return
+
+    start = None
+    try:
+        if command in LEASE_COMMANDS:
+            if command in RECORDED_COMMANDS:
+                import time
+                import dhcp_lease_stats
+                start = time.time()
+                dhcp_lease_stats.phase_times.clear()
+            LEASE_COMMANDS[command](dhcp_lease_entry_from_argv(argv))
+        elif command in OPTION_COMMANDS:
+            OPTION_COMMANDS[command](argv[2:])
+        else:
+            get_vlog().err("Invalid command %s to dhcp_leases script.... "
+                           "Exiting" % (command))
+    finally:
+        # Commands share one lease DB connection, opened on first use
+        if "dhcp_lease_db" in sys.modules:
+            sys.modules["dhcp_lease_db"].close_lease_db()
+
+        if start is not None:
+            dhcp_lease_stats.record_run(command, start)
 
 
 if __name__ == '__main__':
     try:
         main()
         sys.exit()
-    except error.Error, e:
-        vlog.err("Error: \"%s\" \n" % e)
+    except Exception, e:
+        from ovs.db import error
+        if not isinstance(e, error.Error):
+            raise
+        get_vlog().err("Error: \"%s\" \n" % e)
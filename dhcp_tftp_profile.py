@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+NOTES:
+ - Profiling of the running DHCP-TFTP daemon, turned on and off with
+   "ovs-appctl -t ops_dhcp_tftp dhcp-tftp/profile".
+ - The cprofile profiler counts and times every python call, at a cost
+   on every call. The sample profiler records the python stack every
+   SAMPLE_MSEC of CPU time the daemon uses, from a SIGPROF handler, at a
+   cost that only depends on the sample rate. An idle daemon uses no CPU
+   time and is not sampled.
+ - The python signal wakeup fd is written on every signal, and would
+   wake the daemon main loop up on every sample. The sample profiler
+   turns it off while it runs and restores it when stopped, the daemon
+   watching its children on a timer meanwhile.
+ - While profiling is stopped no profile hook, signal handler or timer
+   is installed, so the daemon runs as without the profiler.
+ - A cprofile profile is dumped in the pstats format, samples as
+   collapsed stacks, one "frame;frame;... count" line per stack, as
+   flame graph tools read them.
+'''
+
+import cProfile
+import os
+import signal
+import time
+
+MODES = ('cprofile', 'sample')
+
+# CPU time between two samples of the sample profiler
+SAMPLE_MSEC = 10
+
+
+class Profiler(object):
+    def __init__(self):
+        # Running mode, or None while stopped
+        self.mode = None
+        # Profile of the last run, a cProfile.Profile or the sample count
+        # of every collapsed stack
+        self.profile = None
+        self.samples = None
+        self.started = None
+        self.duration = 0.0
+        # Signal wakeup fd turned off while sampling
+        self.wakeup_fd = -1
+
+    def start(self, mode='cprofile'):
+        '''
+        Starts a new profile, the profile of the previous run is dropped.
+        Raises ValueError if profiling is already started.
+        '''
+        if self.mode is not None:
+            raise ValueError("%s profiling already started" % (self.mode))
+        if mode not in MODES:
+            raise ValueError("unknown profiler %s, %s expected"
+                             % (mode, " or ".join(MODES)))
+
+        self.profile = None
+        self.samples = None
+        if mode == 'cprofile':
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            self.samples = {}
+            self.wakeup_fd = signal.set_wakeup_fd(-1)
+            signal.signal(signal.SIGPROF, self.sample)
+            # Restart the system calls the signal interrupts
+            signal.siginterrupt(signal.SIGPROF, False)
+            signal.setitimer(signal.ITIMER_PROF, SAMPLE_MSEC / 1000.0,
+                             SAMPLE_MSEC / 1000.0)
+
+        self.mode = mode
+        self.started = time.time()
+
+    def sampling(self):
+        return self.mode == 'sample'
+
+    def sample(self, unused_signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append("%s:%s" % (os.path.basename(code.co_filename),
+                                    code.co_name))
+            frame = frame.f_back
+        stack.reverse()
+        key = ";".join(stack)
+        self.samples[key] = self.samples.get(key, 0) + 1
+
+    def stop(self):
+        '''
+        Stops profiling, the profile is kept until the next start.
+        '''
+        if self.mode is None:
+            raise ValueError("profiling not started")
+
+        if self.mode == 'cprofile':
+            self.profile.disable()
+        else:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+            signal.set_wakeup_fd(self.wakeup_fd)
+            self.wakeup_fd = -1
+
+        self.duration = time.time() - self.started
+        self.mode = None
+
+    def dump(self, path):
+        '''
+        Writes the profile to path, pstats for cprofile and collapsed
+        stacks for samples. A running profile is dumped as it is so far
+        and keeps running.
+        '''
+        if self.profile is not None:
+            # Making the stats disables the profiler
+            self.profile.dump_stats(path)
+            if self.mode is not None:
+                self.profile.enable()
+        elif self.samples is not None:
+            # Copied first, the signal handler may add samples meanwhile
+            samples = sorted(self.samples.items(),
+                             key=lambda item: item[1], reverse=True)
+            with open(path, "w") as f:
+                for stack, count in samples:
+                    f.write("%s %d\n" % (stack, count))
+        else:
+            raise ValueError("no profile to dump")
+
+    def report(self):
+        if self.mode is not None:
+            return ("%s profiling for %.1f seconds\n"
+                    % (self.mode, time.time() - self.started))
+        if self.profile is not None or self.samples is not None:
+            return ("Profiling stopped, %s profile of %.1f seconds\n"
+                    % ('cprofile' if self.profile is not None
+                       else 'sample', self.duration))
+        return "Profiling stopped\n"
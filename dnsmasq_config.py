@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+NOTES:
+ - Model of a dnsmasq configuration, the arguments of one dnsmasq
+   process grouped by kind. It is the single source of the argv dnsmasq
+   is executed with, of the fingerprint saved for adoption and of the
+   command line shown in logs and diagnostic dumps.
+ - dnsmasq is executed with the argv list, without a shell, so host
+   names, tags and option values are passed as they are and never need
+   quoting. The command line shown is quoted for a shell only for
+   display.
+ - The DHCP ranges and static hosts are kept with the address they were
+   rendered from, which tells the interface they are served on.
+ - The arguments of every kind but the command, log and interfaces are
+   kept sorted, the DHCP ranges and static hosts by address, so that two
+   configs with the same arguments are equal and have the same
+   fingerprint whatever the order they were rendered in.
+ - The config also holds the environment variables dnsmasq is executed
+   with, added to the environment of the daemon children. dnsmasq passes
+   them on to the dhcp_leases script. They are part of the fingerprint
+   and shown before the command line.
+'''
+
+import hashlib
+import pipes
+import socket
+
+# Argument kinds, in the order of the dnsmasq argv
+KINDS = ('command', 'log', 'interfaces', 'ranges', 'hosts', 'options',
+         'matches', 'boots', 'settings', 'tftp')
+
+# Kinds holding (address, argument) pairs instead of arguments
+ADDRESSED_KINDS = ('ranges', 'hosts')
+
+# Kinds whose arguments are kept in the order given
+ORDERED_KINDS = ('command', 'log', 'interfaces')
+
+# Environment variables of dnsmasq, NAME=value strings, and the kinds
+# with them
+ENV = 'env'
+FIELDS = KINDS + (ENV,)
+
+
+def address_order(pair):
+    '''
+    Sort key of an (address, argument) pair, the addresses of a family in
+    numeric order. Hosts without an address come first.
+    '''
+    address, argument = pair
+    if address is None:
+        return (0, '', argument)
+
+    family = socket.AF_INET6 if ':' in address else socket.AF_INET
+    try:
+        return (family, socket.inet_pton(family, address), argument)
+    except socket.error:
+        # Invalid addresses are rejected by the validators
+        return (family + 1, address, argument)
+
+
+class DnsmasqConfig(object):
+    __slots__ = FIELDS
+
+    def __init__(self, **kinds):
+        for kind in FIELDS:
+            if kind in ADDRESSED_KINDS:
+                value = tuple(sorted((tuple(pair)
+                                      for pair in kinds.pop(kind, ())),
+                                     key=address_order))
+            elif kind in ORDERED_KINDS:
+                value = tuple(kinds.pop(kind, ()))
+            else:
+                value = tuple(sorted(kinds.pop(kind, ())))
+            setattr(self, kind, value)
+        if kinds:
+            raise TypeError("unknown dnsmasq argument kinds: %s"
+                            % ", ".join(sorted(kinds)))
+
+    def replace(self, **kinds):
+        '''
+        Copy of the config with the arguments of some kinds replaced.
+        '''
+        for kind in FIELDS:
+            kinds.setdefault(kind, getattr(self, kind))
+        return DnsmasqConfig(**kinds)
+
+    def arguments(self, kind):
+        if kind in ADDRESSED_KINDS:
+            return [argument for _, argument in getattr(self, kind)]
+        return list(getattr(self, kind))
+
+    def argv(self):
+        argv = []
+        for kind in KINDS:
+            argv.extend(self.arguments(kind))
+        return argv
+
+    def conf_lines(self):
+        '''
+        The arguments in the syntax of a dnsmasq configuration file, but
+        for the dnsmasq executable.
+        '''
+        return [argument[2:] if argument.startswith('--') else argument
+                for argument in self.argv()[1:]]
+
+    def environ(self, base):
+        '''
+        The environment of dnsmasq, base with the config variables.
+        '''
+        environ = dict(base)
+        environ.update(variable.split('=', 1) for variable in self.env)
+        return environ
+
+    def fingerprint(self):
+        return hashlib.sha1('\0'.join(self.argv() + list(self.env))) \
+            .hexdigest()
+
+    def diff(self, other):
+        '''
+        The arguments removed and added from other to this config, as a
+        list of (kind, removed, added) for the kinds that differ.
+        '''
+        changes = []
+        for kind in FIELDS:
+            old = other.arguments(kind) if other is not None else []
+            new = self.arguments(kind)
+            old_set = set(old)
+            new_set = set(new)
+            if old_set == new_set:
+                continue
+            changes.append((kind,
+                            [argument for argument in old
+                             if argument not in new_set],
+                            [argument for argument in new
+                             if argument not in old_set]))
+        return changes
+
+    def to_dict(self):
+        '''
+        JSON serializable form of the config.
+        '''
+        data = {}
+        for kind in FIELDS:
+            value = getattr(self, kind)
+            if value:
+                data[kind] = [list(item) if kind in ADDRESSED_KINDS
+                              else item for item in value]
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        return DnsmasqConfig(**data)
+
+    def _key(self):
+        return tuple(getattr(self, kind) for kind in FIELDS)
+
+    def __eq__(self, other):
+        return isinstance(other, DnsmasqConfig) and \
+            self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __str__(self):
+        return ' '.join(pipes.quote(argument)
+                        for argument in list(self.env) + self.argv())
+
+    def __repr__(self):
+        return 'DnsmasqConfig(%s)' % (str(self))
+
+
+def format_diff(changes):
+    '''
+    One line per changed kind of a DnsmasqConfig.diff().
+    '''
+    lines = []
+    for kind, removed, added in changes:
+        parts = ['-' + argument for argument in removed]
+        parts.extend('+' + argument for argument in added)
+        lines.append('%s: %s' % (kind, ' '.join(parts)))
+    return lines
+
+
+def configs_fingerprint(configs):
+    '''
+    Fingerprint of the configs of all the dnsmasq shards, None for a
+    shard without a config.
+    '''
+    return hashlib.sha1('\n'.join('-' if config is None
+                                  else config.fingerprint()
+                                  for config in configs)).hexdigest()
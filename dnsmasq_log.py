@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+NOTES:
+ - dnsmasq logs to a named FIFO owned by the DHCP-TFTP daemon instead of
+   a file in /tmp, which is RAM backed and grew without limit.
+ - The daemon opens the read end non-blocking before dnsmasq is started,
+   polls it from its main loop and keeps the last lines in a ring bounded
+   in bytes. It also holds a write end open itself, so that the read end
+   never sees an end of file while dnsmasq restarts.
+ - dnsmasq is run with --log-async, it then writes the log non-blocking
+   and drops lines rather than stall its single threaded loop when the
+   daemon is late reading them.
+ - The lines can also be appended to a file on disk, rotated to a single
+   ".1" file when it reaches its size limit.
+'''
+
+import errno
+import os
+import stat
+from collections import deque
+
+import ovs.poller
+import ovs.vlog
+
+vlog = ovs.vlog.Vlog("dnsmasq_log")
+
+DEFAULT_FIFO = '/var/run/dnsmasq-log.fifo'
+DEFAULT_RING_BYTES = 1 << 20
+DEFAULT_FILE_BYTES = 4 << 20
+
+READ_CHUNK = 64 * 1024
+
+# Longest partial line kept while waiting for its end
+MAX_LINE = 4096
+
+
+def file_tail(path, max_bytes):
+    '''
+    The last whole lines of a file within max_bytes, read with a single
+    seek whatever the size of the file.
+    '''
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            start = max(0, size - max_bytes)
+            f.seek(start)
+            data = f.read(size - start)
+    except IOError:
+        return ""
+
+    if start > 0:
+        # Skip the partial first line
+        data = data[data.find("\n") + 1:]
+    return data
+
+
+class DnsmasqLog(object):
+    def __init__(self, fifo=DEFAULT_FIFO, ring_bytes=DEFAULT_RING_BYTES,
+                 log_file=None, file_bytes=DEFAULT_FILE_BYTES):
+        self.fifo = fifo
+        self.ring_bytes = ring_bytes
+        self.log_file = log_file
+        self.file_bytes = file_bytes
+        self.lines = deque()
+        self.bytes = 0
+        self.partial = ""
+        self.dropped = 0
+        self.read_fd = None
+        self.write_fd = None
+        self.file = None
+
+    def open(self):
+        '''
+        Create the FIFO and open both of its ends. Must be called before
+        dnsmasq is started, dnsmasq would block opening a FIFO without
+        a reader.
+        '''
+        try:
+            if not stat.S_ISFIFO(os.lstat(self.fifo).st_mode):
+                os.unlink(self.fifo)
+                os.mkfifo(self.fifo, 0o600)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            os.mkfifo(self.fifo, 0o600)
+
+        self.read_fd = os.open(self.fifo, os.O_RDONLY | os.O_NONBLOCK)
+        self.write_fd = os.open(self.fifo, os.O_WRONLY | os.O_NONBLOCK)
+
+        if self.log_file is not None:
+            self.open_file()
+
+    def open_file(self):
+        try:
+            self.file = open(self.log_file, "a")
+        except IOError as e:
+            vlog.err("cannot open dnsmasq log file %s: %s"
+                     % (self.log_file, e))
+            self.file = None
+
+    def facility(self):
+        '''
+        dnsmasq arguments logging to the FIFO.
+        '''
+        return ['--log-facility=' + self.fifo, '--log-async']
+
+    def wait(self, poller):
+        if self.read_fd is not None:
+            poller.fd_wait(self.read_fd, ovs.poller.POLLIN)
+
+    def run(self):
+        '''
+        Read the pending log lines into the ring and the log file.
+        '''
+        if self.read_fd is None:
+            return
+
+        chunks = []
+        while True:
+            try:
+                data = os.read(self.read_fd, READ_CHUNK)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EINTR):
+                    break
+                raise
+            if not data:
+                break
+            chunks.append(data)
+
+        if not chunks:
+            return
+
+        data = self.partial + "".join(chunks)
+        end = data.rfind("\n") + 1
+        self.partial = data[end:][:MAX_LINE]
+        if end == 0:
+            return
+
+        lines = data[:end].splitlines(True)
+        for line in lines:
+            self.lines.append(line)
+            self.bytes += len(line)
+        while self.bytes > self.ring_bytes and len(self.lines) > 1:
+            self.bytes -= len(self.lines.popleft())
+            self.dropped += 1
+
+        if self.file is not None:
+            self.write_file(data[:end])
+
+    def write_file(self, data):
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if size + len(data) > self.file_bytes:
+                self.file.close()
+                os.rename(self.log_file, self.log_file + ".1")
+                self.file = open(self.log_file, "a")
+            self.file.write(data)
+            self.file.flush()
+        except (IOError, OSError) as e:
+            vlog.err("cannot write dnsmasq log file %s: %s"
+                     % (self.log_file, e))
+            self.file.close()
+            self.file = None
+
+    def tail(self, max_bytes=None):
+        '''
+        The last lines of the ring, oldest first, within max_bytes. Falls
+        back to the end of the log file when the ring is empty.
+        '''
+        if not self.lines:
+            if self.log_file is not None and max_bytes is not None:
+                return file_tail(self.log_file, max_bytes)
+            return ""
+
+        if max_bytes is None or self.bytes <= max_bytes:
+            return "".join(self.lines)
+
+        lines = []
+        size = 0
+        for line in reversed(self.lines):
+            size += len(line)
+            if size > max_bytes:
+                break
+            lines.append(line)
+        lines.reverse()
+        return "".join(lines)
+
+    def close(self):
+        for fd in (self.read_fd, self.write_fd):
+            if fd is not None:
+                os.close(fd)
+        self.read_fd = None
+        self.write_fd = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
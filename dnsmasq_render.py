@@ -0,0 +1,413 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+NOTES:
+ - Renders the DHCP-TFTP rows of OVSDB into dnsmasq arguments. Every
+   table has a generator yielding one argument token per row, so the
+   render time and memory grow linearly with the number of rows. The
+   tokens are collected by kind into a DnsmasqConfig.
+ - The DnsmasqConfig keeps the tokens of every kind sorted, the DHCP
+   ranges and static hosts by address and the others by token, which
+   starts with their tags, so the same rows render the same config
+   whatever the order of the row UUIDs.
+ - "ops_dhcp_tftp render" runs the renderer offline on a snapshot of the
+   OVSDB tables or on a synthetic config, and prints the dnsmasq
+   arguments with the render time, the peak memory and the argv size.
+   It is dispatched before the daemon modules are imported, so it runs
+   without the switch libraries (ops_eventlog, ops_diagdump).
+ - Only the argument of a row is logged, and only when debug logging is
+   enabled, so a render does not format the command line for nothing.
+'''
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+
+import ovs.vlog
+from dnsmasq_config import DnsmasqConfig
+import dnsmasq_log
+import idl_snapshot
+
+vlog = ovs.vlog.Vlog("dnsmasq_render")
+
+# dnsmasq executable and the arguments it is always run with
+DNSMASQ_COMMAND = ['/usr/bin/dnsmasq', '--port=0', '--user=root',
+                   '--dhcp-script=/usr/bin/dhcp_leases', '--leasefile-ro',
+                   '--keep-in-foreground']
+
+# Most dnsmasq shards the DHCP interfaces are split across
+MAX_SHARDS = 16
+
+SYSTEM_TABLE = 'System'
+DHCP_SERVER_TABLE = 'DHCP_Server'
+DHCP_SERVER_RANGE_TABLE = 'DHCPSrv_Range'
+DHCP_SERVER_STATIC_HOST_TABLE = 'DHCPSrv_Static_Host'
+DHCP_SERVER_OPTION_TABLE = 'DHCPSrv_Option'
+DHCP_SERVER_MATCH_TABLE = 'DHCPSrv_Match'
+
+# DHCP_Server:other_config keys rendered as dnsmasq flags
+DHCP_SERVER_FLAGS = {
+    'authoritative': '--dhcp-authoritative',
+    'no_ping': '--no-ping',
+    'rapid_commit': '--dhcp-rapid-commit',
+    'quiet_dhcp': '--quiet-dhcp',
+}
+
+# System:other_config keys of the TFTP server, rendered as dnsmasq flags
+# when true or as dnsmasq options taking the value
+TFTP_SERVER_FLAGS = {
+    'tftp_server_enable': '--enable-tftp',
+    'tftp_server_secure': '--tftp-secure',
+    'tftp_server_no_blocksize': '--tftp-no-blocksize',
+    'tftp_server_single_port': '--tftp-single-port',
+}
+TFTP_SERVER_OPTIONS = {
+    'tftp_server_path': '--tftp-root=',
+    'tftp_server_max': '--tftp-max=',
+    'tftp_server_mtu': '--tftp-mtu=',
+}
+
+
+def range_tokens(rows):
+    '''
+    Yields the start address and the --dhcp-range argument of every
+    DHCPSrv_Range row. The start address tells the interface, and so the
+    dnsmasq shard, the range is served on.
+    '''
+    debug = vlog.dbg_is_enabled()
+    for row in rows:
+        token = '--dhcp-range='
+        for tag in row.match_tags:
+            token += 'tag:' + tag + ','
+        for tag in row.set_tag:
+            token += 'set:' + tag + ','
+
+        if row.start_ip_address:
+            token += row.start_ip_address
+        if row.end_ip_address:
+            token += ',' + row.end_ip_address[0]
+        if row.is_static and row.is_static[0] == True:
+            token += ',static'
+        if row.netmask:
+            token += ',' + row.netmask[0]
+        if row.broadcast:
+            token += ',' + row.broadcast[0]
+        if row.prefix_len and row.prefix_len[0] != 64:
+            token += ',' + str(row.prefix_len[0])
+        if row.lease_duration:
+            if row.lease_duration[0] == 0:
+                token += ',infinite'
+            else:
+                token += ',' + str(row.lease_duration[0]) + 'm'
+
+        if debug:
+            vlog.dbg("dhcp_range %s" % (token))
+        yield row.start_ip_address, token
+
+
+def host_tokens(rows):
+    '''
+    Yields the address, or None, and the --dhcp-host argument of every
+    DHCPSrv_Static_Host row.
+    '''
+    debug = vlog.dbg_is_enabled()
+    for row in rows:
+        token = '--dhcp-host='
+        for mac in row.mac_addresses:
+            token += mac + ','
+        if row.client_id:
+            token += 'id:' + row.client_id[0] + ','
+        for tag in row.set_tags:
+            token += 'set:' + tag + ','
+
+        if row.ip_address:
+            token += row.ip_address
+        if row.client_hostname:
+            token += ',' + row.client_hostname[0]
+        if row.lease_duration:
+            if row.lease_duration[0] == 0:
+                token += ',infinite'
+            else:
+                token += ',' + str(row.lease_duration[0]) + 'm'
+
+        if debug:
+            vlog.dbg("dhcp_host %s" % (token))
+        yield row.ip_address or None, token
+
+
+def option_tokens(rows):
+    '''
+    Yields the --dhcp-option argument of every DHCPSrv_Option row.
+    '''
+    debug = vlog.dbg_is_enabled()
+    for row in rows:
+        token = '--dhcp-option='
+        for tag in row.match_tags:
+            token += 'set:' + tag + ','
+
+        if row.option_name:
+            if row.ipv6 and row.ipv6[0] == True:
+                token += 'option6:' + row.option_name[0]
+            else:
+                token += 'option:' + row.option_name[0]
+        else:
+            token += str(row.option_number[0])
+        if row.option_value:
+            token += ',' + row.option_value[0]
+
+        if debug:
+            vlog.dbg("dhcp_option %s" % (token))
+        yield token
+
+
+def match_tokens(rows):
+    '''
+    Yields the --dhcp-match argument of every DHCPSrv_Match row.
+    '''
+    debug = vlog.dbg_is_enabled()
+    for row in rows:
+        token = '--dhcp-match='
+        if row.set_tag:
+            token += 'set:' + row.set_tag + ','
+
+        if row.option_name:
+            token += 'option:' + row.option_name[0]
+        else:
+            token += str(row.option_number[0])
+        if row.option_value:
+            token += ',' + row.option_value[0]
+
+        if debug:
+            vlog.dbg("dhcp_match %s" % (token))
+        yield token
+
+
+def boot_tokens(rows):
+    '''
+    Yields the --dhcp-boot arguments of the bootp column of every
+    DHCP_Server row.
+    '''
+    debug = vlog.dbg_is_enabled()
+    for row in rows:
+        for key, value in row.bootp.iteritems():
+            if key == 'no_matching_tag':
+                token = '--dhcp-boot=' + value
+            else:
+                token = '--dhcp-boot=tag:' + key + ',' + value
+            if debug:
+                vlog.dbg("dhcp_boot %s" % (token))
+            yield token
+
+
+def dhcp_server_tokens(rows):
+    '''
+    Yields the dnsmasq settings of the DHCP_Server other_config. They
+    apply to the whole dnsmasq instance, so a flag set on any DHCP server
+    is rendered once and the largest lease limit wins.
+    '''
+    flags = set()
+    lease_max = None
+    for row in rows:
+        for key, value in row.other_config.iteritems():
+            if key in DHCP_SERVER_FLAGS and value == 'true':
+                flags.add(DHCP_SERVER_FLAGS[key])
+            if key == 'lease_max' and value.isdigit() and \
+               (lease_max is None or int(value) > lease_max):
+                lease_max = int(value)
+
+    for flag in sorted(flags):
+        yield flag
+    if lease_max is not None:
+        yield '--dhcp-lease-max=' + str(lease_max)
+
+
+def dhcp_server_shards(rows, max_shards):
+    '''
+    Number of dnsmasq shards, the largest of the DHCP_Server other_config
+    up to max_shards.
+    '''
+    shards = 1
+    for row in rows:
+        value = row.other_config.get('shards')
+        if value and value.isdigit() and int(value) > shards:
+            shards = min(int(value), max_shards)
+    return shards
+
+
+def tftp_server_tokens(rows):
+    '''
+    Yields the TFTP server arguments of the System other_config.
+    '''
+    for row in rows:
+        for key, value in row.other_config.iteritems():
+            if not value:
+                continue
+            if key in TFTP_SERVER_FLAGS:
+                if value == 'true':
+                    yield TFTP_SERVER_FLAGS[key]
+            elif key in TFTP_SERVER_OPTIONS:
+                yield TFTP_SERVER_OPTIONS[key] + value
+            elif key == 'tftp_server_port_range':
+                yield '--tftp-port-range=' + value.replace('-', ',')
+
+
+def render(tables, command, log, max_shards):
+    '''
+    Renders the DHCP-TFTP config of the IDL tables into a DnsmasqConfig,
+    with the dnsmasq command and log arguments given. Returns the config
+    and the number of dnsmasq shards.
+    '''
+    dhcp_servers = tables[DHCP_SERVER_TABLE].rows
+    config = DnsmasqConfig(
+        command=command, log=log,
+        ranges=range_tokens(
+            tables[DHCP_SERVER_RANGE_TABLE].rows.itervalues()),
+        hosts=host_tokens(
+            tables[DHCP_SERVER_STATIC_HOST_TABLE].rows.itervalues()),
+        options=option_tokens(
+            tables[DHCP_SERVER_OPTION_TABLE].rows.itervalues()),
+        matches=match_tokens(
+            tables[DHCP_SERVER_MATCH_TABLE].rows.itervalues()),
+        boots=boot_tokens(dhcp_servers.itervalues()),
+        settings=dhcp_server_tokens(dhcp_servers.itervalues()),
+        tftp=tftp_server_tokens(tables[SYSTEM_TABLE].rows.itervalues()))
+
+    shards = dhcp_server_shards(dhcp_servers.itervalues(), max_shards)
+
+    return config, shards
+
+
+def write_configs(configs, output_format, out):
+    for shard, config in enumerate(configs):
+        if len(configs) > 1:
+            out.write('# shard %d\n' % (shard))
+        if config is None:
+            continue
+        if output_format == 'argv':
+            lines = config.argv()
+        elif output_format == 'conf':
+            lines = config.conf_lines()
+        else:
+            lines = [str(config)]
+        for line in lines:
+            out.write(line + '\n')
+
+
+def main(argv):
+    '''
+    Offline render, the "render" subcommand of ops_dhcp_tftp.
+    '''
+    parser = argparse.ArgumentParser(
+        prog='ops_dhcp_tftp render',
+        description='Render the dnsmasq arguments of a DHCP-TFTP config '
+                    'without OVSDB, and print the render time, the peak '
+                    'memory and the argv size to stderr.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--snapshot', metavar='FILE',
+                        help='Output of "ovsdb-client dump -f json", or a '
+                             'JSON object of table name to rows, "-" for '
+                             'stdin.')
+    source.add_argument('--synthetic', metavar='HOSTS', type=int,
+                        help='Make up a config with HOSTS static hosts.')
+    parser.add_argument('--shards', type=int,
+                        help='Shard count instead of the one of the '
+                             'config. The DHCP ranges are mapped to the '
+                             'interfaces of this host.')
+    parser.add_argument('--format', choices=('command', 'argv', 'conf',
+                                             'json', 'none'),
+                        default='command',
+                        help='command line, one argument per line, '
+                             'dnsmasq configuration file, JSON model or '
+                             'nothing.')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Render REPEAT times, the best time is '
+                             'printed.')
+    args = parser.parse_args(argv)
+
+    if args.snapshot == '-':
+        tables = idl_snapshot.load(sys.stdin)
+    elif args.snapshot is not None:
+        with open(args.snapshot) as f:
+            tables = idl_snapshot.load(f)
+    else:
+        tables = idl_snapshot.synthetic(args.synthetic)
+
+    log = dnsmasq_log.DnsmasqLog().facility()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+    for _ in xrange(max(1, args.repeat)):
+        start = time.time()
+        config, shards = render(tables, DNSMASQ_COMMAND, log, MAX_SHARDS)
+        if args.shards is not None:
+            shards = args.shards
+        if shards > 1:
+            # The shard split needs the daemon modules
+            import dnsmasq_supervisor
+            configs = dnsmasq_supervisor.shard_configs(config, shards)
+        else:
+            configs = [config]
+        times.append(time.time() - start)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if args.format == 'json':
+        json.dump([config.to_dict() if config is not None else None
+                   for config in configs], sys.stdout, indent=1,
+                  separators=(',', ': '))
+        sys.stdout.write('\n')
+    elif args.format != 'none':
+        write_configs(configs, args.format, sys.stdout)
+
+    sys.stderr.write('rows: %d, shards: %d\n'
+                     % (sum(len(table.rows) for table in tables.itervalues()),
+                        len(configs)))
+    sys.stderr.write('render: %.1f ms\n' % (min(times) * 1000))
+    sys.stderr.write('peak memory: %d KB (%d KB more while rendering)\n'
+                     % (rss, rss - rss_before))
+    arg_max = os.sysconf('SC_ARG_MAX')
+    for shard, config in enumerate(configs):
+        if config is None:
+            continue
+        arguments = config.argv()
+        argv_bytes = sum(len(argument) + 1 for argument in arguments)
+        sys.stderr.write('shard %d argv: %d arguments, %d bytes\n'
+                         % (shard, len(arguments), argv_bytes))
+        if argv_bytes > arg_max:
+            sys.stderr.write('shard %d argv: above the %d bytes of '
+                             'ARG_MAX, dnsmasq cannot be executed\n'
+                             % (shard, arg_max))
+
+    return 0
+
+
+def ops_dhcp_tftp_main():
+    '''
+    Console script of ops_dhcp_tftp. The render subcommand only imports
+    this module, the daemon is imported for the other commands as it needs
+    the switch libraries.
+    '''
+    if sys.argv[1:2] == ['render']:
+        return main(sys.argv[2:])
+
+    import ops_dhcp_tftp
+    return ops_dhcp_tftp.main()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
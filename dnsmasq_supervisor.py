@@ -0,0 +1,791 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+NOTES:
+ - Supervision of the dnsmasq processes of the DHCP-TFTP daemon. The
+   interfaces served by DHCP can be split into shards, each served by its
+   own dnsmasq bound to its interfaces (--bind-interfaces), so that the
+   DHCP load of a mass boot is spread over several cores. With a single
+   shard one dnsmasq serves all the interfaces, as before sharding.
+ - Interfaces are assigned to shards by a hash of their name, so that
+   adding an interface does not move the others. A shard other than 0
+   serves a single interface, so that dnsmasq binds its DHCP socket to
+   it, and shard 0 serves all the interfaces not assigned to another
+   shard.
+ - Every shard runs the dhcp_leases script on its lease events. The
+   dnsmasq of a shard is given the shard and the networks of every shard
+   in its environment, so that the script only loads and deletes the
+   leases of the shard, see dhcp_lease_shard.
+ - Each shard runs dnsmasq in the foreground as a child of the daemon. A
+   new config is checked with dnsmasq --test before the running
+   dnsmasq is stopped, and rolled back to the last config that
+   became ready when the new dnsmasq does not become ready. The checks
+   of the configs of all the shards run at once.
+ - Starting dnsmasq does not block the daemon. The shards start their
+   dnsmasq, then their readiness is checked on every pass of the daemon
+   main loop, woken up every READY_POLL_MSEC while a dnsmasq is starting,
+   so the shards become ready together.
+ - A crashed dnsmasq is respawned with exponential backoff. The PID,
+   start time and config fingerprint of every dnsmasq started are saved,
+   so that a restarted daemon adopts a dnsmasq still running its config.
+ - ops_eventlog is only imported on the first event logged, so that the
+   offline render can split a config into shards without the switch
+   libraries.
+'''
+
+import json
+import os
+import signal
+import socket
+import struct
+import subprocess
+import tempfile
+import time
+import zlib
+from collections import deque
+from collections import namedtuple
+from time import sleep
+
+import ovs.vlog
+import dhcp_lease_shard
+import dnsmasq_config
+
+vlog = ovs.vlog.Vlog("dnsmasq_supervisor")
+
+# PID file written by dnsmasq, shard 0 keeps the default of dnsmasq
+PID_FILE = '/var/run/dnsmasq.pid'
+SHARD_PID_FILE = '/var/run/dnsmasq-%d.pid'
+
+# PID, start time and fingerprint of the dnsmasq the daemon started, so
+# that a restarted daemon can adopt it
+STATE_FILE = '/var/run/ops_dhcp_tftp.dnsmasq'
+
+# dnsmasq has failed to start if it exits within this many seconds, or
+# if it serves DHCP ranges and has no DHCP socket after READY_TIMEOUT
+START_TIMEOUT = 1.0
+READY_TIMEOUT = 5.0
+DHCP_SERVER_PORTS = (67, 547)
+
+# Interval at which the readiness of a starting dnsmasq is checked
+READY_POLL_MSEC = 50
+
+# Respawn of a crashed dnsmasq, the backoff doubles on every crash and is
+# reset once dnsmasq ran for RESPAWN_STABLE_TIME seconds
+RESPAWN_BACKOFF_MIN = 1.0
+RESPAWN_BACKOFF_MAX = 64.0
+RESPAWN_STABLE_TIME = 30.0
+
+# dnsmasq is in a crash loop after CRASH_LOOP_COUNT crashes within
+# CRASH_LOOP_WINDOW seconds
+CRASH_LOOP_COUNT = 5
+CRASH_LOOP_WINDOW = 120.0
+
+# Interval at which the exit of an adopted dnsmasq is polled, it is not a
+# child of the daemon and raises no SIGCHLD
+ADOPTED_POLL_MSEC = 1000
+
+# Environment of the processes started, nothing of the daemon environment
+# is passed on to dnsmasq and to the dhcp_leases script it runs
+CHILD_ENV = {'PATH': '/usr/sbin:/usr/bin:/sbin:/bin', 'LANG': 'C'}
+
+Network = namedtuple("Network", "interface family network prefix")
+
+
+def log_event(name, *args):
+    '''
+    Logs an event of the switch event log, imported on the first event.
+    '''
+    from ops_eventlog import log_event as ops_log_event
+    ops_log_event(name, *args)
+
+
+def process_start_time(pid):
+    '''
+    Start time of a process in clock ticks since boot, which tells a
+    process from a later one reusing its PID, or None.
+    '''
+    try:
+        with open('/proc/%d/stat' % pid) as f:
+            stat = f.read()
+    except IOError:
+        return None
+
+    # The command name may contain spaces, the fields follow its ')'
+    return int(stat[stat.rindex(')') + 2:].split()[19])
+
+
+def dnsmasq_cmdline(pid):
+    '''
+    argv of a dnsmasq process from /proc, or None if the process is gone
+    or is not dnsmasq.
+    '''
+    try:
+        with open('/proc/%d/cmdline' % pid) as f:
+            argv = f.read().split('\0')
+    except IOError:
+        return None
+
+    if not argv or not os.path.basename(argv[0]) == 'dnsmasq':
+        return None
+    return [arg for arg in argv if arg]
+
+
+def is_ready(pid):
+    '''
+    Checks if the dnsmasq process has a UDP socket bound to a DHCP
+    server port, matching the inodes of its socket descriptors against
+    the UDP tables of its network namespace.
+    '''
+    fd_dir = '/proc/%d/fd' % pid
+    try:
+        names = os.listdir(fd_dir)
+    except OSError:
+        return False
+
+    inodes = set()
+    for name in names:
+        try:
+            link = os.readlink(os.path.join(fd_dir, name))
+        except OSError:
+            continue
+        if link.startswith('socket:['):
+            inodes.add(link[8:-1])
+
+    for table in ('udp', 'udp6'):
+        try:
+            with open('/proc/%d/net/%s' % (pid, table)) as f:
+                lines = f.readlines()[1:]
+        except IOError:
+            continue
+        for line in lines:
+            fields = line.split()
+            port = int(fields[1].rsplit(':', 1)[1], 16)
+            if port in DHCP_SERVER_PORTS and fields[9] in inodes:
+                return True
+
+    return False
+
+
+def preflight_start(config):
+    '''
+    Starts dnsmasq --test on a config, without waiting for it. Returns the
+    process, or the error when it cannot be started.
+    '''
+    try:
+        return subprocess.Popen(config.argv() + ['--test'],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, close_fds=True,
+                                env=CHILD_ENV)
+    except OSError as e:
+        return str(e)
+
+
+def preflight_finish(config, p):
+    '''
+    Waits for the dnsmasq --test started by preflight_start. Returns True
+    if the config passed the check.
+    '''
+    if isinstance(p, str):
+        out = p
+    else:
+        out, err = p.communicate()
+        if p.returncode == 0:
+            return True
+
+    vlog.err("dnsmasq preflight failed, keeping the running config: %s"
+             % (out.strip()))
+    log_event("DNSMASQ_PREFLIGHT_FAILURE",
+              ["dnsmasq_command", str(config)])
+    return False
+
+
+def preflight(config):
+    '''
+    Checks a dnsmasq config with dnsmasq --test, without touching the
+    running dnsmasq.
+    '''
+    return preflight_finish(config, preflight_start(config))
+
+
+def preflight_configs(configs):
+    '''
+    Checks several dnsmasq configs at once: all the dnsmasq --test are
+    started before any is waited for. Returns the results in order.
+    '''
+    started = [preflight_start(config) for config in configs]
+    return [preflight_finish(config, p)
+            for config, p in zip(configs, started)]
+
+
+def _address_to_int(address):
+    if ':' in address:
+        high, low = struct.unpack('!QQ', socket.inet_pton(socket.AF_INET6,
+                                                          address))
+        return 6, (high << 64) | low
+    return 4, struct.unpack('!I', socket.inet_aton(address))[0]
+
+
+def interface_networks():
+    '''
+    The networks of the addresses of the local interfaces, from ip addr.
+    '''
+    try:
+        out = subprocess.check_output(['ip', '-o', 'addr', 'show'],
+                                      close_fds=True, env=CHILD_ENV)
+    except (OSError, subprocess.CalledProcessError) as e:
+        vlog.err("cannot list the interface addresses: %s" % (e))
+        return []
+
+    networks = []
+    for line in out.splitlines():
+        # 2: eth0    inet 10.0.0.1/24 brd 10.0.0.255 scope global eth0
+        fields = line.split()
+        if len(fields) < 4 or fields[2] not in ('inet', 'inet6'):
+            continue
+        address, _, prefix = fields[3].partition('/')
+        try:
+            family, value = _address_to_int(address)
+        except (socket.error, struct.error):
+            continue
+        bits = 32 if family == 4 else 128
+        prefix = int(prefix) if prefix else bits
+        networks.append(Network(fields[1].split('@')[0], family,
+                                value >> (bits - prefix), prefix))
+    return networks
+
+
+def interface_of(address, networks):
+    '''
+    The local interface on the network of an address, the one of the
+    longest matching prefix, or None.
+    '''
+    try:
+        family, value = _address_to_int(address)
+    except (socket.error, struct.error):
+        return None
+
+    bits = 32 if family == 4 else 128
+    best = None
+    for network in networks:
+        if network.family == family and \
+           value >> (bits - network.prefix) == network.network and \
+           (best is None or network.prefix > best.prefix):
+            best = network
+    return None if best is None else best.interface
+
+
+def interface_shard(interface, count):
+    '''
+    Shard serving an interface, a stable hash of its name.
+    '''
+    return (zlib.crc32(interface) & 0xffffffff) % count
+
+
+class AdoptedProcess(object):
+    '''
+    Stands for the subprocess.Popen of a dnsmasq started by a previous
+    instance of the daemon. It is not a child of the daemon, so its exit
+    is polled and its exit status is unknown.
+    '''
+    def __init__(self, pid, start_time):
+        self.pid = pid
+        self.start_time = start_time
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is None and \
+           (dnsmasq_cmdline(self.pid) is None or
+                process_start_time(self.pid) != self.start_time):
+            self.returncode = -1
+        return self.returncode
+
+    def kill(self):
+        os.kill(self.pid, signal.SIGKILL)
+
+    def wait(self):
+        while self.poll() is None:
+            sleep(0.05)
+        return self.returncode
+
+
+class DnsmasqShard(object):
+    def __init__(self, index):
+        self.index = index
+        if index == 0:
+            self.pid_file = PID_FILE
+            self.state_file = STATE_FILE
+        else:
+            self.pid_file = SHARD_PID_FILE % index
+            self.state_file = '%s.%d' % (STATE_FILE, index)
+        # Rendered config, and the last one that became ready
+        self.config = None
+        self.good_config = None
+        self.process = None
+        # Start time and stderr file of a dnsmasq not ready yet, and
+        # whether it falls back to good_config if it does not get ready
+        self.starting = None
+        self.rollback = False
+        self.respawn_at = None
+        self.backoff = RESPAWN_BACKOFF_MIN
+        self.down_since = None
+        self.crash_times = deque()
+        self.crash_loop = False
+        # recover_time is the total time dnsmasq was down before its
+        # respawns recovered it
+        self.stats = {'starts': 0, 'failures': 0, 'restarts': 0,
+                      'last_start': None, 'crashes': 0, 'respawns': 0,
+                      'recoveries': 0, 'recover_time': 0.0}
+
+    def name(self):
+        return "dnsmasq shard %d" % (self.index)
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def pid(self):
+        '''
+        PID of the running dnsmasq, the supervised one or else the one of
+        the PID file dnsmasq writes, or None.
+        '''
+        if self.is_running():
+            return self.process.pid
+
+        try:
+            with open(self.pid_file) as f:
+                pid = int(f.read().strip())
+        except (IOError, ValueError):
+            return None
+
+        if dnsmasq_cmdline(pid) is None:
+            return None
+        return pid
+
+    def start(self):
+        '''
+        Starts dnsmasq with the rendered config. start_run() tells when it
+        is ready.
+        '''
+        self.process = None
+
+        vlog.info("%s: starting %s" % (self.name(), self.config))
+
+        # dnsmasq stays in the foreground, the child is dnsmasq itself so
+        # that its exit can be seen. Its stderr only carries start errors,
+        # the log goes to the log facility.
+        err_file = tempfile.TemporaryFile()
+        with open(os.devnull, 'w') as devnull:
+            self.process = subprocess.Popen(
+                self.config.argv(), stdout=devnull, stderr=err_file,
+                close_fds=True, env=self.config.environ(CHILD_ENV))
+        self.starting = (time.time(), err_file)
+
+    def start_run(self):
+        '''
+        Checks a starting dnsmasq. With DHCP ranges it is ready once it has
+        a DHCP socket, without them once it did not exit within
+        START_TIMEOUT. A dnsmasq not ready after READY_TIMEOUT is killed.
+        Returns True when it became ready, False when it failed, None
+        while it is starting or if no dnsmasq is starting.
+        '''
+        if self.starting is None:
+            return None
+
+        start, err_file = self.starting
+        elapsed = time.time() - start
+        ready = False
+        if self.process.poll() is None:
+            if self.config.ranges:
+                ready = is_ready(self.process.pid)
+                if not ready and elapsed < READY_TIMEOUT:
+                    return None
+            elif elapsed >= START_TIMEOUT:
+                ready = True
+            else:
+                return None
+
+        self.starting = None
+        if not ready and self.process.returncode is None:
+            err_file.write("dnsmasq not ready after %.0f seconds\n"
+                           % (READY_TIMEOUT))
+            self.process.kill()
+            self.process.wait()
+
+        err_file.seek(0)
+        err = err_file.read()
+        err_file.close()
+        self.stats['starts'] += 1
+        self.stats['last_start'] = time.time()
+        if not ready:
+            self.start_failed(err)
+            return False
+
+        vlog.info("%s started in %.2f seconds" % (self.name(), elapsed))
+        self.good_config = self.config
+        self.rollback = False
+        self.save_state()
+        log_event("DNSMASQ_SUCCESS",
+                  ["dnsmasq_command", str(self.config)])
+
+        if self.down_since is not None:
+            recover_time = time.time() - self.down_since
+            self.down_since = None
+            self.stats['recoveries'] += 1
+            self.stats['recover_time'] += recover_time
+            vlog.info("%s recovered in %.1f seconds"
+                      % (self.name(), recover_time))
+            log_event("DNSMASQ_RECOVERED",
+                      ["recover_time", "%.1f" % (recover_time)])
+
+        return True
+
+    def start_failed(self, err):
+        '''
+        Starts dnsmasq back with the last known good config after a new
+        config did not become ready. The exited dnsmasq of a failed start
+        without rollback is left to check_exit(), as a crash.
+        '''
+        self.stats['failures'] += 1
+        vlog.emer("%s" % (err))
+        vlog.emer("Error with config, %s failed with status %d, "
+                  "command %s" % (self.name(), self.process.returncode,
+                                  self.config))
+        log_event("DNSMASQ_FAILURE",
+                  ["dnsmasq_command", str(self.config)])
+
+        if not self.rollback:
+            return
+
+        self.rollback = False
+        vlog.err("%s: rolling back to the last known good config"
+                 % (self.name()))
+        log_event("DNSMASQ_ROLLBACK",
+                  ["dnsmasq_command", str(self.good_config)])
+        self.process = None
+        self.config = self.good_config
+        self.start()
+
+    def stop(self):
+        '''
+        Kills the supervised dnsmasq, and a dnsmasq left running with the
+        PID file by a previous daemon that did not supervise it.
+        '''
+        pids = []
+        if self.is_running():
+            pids.append(self.process.pid)
+        pid = self.pid()
+        if pid is not None and pid not in pids:
+            pids.append(pid)
+
+        for pid in pids:
+            vlog.info("%s: killing dnsmasq %d" % (self.name(), pid))
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                vlog.info("unable to kill dnsmasq process %d" % (pid))
+
+        # Reap the killed dnsmasq, it is not respawned
+        if self.process is not None:
+            self.process.wait()
+            self.process = None
+        if self.starting is not None:
+            self.starting[1].close()
+            self.starting = None
+        self.rollback = False
+        self.respawn_at = None
+
+    def needs_preflight(self, config):
+        '''
+        Returns True if apply would check config with dnsmasq --test.
+        '''
+        if config is None:
+            return False
+        if config == self.good_config and self.is_running():
+            return False
+        return config != self.config or self.starting is None
+
+    def apply(self, config, checked=None):
+        '''
+        Runs dnsmasq with a newly rendered config. A None config stops it.
+        dnsmasq is left alone when its config did not change, or when the
+        new one fails the preflight check. checked is the result of a
+        preflight check of config already run, see preflight_configs.
+        '''
+        if config is None:
+            self.config = None
+            self.good_config = None
+            self.stop()
+            return
+
+        if config == self.good_config and self.is_running():
+            self.config = config
+            vlog.dbg("%s: config unchanged" % (self.name()))
+            return
+
+        if config == self.config and self.starting is not None:
+            vlog.dbg("%s: config already starting" % (self.name()))
+            return
+
+        if self.good_config is not None:
+            for line in dnsmasq_config.format_diff(
+                    config.diff(self.good_config)):
+                vlog.info("%s: config change %s" % (self.name(), line))
+
+        # Check the new config before stopping the running dnsmasq
+        if checked is None:
+            checked = preflight(config)
+        if not checked:
+            if self.good_config is not None:
+                self.config = self.good_config
+            return
+
+        self.config = config
+        self.stats['restarts'] += 1
+        self.stop()
+
+        # Start dnsmasq, back with the last known good config if the new
+        # one does not become ready
+        self.start()
+        self.rollback = self.good_config is not None and \
+            self.good_config != self.config
+
+    def save_state(self):
+        '''
+        Persists the PID, start time and fingerprint of the running dnsmasq.
+        '''
+        state = {'pid': self.process.pid,
+                 'start_time': process_start_time(self.process.pid),
+                 'fingerprint': self.config.fingerprint()}
+        try:
+            with open(self.state_file + '.tmp', 'w') as f:
+                json.dump(state, f)
+            os.rename(self.state_file + '.tmp', self.state_file)
+        except (IOError, OSError) as e:
+            vlog.err("%s: cannot save state: %s" % (self.name(), e))
+
+    def adopt(self, config, reopen_log):
+        '''
+        Adopts the dnsmasq started by a previous instance of the daemon if
+        it still runs the config just rendered. Returns True if it
+        was adopted.
+        '''
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+            pid = int(state['pid'])
+            start_time = state['start_time']
+            fingerprint = state['fingerprint']
+        except (IOError, ValueError, KeyError, TypeError):
+            return False
+
+        process = AdoptedProcess(pid, start_time)
+        if start_time is None or process.poll() is not None:
+            return False
+
+        if fingerprint != config.fingerprint():
+            vlog.info("%s: dnsmasq %d runs another config, not adopted"
+                      % (self.name(), pid))
+            return False
+
+        self.process = process
+        self.config = config
+        self.good_config = config
+        vlog.info("%s: adopted running dnsmasq %d" % (self.name(), pid))
+        log_event("DNSMASQ_ADOPTED", ["pid", str(pid)])
+
+        # Have dnsmasq reopen its log FIFO, the daemon owns a new read end
+        if reopen_log:
+            try:
+                os.kill(pid, signal.SIGUSR2)
+            except OSError:
+                pass
+
+        return True
+
+    def check_exit(self):
+        '''
+        Reaps an exited dnsmasq and schedules its respawn, with a backoff
+        doubling on every crash up to RESPAWN_BACKOFF_MAX.
+        '''
+        # The exit of a starting dnsmasq is a failed start
+        if self.process is None or self.starting is not None or \
+           self.process.poll() is None:
+            return
+
+        status = self.process.returncode
+        self.process = None
+        now = time.time()
+
+        if self.down_since is None:
+            self.down_since = now
+        if self.stats['last_start'] is not None and \
+           now - self.stats['last_start'] >= RESPAWN_STABLE_TIME:
+            self.backoff = RESPAWN_BACKOFF_MIN
+
+        self.stats['crashes'] += 1
+        self.crash_times.append(now)
+        while self.crash_times[0] < now - CRASH_LOOP_WINDOW:
+            self.crash_times.popleft()
+
+        crash_loop = len(self.crash_times) >= CRASH_LOOP_COUNT
+        if crash_loop and not self.crash_loop:
+            vlog.err("%s crash loop, %d crashes in %d seconds"
+                     % (self.name(), len(self.crash_times),
+                        CRASH_LOOP_WINDOW))
+            log_event("DNSMASQ_CRASH_LOOP",
+                      ["crashes", str(len(self.crash_times))])
+        self.crash_loop = crash_loop
+
+        vlog.err("%s exited with status %d, respawn in %.0f seconds"
+                 % (self.name(), status, self.backoff))
+        log_event("DNSMASQ_CRASH", ["exit_status", str(status)])
+
+        self.respawn_at = now + self.backoff
+        self.backoff = min(self.backoff * 2, RESPAWN_BACKOFF_MAX)
+
+    def respawn_run(self):
+        '''
+        Respawns dnsmasq once its backoff expired. A respawn that fails to
+        start is seen as a new crash by check_exit().
+        '''
+        if self.respawn_at is None or time.time() < self.respawn_at:
+            return
+
+        self.respawn_at = None
+        self.stats['respawns'] += 1
+        vlog.info("respawning %s" % (self.name()))
+        self.start()
+
+    def wait(self, poller):
+        if self.starting is not None:
+            poller.timer_wait(READY_POLL_MSEC)
+        if self.respawn_at is not None:
+            poller.timer_wait(
+                max(0, int((self.respawn_at - time.time()) * 1000)))
+        if isinstance(self.process, AdoptedProcess):
+            poller.timer_wait(ADOPTED_POLL_MSEC)
+
+    def report(self):
+        '''
+        Text report of the start, restart and respawn counters.
+        '''
+        stats = self.stats
+        report = ['Starts: %d, failures: %d, restarts: %d\n'
+                  % (stats['starts'], stats['failures'], stats['restarts']),
+                  'Crashes: %d, respawns: %d, recoveries: %d\n'
+                  % (stats['crashes'], stats['respawns'],
+                     stats['recoveries'])]
+
+        if stats['recoveries']:
+            report.append('Mean time to recover: %.1f seconds\n'
+                          % (stats['recover_time'] / stats['recoveries']))
+        if stats['last_start'] is not None:
+            report.append('Last start: %s\n'
+                          % (time.ctime(stats['last_start'])))
+        if self.starting is not None:
+            report.append('Starting for %.1f seconds\n'
+                          % (time.time() - self.starting[0]))
+        recent = [t for t in self.crash_times
+                  if t >= time.time() - CRASH_LOOP_WINDOW]
+        if len(recent) >= CRASH_LOOP_COUNT:
+            report.append('Crash loop: %d crashes in the last %d seconds\n'
+                          % (len(recent), CRASH_LOOP_WINDOW))
+        if self.respawn_at is not None:
+            report.append('Next respawn in %.1f seconds\n'
+                          % (max(0, self.respawn_at - time.time())))
+
+        return ''.join(report)
+
+
+def shard_configs(config, count):
+    '''
+    Splits a rendered config into the configs of count shards, None for a
+    shard without interfaces. The static hosts without an address and the
+    arguments other than ranges and hosts are given to every shard. A
+    single shard serves all the interfaces, without binding them.
+
+    A shard other than 0 serves a single interface: dnsmasq binds its
+    DHCP socket to the interface only when it serves exactly one, so that
+    the unicast renewals on the interface reach it and not the shard 0
+    socket. Of the interfaces hashed to the same shard, the first by name
+    gets it and the others are served by shard 0.
+    '''
+    if count <= 1:
+        return [config]
+
+    networks = interface_networks()
+    range_interfaces = [interface_of(address, networks)
+                        for address, _ in config.ranges]
+
+    # Shard serving each interface of a DHCP range
+    shard_of = {}
+    interfaces = [None] * count
+    for interface in sorted(set(range_interfaces) - set([None])):
+        shard = interface_shard(interface, count)
+        if shard > 0 and interfaces[shard] is None:
+            interfaces[shard] = interface
+            shard_of[interface] = shard
+        else:
+            shard_of[interface] = 0
+
+    ranges = [[] for _ in xrange(count)]
+    hosts = [[] for _ in xrange(count)]
+
+    for (address, argument), interface in zip(config.ranges,
+                                              range_interfaces):
+        if interface is None:
+            vlog.warn("no local interface on the network of DHCP range %s, "
+                      "rendered in shard 0" % (address))
+        ranges[shard_of.get(interface, 0)].append((address, argument))
+
+    for address, argument in config.hosts:
+        if address is None:
+            for shard_hosts in hosts:
+                shard_hosts.append((address, argument))
+            continue
+        interface = interface_of(address, networks)
+        hosts[shard_of.get(interface, 0)].append((address, argument))
+
+    # The dhcp_leases script of a shard tells the leases of the shard by
+    # the network of their address, as interface_of() does
+    lease_networks = [(shard_of.get(network.interface, 0),
+                       socket.AF_INET if network.family == 4
+                       else socket.AF_INET6,
+                       network.network, network.prefix)
+                      for network in networks]
+
+    # Shard 0 serves every interface the other shards do not
+    others = sorted(interface for interface in interfaces[1:]
+                    if interface is not None)
+
+    configs = []
+    for shard in xrange(count):
+        if shard > 0 and interfaces[shard] is None:
+            configs.append(None)
+            continue
+
+        args = ['--bind-interfaces']
+        if shard == 0:
+            args.extend('--except-interface=' + interface
+                        for interface in others)
+        else:
+            args.append('--interface=' + interfaces[shard])
+            args.append('--pid-file=' + SHARD_PID_FILE % shard)
+        configs.append(config.replace(
+            interfaces=args, ranges=ranges[shard], hosts=hosts[shard],
+            env=dhcp_lease_shard.shard_env(shard, lease_networks)))
+
+    return configs
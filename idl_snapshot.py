@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+NOTES:
+ - In-memory stand-in for the tables of an ovs.db.idl.Idl, holding the
+   DHCP-TFTP rows the dnsmasq renderer reads, so that the renderer runs
+   without ovsdb-server.
+ - The rows are loaded from the output of "ovsdb-client dump -f json",
+   from a JSON object of table name to rows, or made up by a synthetic
+   generator for scale tests.
+ - The columns have the python types of the IDL: a value for a column
+   holding exactly one value, a list for an optional value or a set and
+   a dict for a map.
+ - Idl is a scriptable stand-in for the IDL itself. The changes made to
+   it reach the tables on the next run(), which bumps change_seqno as a
+   transaction received from ovsdb-server does, so that the main loop of
+   the daemon can be driven without ovsdb-server.
+'''
+
+import json
+
+# Column types
+SCALAR = 'scalar'
+OPTIONAL = 'optional'
+SET = 'set'
+MAP = 'map'
+
+# Columns of the tables read by the dnsmasq renderer
+COLUMNS = {
+    'System': {
+        'cur_cfg': SCALAR,
+        'other_config': MAP,
+    },
+    'DHCP_Server': {
+        'bootp': MAP,
+        'other_config': MAP,
+    },
+    'DHCPSrv_Range': {
+        'start_ip_address': SCALAR,
+        'end_ip_address': OPTIONAL,
+        'match_tags': SET,
+        'set_tag': SET,
+        'is_static': OPTIONAL,
+        'netmask': OPTIONAL,
+        'broadcast': OPTIONAL,
+        'prefix_len': OPTIONAL,
+        'lease_duration': OPTIONAL,
+    },
+    'DHCPSrv_Static_Host': {
+        'ip_address': SCALAR,
+        'mac_addresses': SET,
+        'client_id': OPTIONAL,
+        'set_tags': SET,
+        'client_hostname': OPTIONAL,
+        'lease_duration': OPTIONAL,
+    },
+    'DHCPSrv_Option': {
+        'match_tags': SET,
+        'option_name': OPTIONAL,
+        'option_number': OPTIONAL,
+        'option_value': OPTIONAL,
+        'ipv6': OPTIONAL,
+    },
+    'DHCPSrv_Match': {
+        'set_tag': SCALAR,
+        'option_name': OPTIONAL,
+        'option_number': OPTIONAL,
+        'option_value': OPTIONAL,
+    },
+}
+
+
+class Row(object):
+    def __init__(self, table, uuid, **columns):
+        self.uuid = uuid
+        for column, kind in COLUMNS[table].iteritems():
+            value = columns.pop(column, None)
+            if kind == MAP:
+                value = dict(value or {})
+            elif kind != SCALAR:
+                value = list(value or [])
+            setattr(self, column, value)
+        # Columns the renderer does not read are kept as they are
+        self.__dict__.update(columns)
+
+
+class Table(object):
+    def __init__(self, rows=()):
+        self.rows = dict((row.uuid, row) for row in rows)
+
+
+class Idl(object):
+    def __init__(self, tables=None):
+        if tables is None:
+            tables = empty_tables()
+        self.tables = tables
+        # The initial contents count as the first change
+        self.change_seqno = 1
+        self.pending = []
+
+    def insert(self, table, uuid, **columns):
+        self.pending.append(('insert', table, uuid, columns))
+
+    def update(self, table, uuid, **columns):
+        '''
+        Sets columns of a row, with the python values of the IDL.
+        '''
+        self.pending.append(('update', table, uuid, columns))
+
+    def delete(self, table, uuid):
+        self.pending.append(('delete', table, uuid, None))
+
+    def run(self):
+        '''
+        Applies the pending changes, as one transaction.
+        '''
+        if not self.pending:
+            return
+
+        for action, table, uuid, columns in self.pending:
+            rows = self.tables[table].rows
+            if action == 'insert':
+                rows[uuid] = Row(table, uuid, **columns)
+            elif action == 'update':
+                rows[uuid].__dict__.update(columns)
+            else:
+                del rows[uuid]
+        self.pending = []
+        self.change_seqno += 1
+
+    def wait(self, poller):
+        if self.pending:
+            poller.immediate_wake()
+
+    def close(self):
+        pass
+
+
+def empty_tables():
+    return dict((name, Table()) for name in COLUMNS)
+
+
+def datum(value):
+    '''
+    Python value of an OVSDB JSON datum.
+    '''
+    if isinstance(value, list) and len(value) == 2:
+        if value[0] == 'set':
+            return [datum(atom) for atom in value[1]]
+        if value[0] == 'map':
+            return dict((datum(k), datum(v)) for k, v in value[1])
+        if value[0] in ('uuid', 'named-uuid'):
+            return value[1]
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def column_value(kind, value):
+    '''
+    IDL python value of a column from its datum.
+    '''
+    value = datum(value)
+    if kind == SCALAR:
+        if isinstance(value, list):
+            return value[0] if value else None
+        return value
+    if kind == MAP:
+        return value if isinstance(value, dict) else {}
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def make_row(table, uuid, columns):
+    kinds = COLUMNS[table]
+    values = {}
+    for column, value in columns.iteritems():
+        column = str(column)
+        if column.startswith('_'):
+            continue
+        if column in kinds:
+            values[column] = column_value(kinds[column], value)
+        else:
+            values[column] = datum(value)
+    return Row(table, uuid, **values)
+
+
+def json_values(text):
+    '''
+    The JSON values of a text, one or more values one after the other as
+    ovsdb-client dump prints its tables.
+    '''
+    decoder = json.JSONDecoder()
+    values = []
+    end = 0
+    text = text.strip()
+    while end < len(text):
+        value, end = decoder.raw_decode(text, end)
+        values.append(value)
+        while end < len(text) and text[end].isspace():
+            end += 1
+    return values
+
+
+def load(f):
+    '''
+    Tables from a snapshot file object, the output of "ovsdb-client dump
+    -f json" or a JSON object of table name to either a list of rows or
+    an object of UUID to row. Tables the renderer does not read are
+    ignored.
+    '''
+    tables = empty_tables()
+    for value in json_values(f.read()):
+        if isinstance(value, list):
+            dumps = value
+        elif 'headings' in value:
+            dumps = [value]
+        else:
+            dumps = []
+            for name, rows in value.iteritems():
+                name = str(name)
+                if name not in tables:
+                    continue
+                if isinstance(rows, dict):
+                    rows = [dict(row, _uuid=uuid)
+                            for uuid, row in rows.iteritems()]
+                for index, row in enumerate(rows):
+                    uuid = datum(row.get('_uuid', str(index)))
+                    tables[name].rows[uuid] = make_row(name, uuid, row)
+
+        for dump in dumps:
+            # The caption is "<table> table"
+            name = str(dump['caption'].rsplit(' ', 1)[0])
+            if name not in tables:
+                continue
+            for index, data in enumerate(dump['data']):
+                row = dict(zip(dump['headings'], data))
+                uuid = datum(row.get('_uuid', str(index)))
+                tables[name].rows[uuid] = make_row(name, uuid, row)
+
+    return tables
+
+
+def synthetic(hosts, ranges=None, options=None, matches=None):
+    '''
+    Tables of a made up config with a number of static hosts. By default
+    they come with a range for every three hosts, an option for every
+    four and a match for every twelve.
+    '''
+    if ranges is None:
+        ranges = hosts // 3
+    if options is None:
+        options = hosts // 4
+    if matches is None:
+        matches = hosts // 12
+
+    tables = empty_tables()
+    tables['System'] = Table([Row(
+        'System', 'system', cur_cfg=1,
+        other_config={'tftp_server_enable': 'true',
+                      'tftp_server_path': '/tftpboot'})])
+    tables['DHCP_Server'] = Table([Row(
+        'DHCP_Server', 'dhcp_server',
+        bootp={'no_matching_tag': 'pxelinux.0'},
+        other_config={'lease_max': str(max(1000, hosts * 2))})])
+
+    rows = []
+    for i in xrange(ranges):
+        net = '10.%d.%d.' % (i >> 8 & 0xff, i & 0xff)
+        rows.append(Row('DHCPSrv_Range', 'range%d' % i,
+                        start_ip_address=net + '10',
+                        end_ip_address=[net + '200'], match_tags=['m1'],
+                        set_tag=['tag%d' % i], netmask=['255.255.255.0'],
+                        broadcast=[net + '255'], lease_duration=[60]))
+    tables['DHCPSrv_Range'] = Table(rows)
+
+    rows = []
+    for i in xrange(hosts):
+        mac = ':'.join('%02x' % (i >> shift & 0xff)
+                       for shift in (40, 32, 24, 16, 8, 0))
+        rows.append(Row('DHCPSrv_Static_Host', 'host%d' % i,
+                        mac_addresses=[mac], set_tags=['tag%d' % (i % 16)],
+                        ip_address='10.%d.%d.100' % (i >> 8 & 0xff, i & 0xff),
+                        client_hostname=['host%d' % i],
+                        lease_duration=[3600]))
+    tables['DHCPSrv_Static_Host'] = Table(rows)
+
+    tables['DHCPSrv_Option'] = Table(
+        Row('DHCPSrv_Option', 'option%d' % i,
+            match_tags=['tag%d' % (i % 16)], option_name=['router'],
+            ipv6=[False],
+            option_value=['10.%d.%d.1' % (i >> 8 & 0xff, i & 0xff)])
+        for i in xrange(options))
+
+    tables['DHCPSrv_Match'] = Table(
+        Row('DHCPSrv_Match', 'match%d' % i, set_tag='pxe%d' % i,
+            option_number=[60], option_value=['PXEClient:Arch:%05d' % i])
+        for i in xrange(matches))
+
+    return tables
@@ -241,6 +241,65 @@ def test_vtysh_dhcp_tftp(topology, step):
     assert "/tmp/testfile" not in dump_bash and "ops_bootp" not \
         in dump_bash
 
+    step('### Test to add DHCP server dnsmasq settings ###')
+    sw1("ovs-vsctl set dhcp_server . other_config:authoritative=true "
+        "other_config:no_ping=true other_config:lease_max=5000 "
+        "other_config:quiet_dhcp=true", shell='bash')
+    dump = sw1("do show dhcp-server")
+    assert "Authoritative : Enabled" in dump
+    assert "No ping : Enabled" in dump
+    assert "Lease max : 5000" in dump
+    assert "Quiet DHCP logging : Enabled" in dump
+
+    sleep(20)
+    dump_bash = sw1("ps -ef | grep dnsmasq", shell='bash')
+    assert "--dhcp-authoritative" in dump_bash
+    assert "--no-ping" in dump_bash
+    assert "--dhcp-lease-max=5000" in dump_bash
+    assert "--quiet-dhcp" in dump_bash
+
+    step('### Test to remove DHCP server dnsmasq settings ###')
+    sw1("ovs-vsctl remove dhcp_server . other_config authoritative "
+        "no_ping lease_max quiet_dhcp", shell='bash')
+    dump = sw1("do show dhcp-server")
+    assert "Authoritative : Disabled" in dump
+    assert "Lease max : Default" in dump
+
+    sleep(20)
+    dump_bash = sw1("ps -ef | grep dnsmasq", shell='bash')
+    assert "--dhcp-authoritative" not in dump_bash
+    assert "--dhcp-lease-max" not in dump_bash
+
+    step('### Test to shard the DHCP interfaces across dnsmasq ###')
+    sw1("ovs-vsctl set dhcp_server . other_config:shards=4", shell='bash')
+    dump = sw1("do show dhcp-server")
+    assert "Shards : 4" in dump
+
+    sleep(20)
+    dump_bash = sw1("ps -ef | grep dnsmasq", shell='bash')
+    assert "--bind-interfaces" in dump_bash
+
+    sw1("ovs-vsctl remove dhcp_server . other_config shards", shell='bash')
+    dump = sw1("do show dhcp-server")
+    assert "Shards : Default" in dump
+
+    sleep(20)
+    dump_bash = sw1("ps -ef | grep dnsmasq", shell='bash')
+    assert "--bind-interfaces" not in dump_bash
+    assert "--pid-file=/var/run/dnsmasq-" not in dump_bash
+
+    step('### Test to profile the DHCP-TFTP daemon ###')
+    dump = sw1("ovs-appctl -t ops_dhcp_tftp dhcp-tftp/profile start sample",
+               shell='bash')
+    assert "sample profiling" in dump
+    dump = sw1("ovs-appctl -t ops_dhcp_tftp dhcp-tftp/profile stop",
+               shell='bash')
+    assert "Profiling stopped, sample profile" in dump
+    sw1("ovs-appctl -t ops_dhcp_tftp dhcp-tftp/profile dump "
+        "/tmp/ops_dhcp_tftp.collapsed", shell='bash')
+    dump = sw1("ls /tmp/ops_dhcp_tftp.collapsed", shell='bash')
+    assert "No such file" not in dump
+
     step('### Test to enable tftp server ###')
     sw1('exit')
     sw1("tftp-server")
@@ -288,6 +347,37 @@ def test_vtysh_dhcp_tftp(topology, step):
     dump = sw1("ps -ef | grep dnsmasq", shell='bash')
     assert "--tftp-secure" not in dump
 
+    step('### Test to add tftp server tuning options ###')
+    sw1("ovs-vsctl set system . other_config:tftp_server_max=200 "
+        "other_config:tftp_server_mtu=1400 "
+        "other_config:tftp_server_port_range=20000-20100 "
+        "other_config:tftp_server_single_port=true", shell='bash')
+    dump = sw1("do show tftp-server")
+    assert "TFTP server max connections : 200" in dump
+    assert "TFTP server MTU : 1400" in dump
+    assert "TFTP server port range : 20000-20100" in dump
+    assert "TFTP server single port : Enabled" in dump
+
+    sleep(20)
+    dump = sw1("ps -ef | grep dnsmasq", shell='bash')
+    assert "--tftp-max=200" in dump
+    assert "--tftp-mtu=1400" in dump
+    assert "--tftp-port-range=20000,20100" in dump
+    assert "--tftp-single-port" in dump
+
+    step('### Test to remove tftp server tuning options ###')
+    sw1("ovs-vsctl remove system . other_config tftp_server_max "
+        "tftp_server_mtu tftp_server_port_range tftp_server_single_port",
+        shell='bash')
+    dump = sw1("do show tftp-server")
+    assert "TFTP server max connections : Default" in dump
+    assert "TFTP server single port : Disabled" in dump
+
+    sleep(20)
+    dump = sw1("ps -ef | grep dnsmasq", shell='bash')
+    assert "--tftp-max" not in dump
+    assert "--tftp-single-port" not in dump
+
     step('### Test to add DHCP leases information ###')
     sw1("export DNSMASQ_LEASE_EXPIRES=1440976224", shell='bash')
     sw1("dhcp_leases add 11:22:33:44:55:66 10.0.0.100 test_s1",
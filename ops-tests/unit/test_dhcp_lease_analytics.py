@@ -0,0 +1,105 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import sys
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+import dhcp_lease_analytics as analytics  # noqa
+
+NOW = 1460000000
+
+
+class LeaseRow(object):
+    def __init__(self, ip, mac, expiry, hostname=None):
+        self.ip_address = ip
+        self.mac_address = mac
+        self.expiry_time = str(expiry)
+        self.client_hostname = [hostname] if hostname else []
+
+
+# One lease per expiry bucket, infinite leases, a MAC leasing an IPv4 and
+# an IPv6 address, hostnames tied on count and malformed values, the
+# malformed expiry counting as infinite
+LEASES = [
+    LeaseRow("10.0.0.1", "aa:00:00:00:00:01", NOW - 60, "alpha"),
+    LeaseRow("10.0.0.2", "aa:00:00:00:00:02", NOW, "beta"),
+    LeaseRow("10.0.0.3", "aa:00:00:00:00:03", NOW + 120, "alpha"),
+    LeaseRow("10.0.1.4", "aa:00:00:00:00:04", NOW + 600, "beta"),
+    LeaseRow("10.0.1.5", "aa:00:00:00:00:05", NOW + 3600),
+    LeaseRow("192.168.7.6", "aa:00:00:00:00:06", NOW + 3601, "gamma"),
+    LeaseRow("192.168.7.7", "aa:00:00:00:00:07", NOW + 5 * 3600),
+    LeaseRow("2001:db8::1", "aa:00:00:00:00:01", NOW + 13 * 3600, "alpha"),
+    LeaseRow("2001:db8::2", "aa:00:00:00:00:08", NOW + 2 * 24 * 3600),
+    LeaseRow("2001:db8:0:1::1", "aa:00:00:00:00:09", NOW + 30 * 24 * 3600),
+    LeaseRow("10.0.0.10", "aa:00:00:00:00:0a", 0, "delta"),
+    LeaseRow("2001:db8:0:1::2", "aa:00:00:00:00:0b", 0),
+    LeaseRow("not-an-address", "not-a-mac", "never", "delta"),
+]
+
+
+def python_columns(columns):
+    '''
+    The same columns as plain python lists, for the pure python report.
+    '''
+    def values(column):
+        return column.tolist() if hasattr(column, "tolist") else column
+
+    return analytics.LeaseColumns(
+        values(columns.ip4), values(columns.ip6_hi), values(columns.ip6_lo),
+        values(columns.expiry), values(columns.mac),
+        values(columns.hostname), columns.hostnames)
+
+
+class AnalyzeTest(unittest.TestCase):
+    def test_python_report(self):
+        columns = python_columns(analytics.load_columns(LEASES))
+        report = analytics.analyze(columns, now=NOW, top=3)
+
+        self.assertEqual(report["backend"], "python")
+        self.assertEqual(report["leases"], 13)
+        self.assertEqual(report["infinite"], 3)
+        self.assertEqual(report["expiry_histogram"],
+                         {"expired": 2, "5m": 1, "15m": 1, "1h": 1,
+                          "4h": 1, "12h": 1, "1d": 1, "7d": 1, "later": 1})
+        self.assertEqual(report["leases_per_24"],
+                         {"10.0.0.0/24": 4, "10.0.1.0/24": 2,
+                          "192.168.7.0/24": 2})
+        self.assertEqual(report["leases_per_64"],
+                         {"2001:db8::/64": 2, "2001:db8:0:1::/64": 2})
+        self.assertEqual(report["churn_per_hour"], 3)
+        self.assertEqual(report["unique_macs"], 12)
+        self.assertEqual(report["top_hostnames"],
+                         [["alpha", 3], ["beta", 2], ["delta", 2]])
+
+    @unittest.skipIf(analytics.numpy is None, "needs NumPy")
+    def test_numpy_report_matches_python(self):
+        columns = analytics.load_columns(LEASES)
+        for top in (1, 3, analytics.DEFAULT_TOP_HOSTNAMES):
+            report = analytics.analyze(columns, now=NOW, top=top)
+            expected = analytics.analyze(python_columns(columns), now=NOW,
+                                         top=top)
+
+            self.assertEqual(report.pop("backend"), "numpy")
+            self.assertEqual(expected.pop("backend"), "python")
+            self.assertEqual(report, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
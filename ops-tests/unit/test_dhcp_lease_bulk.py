@@ -0,0 +1,247 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import StringIO
+import sys
+import unittest
+import uuid
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+try:
+    import ovs.db.idl
+    import dhcp_lease_bulk as bulk
+    import dhcp_lease_db
+except ImportError:
+    bulk = None
+
+OPTIONAL_COLUMNS = ("client_hostname", "client_id")
+
+
+class LeaseRow(object):
+    '''
+    DHCP_Lease row as the IDL presents it, optional columns as lists.
+    '''
+    def __init__(self, row_uuid, **columns):
+        self.__dict__["uuid"] = row_uuid
+        for column in OPTIONAL_COLUMNS:
+            self.__dict__[column] = []
+        for column, value in columns.iteritems():
+            setattr(self, column, value)
+
+    def __setattr__(self, column, value):
+        if column in OPTIONAL_COLUMNS and not isinstance(value, list):
+            value = [value]
+        self.__dict__[column] = value
+
+
+class Table(object):
+    def __init__(self):
+        self.rows = {}
+
+
+class Idl(object):
+    '''
+    Lease DB IDL whose inserted rows only show up on the run() following
+    the commit, as when the update arrives after the commit reply.
+    '''
+    def __init__(self):
+        self.tables = {"DHCP_Lease": Table()}
+        self.arriving = []
+
+    def run(self):
+        for row in self.arriving:
+            self.tables["DHCP_Lease"].rows[row.uuid] = row
+        self.arriving = []
+
+    def add(self, **columns):
+        row = LeaseRow(uuid.uuid4(), **columns)
+        self.tables["DHCP_Lease"].rows[row.uuid] = row
+        return row
+
+
+class Transaction(object):
+    fail = False
+
+    def __init__(self, idl):
+        self.idl = idl
+        self.inserted = []
+        self.uuids = {}
+
+    def insert(self, unused_table):
+        row = LeaseRow(uuid.uuid4())
+        self.inserted.append(row)
+        return row
+
+    def commit_block(self):
+        if Transaction.fail:
+            return ovs.db.idl.Transaction.ERROR
+        for row in self.inserted:
+            self.uuids[row.uuid] = uuid.uuid4()
+            self.idl.arriving.append(LeaseRow(self.uuids[row.uuid],
+                                              **dict((column, getattr(
+                                                  row, column))
+                                                  for column in bulk.FIELDS)))
+        return ovs.db.idl.Transaction.SUCCESS
+
+    def abort(self):
+        pass
+
+    def get_insert_uuid(self, row_uuid):
+        return self.uuids.get(row_uuid)
+
+
+def lease(mac, ip, hostname="*", client_id="*", expiry="1460000000"):
+    return {"expiry_time": expiry, "mac_address": mac, "ip_address": ip,
+            "client_hostname": hostname, "client_id": client_id}
+
+
+@unittest.skipIf(bulk is None, "needs the ovs python library")
+class LeaseBulkTest(unittest.TestCase):
+    def setUp(self):
+        self.transaction = ovs.db.idl.Transaction
+        for status in ("UNCHANGED", "SUCCESS", "ERROR"):
+            setattr(Transaction, status, getattr(self.transaction, status))
+        Transaction.fail = False
+        ovs.db.idl.Transaction = Transaction
+
+        self.db = dhcp_lease_db.DHCPLeaseDB.__new__(dhcp_lease_db.DHCPLeaseDB)
+        self.db.idl = Idl()
+        self.db.txn = None
+
+    def tearDown(self):
+        ovs.db.idl.Transaction = self.transaction
+
+    def rows(self):
+        return self.db.idl.tables["DHCP_Lease"].rows.values()
+
+    def test_duplicate_mac_across_chunks_is_inserted_once(self):
+        entries = [lease("00:00:00:00:00:01", "10.0.0.1"),
+                   lease("00:00:00:00:00:02", "10.0.0.2"),
+                   lease("00:00:00:00:00:01", "10.0.0.3")]
+        totals = bulk.import_leases(self.db, entries, chunk_size=1)
+
+        self.assertEqual(totals["inserted"], 2)
+        rows = dict((row.mac_address, row) for row in self.rows())
+        self.assertEqual(len(self.rows()), 2)
+        self.assertEqual(rows["00:00:00:00:00:01"].ip_address, "10.0.0.3")
+
+    def test_duplicate_mac_in_chunk_is_upserted_once(self):
+        entries = [lease("00:00:00:00:00:01", "10.0.0.1"),
+                   lease("00:00:00:00:00:01", "10.0.0.3"),
+                   lease("00:00:00:00:00:02", "10.0.0.2")]
+        totals = bulk.import_leases(self.db, entries, chunk_size=3)
+
+        self.assertEqual(totals["inserted"], 2)
+        rows = dict((row.mac_address, row) for row in self.rows())
+        self.assertEqual(len(self.rows()), 2)
+        self.assertEqual(rows["00:00:00:00:00:01"].ip_address, "10.0.0.3")
+
+    def test_entries_are_streamed(self):
+        consumed = []
+
+        def entries():
+            for i in xrange(1, 10):
+                consumed.append(i)
+                yield lease("00:00:00:00:00:%02x" % i, "10.0.0.%d" % i)
+
+        upsert_rows = self.db.upsert_rows
+
+        def upsert(chunk, index):
+            # Only the entries of the chunk were read from the dump
+            self.assertEqual(len(consumed), len(self.rows()) + len(chunk))
+            return upsert_rows(chunk, index)
+
+        self.db.upsert_rows = upsert
+        totals = bulk.import_leases(self.db, entries(), chunk_size=4)
+        self.assertEqual(totals["inserted"], 9)
+
+    def test_reimport_is_unchanged(self):
+        entries = [lease("00:00:00:00:00:%02x" % i, "10.0.0.%d" % i,
+                         hostname="host%d" % i)
+                   for i in xrange(1, 6)]
+        bulk.import_leases(self.db, entries, chunk_size=2)
+        totals = bulk.import_leases(self.db, entries, chunk_size=2)
+
+        self.assertEqual(totals, {"inserted": 0, "updated": 0,
+                                  "unchanged": 5, "failed": 0})
+
+    def test_reimport_of_empty_optional_columns_is_unchanged(self):
+        self.db.idl.add(expiry_time="1460000000",
+                        mac_address="00:00:00:00:00:01",
+                        ip_address="10.0.0.1")
+        out = StringIO.StringIO()
+        self.assertEqual(bulk.export_leases(self.db, out), 1)
+
+        out.seek(0)
+        totals = bulk.import_leases(self.db, bulk.read_leases(out))
+        self.assertEqual(totals["unchanged"], 1)
+        self.assertEqual(totals["updated"], 0)
+
+    def test_failed_chunk(self):
+        Transaction.fail = True
+        totals = bulk.import_leases(self.db,
+                                    [lease("00:00:00:00:00:01", "10.0.0.1")])
+        self.assertEqual(totals["failed"], 1)
+
+        Transaction.fail = False
+        totals = bulk.import_leases(self.db,
+                                    [lease("00:00:00:00:00:01", "10.0.0.1")])
+        self.assertEqual(totals["inserted"], 1)
+        self.assertEqual(len(self.rows()), 1)
+
+    def test_export_import_round_trip(self):
+        for fmt in bulk.FORMATS:
+            self.db.idl = Idl()
+            self.db.idl.add(expiry_time="1460000000",
+                            mac_address="00:00:00:00:00:01",
+                            ip_address="10.0.0.1",
+                            client_hostname=["host1"],
+                            client_id=["01:00:00:00:00:00:01"])
+            self.db.idl.add(expiry_time="1460000001",
+                            mac_address="00:00:00:00:00:02",
+                            ip_address="10.0.0.2")
+            out = StringIO.StringIO()
+            self.assertEqual(bulk.export_leases(self.db, out, fmt), 2)
+
+            out.seek(0)
+            entries = sorted(bulk.read_leases(out, fmt),
+                             key=lambda entry: entry["mac_address"])
+            self.assertEqual(entries, [
+                lease("00:00:00:00:00:01", "10.0.0.1", "host1",
+                      "01:00:00:00:00:00:01"),
+                lease("00:00:00:00:00:02", "10.0.0.2",
+                      expiry="1460000001")])
+
+    def test_read_skips_records_without_mac(self):
+        stream = StringIO.StringIO('{"ip_address": "10.0.0.1"}\n\n'
+                                   '{"mac_address": "00:00:00:00:00:01"}\n')
+        stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()
+        try:
+            entries = list(bulk.read_leases(stream))
+        finally:
+            sys.stderr = stderr
+
+        self.assertEqual([entry["mac_address"] for entry in entries],
+                         ["00:00:00:00:00:01"])
+        self.assertEqual(entries[0]["client_hostname"], "*")
+
+
+if __name__ == '__main__':
+    unittest.main()
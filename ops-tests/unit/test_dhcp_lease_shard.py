@@ -0,0 +1,78 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import socket
+import sys
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+import dhcp_lease_shard  # noqa
+from dhcp_lease_shard import LeaseOwner  # noqa
+
+NETWORKS = [(0, socket.AF_INET, 0x0a, 8),
+            (1, socket.AF_INET, 0x0a0001, 24),
+            (2, socket.AF_INET6, 0x20010db8 << 32, 64)]
+
+
+def environ(shard, networks=NETWORKS):
+    return dict(item.split('=', 1)
+                for item in dhcp_lease_shard.shard_env(shard, networks))
+
+
+class LeaseShardTest(unittest.TestCase):
+    def test_networks_round_trip(self):
+        text = dhcp_lease_shard.format_networks(NETWORKS)
+        self.assertEqual(text, '0=10.0.0.0/8 1=10.0.1.0/24 2=2001:db8::/64')
+        self.assertEqual(dhcp_lease_shard.parse_networks(text), NETWORKS)
+
+    def test_malformed_networks_skipped(self):
+        self.assertEqual(dhcp_lease_shard.parse_networks(
+            'x=10.0.0.0/8 1=host/24 1=10.0.1.0 1=10.0.1.0/24'),
+            [NETWORKS[1]])
+
+    def test_longest_prefix(self):
+        self.assertEqual(dhcp_lease_shard.address_shard('10.0.1.7',
+                                                        NETWORKS), 1)
+        self.assertEqual(dhcp_lease_shard.address_shard('10.0.2.7',
+                                                        NETWORKS), 0)
+        self.assertEqual(dhcp_lease_shard.address_shard('2001:db8::7',
+                                                        NETWORKS), 2)
+        for address in ('192.168.0.1', '*', None):
+            self.assertEqual(dhcp_lease_shard.address_shard(address,
+                                                            NETWORKS), 0)
+
+    def test_owner(self):
+        owner = LeaseOwner(environ(1))
+        self.assertTrue(owner.owns('10.0.1.7'))
+        self.assertFalse(owner.owns('10.0.2.7'))
+        self.assertFalse(owner.owns('2001:db8::7'))
+
+        owner = LeaseOwner(environ(0))
+        self.assertTrue(owner.owns('10.0.2.7'))
+        self.assertTrue(owner.owns('192.168.0.1'))
+        self.assertFalse(owner.owns('10.0.1.7'))
+
+    def test_single_dnsmasq_owns_everything(self):
+        owner = LeaseOwner({})
+        for address in ('10.0.1.7', '2001:db8::7', '*'):
+            self.assertTrue(owner.owns(address))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+import dhcp_lease_stats as stats  # noqa
+
+# Appends records to the ring given, as the script of a dnsmasq shard does
+APPENDER = ("import sys; sys.path.insert(0, %r); import dhcp_lease_stats; "
+            "ring = dhcp_lease_stats.StatsRing(sys.argv[1], slots=4096); "
+            "[ring.append(i, sys.argv[2], {}, 0.0, 0.0, 0, 0) "
+            "for i in xrange(int(sys.argv[3]))]; ring.close()")
+
+
+def append(ring, start, command="add", total=0.01, depth=0):
+    ring.append(start, command, {"import": total / 2}, total, float("nan"),
+                depth, 0)
+
+
+class StatsRingTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "dhcp_leases.stats")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def test_records_in_order(self):
+        ring = stats.StatsRing(self.path, slots=4)
+        for i in xrange(3):
+            append(ring, 100.0 + i)
+        records = list(ring.records())
+        ring.close()
+
+        self.assertEqual([r["seq"] for r in records], [1, 2, 3])
+        self.assertEqual([r["start"] for r in records], [100.0, 101.0, 102.0])
+        self.assertEqual(records[0]["command"], "add")
+        self.assertEqual(records[0]["import"], 0.005)
+        self.assertTrue(math.isnan(records[0]["age"]))
+
+    def test_wraps_around(self):
+        ring = stats.StatsRing(self.path, slots=4)
+        for i in xrange(10):
+            append(ring, 100.0 + i)
+        self.assertEqual([r["seq"] for r in ring.records()], [7, 8, 9, 10])
+        ring.close()
+
+    def test_writer_resets_ring_of_other_format(self):
+        ring = stats.StatsRing(self.path, slots=4)
+        append(ring, 100.0)
+        ring.close()
+
+        ring = stats.StatsRing(self.path, slots=8)
+        self.assertEqual(ring.sequence(), 0)
+        self.assertEqual(list(ring.records()), [])
+        ring.close()
+
+    def test_reader_leaves_file_untouched(self):
+        ring = stats.StatsRing(self.path, slots=4)
+        append(ring, 100.0)
+        ring.close()
+        before = self.read()
+
+        # A reader takes the slot count from the file
+        ring = stats.StatsRing(self.path, readonly=True)
+        self.assertEqual([r["seq"] for r in ring.records()], [1])
+        ring.close()
+        self.assertEqual(self.read(), before)
+
+    def test_reader_rejects_other_files(self):
+        self.assertRaises(EnvironmentError, stats.StatsRing, self.path,
+                          readonly=True)
+        self.assertFalse(os.path.exists(self.path))
+
+        for content in ("", "garbage" * 100):
+            with open(self.path, "wb") as f:
+                f.write(content)
+            self.assertRaises(ValueError, stats.StatsRing, self.path,
+                              readonly=True)
+            self.assertEqual(self.read(), content)
+
+    def test_reader_rejects_truncated_ring(self):
+        ring = stats.StatsRing(self.path, slots=4)
+        ring.close()
+        with open(self.path, "r+b") as f:
+            f.truncate(stats.HEADER.size + stats.RECORD.size)
+
+        self.assertRaises(ValueError, stats.StatsRing, self.path,
+                          readonly=True)
+
+    def test_concurrent_writers_lose_nothing(self):
+        writers = [subprocess.Popen([sys.executable, "-c", APPENDER % REPO,
+                                     self.path, "w%d" % i, "500"])
+                   for i in xrange(4)]
+        for writer in writers:
+            self.assertEqual(writer.wait(), 0)
+
+        ring = stats.StatsRing(self.path, readonly=True)
+        records = list(ring.records())
+        ring.close()
+        self.assertEqual([r["seq"] for r in records], range(1, 2001))
+        for i in xrange(4):
+            self.assertEqual(sorted(r["start"] for r in records
+                                    if r["command"] == "w%d" % i),
+                             range(500))
+
+    def test_record_run_counts_queued_runs(self):
+        stats.phase_times.clear()
+        stats.record_run("add", 100.0, 100.01, path=self.path)
+        stats.record_run("add", 100.02, 100.03, path=self.path)
+        stats.record_run("add", 200.0, 200.01, path=self.path)
+
+        ring = stats.StatsRing(self.path, readonly=True)
+        self.assertEqual([r["depth"] for r in ring.records()], [0, 1, 0])
+        ring.close()
+
+
+class SummaryTest(unittest.TestCase):
+    def test_percentile(self):
+        values = range(1, 101)
+        self.assertEqual(stats.percentile(values, 0.5), 50)
+        self.assertEqual(stats.percentile(values, 0.99), 99)
+        self.assertEqual(stats.percentile([], 0.5), 0.0)
+
+    def test_summarize(self):
+        records = []
+        for i in xrange(4):
+            entry = dict((name, 0.0) for name in stats.PHASES)
+            entry.update(command="add", total=0.001 * (i + 1), age=float(i),
+                         depth=i, flags=stats.FLAG_BACKLOG if i == 3 else 0)
+            records.append(entry)
+
+        summary = stats.summarize(records)["add"]
+        self.assertEqual(summary["count"], 4)
+        self.assertEqual(summary["backlog"], 1)
+        self.assertEqual(summary["max_depth"], 3)
+        self.assertEqual(summary["max_age"], 3.0)
+        self.assertEqual(summary["total"], {"p50": 2.0, "p99": 4.0})
+
+    def test_lease_event_age(self):
+        environ = {"DNSMASQ_LEASE_EXPIRES": "1100",
+                   "DNSMASQ_LEASE_LENGTH": "3600"}
+        self.assertEqual(stats.lease_event_age(1000, environ), 3500)
+        self.assertEqual(stats.lease_event_age(
+            1000, {"DNSMASQ_LEASE_EXPIRES": "900"}), 100)
+        self.assertEqual(stats.lease_event_age(
+            1000, {"DNSMASQ_LEASE_EXPIRES": "0"}), None)
+        self.assertEqual(stats.lease_event_age(1000, {}), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import StringIO
+import subprocess
+import sys
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+import dhcp_leases  # noqa
+import dhcp_lease_shard  # noqa
+
+try:
+    import ovs.db.idl
+    import dhcp_lease_db
+except ImportError:
+    dhcp_lease_db = None
+
+# Lists the modules a dhcp_leases command loads, in a fresh interpreter
+MODULES = ("import sys; sys.path.insert(0, %r); import dhcp_leases; "
+           "dhcp_leases.main(['dhcp_leases'] + %r); "
+           "print('\\n'.join(sorted(sys.modules)))")
+
+
+def loaded_modules(argv):
+    out = subprocess.check_output([sys.executable, "-S", "-c",
+                                   MODULES % (REPO, argv)])
+    return set(out.split())
+
+
+class DhcpLeasesTest(unittest.TestCase):
+    def test_tftp_loads_no_stats(self):
+        modules = loaded_modules(["tftp", "1024", "10.0.0.2", "boot.img"])
+        self.assertNotIn("dhcp_lease_stats", modules)
+        self.assertNotIn("mmap", modules)
+        self.assertNotIn("ovs", modules)
+
+    def test_lease_entry_from_argv(self):
+        environ = dict(os.environ)
+        os.environ["DNSMASQ_LEASE_EXPIRES"] = "1460000000"
+        try:
+            entry = dhcp_leases.dhcp_lease_entry_from_argv(
+                ["dhcp_leases", "add", "00:11:22:33:44:55", "10.0.0.2"])
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+
+        self.assertEqual(entry, {"expiry_time": "1460000000",
+                                 "mac_address": "00:11:22:33:44:55",
+                                 "ip_address": "10.0.0.2",
+                                 "client_hostname": "*",
+                                 "client_id": "*"})
+
+    def test_operator_commands_not_recorded(self):
+        import dhcp_lease_stats
+        recorded = []
+        commands = dict(dhcp_leases.LEASE_COMMANDS)
+        record_run = dhcp_lease_stats.record_run
+        dhcp_lease_stats.record_run = \
+            lambda command, start: recorded.append(command)
+        try:
+            for command in commands:
+                dhcp_leases.LEASE_COMMANDS[command] = lambda entry: None
+                dhcp_leases.main(["dhcp_leases", command])
+        finally:
+            dhcp_leases.LEASE_COMMANDS.update(commands)
+            dhcp_lease_stats.record_run = record_run
+
+        self.assertEqual(sorted(recorded), ["add", "del", "init", "old"])
+
+    def test_add_runs_no_shell(self):
+        class Process(object):
+            returncode = 0
+
+            def __init__(self, args, **kwargs):
+                calls.append((args, kwargs))
+
+            def communicate(self):
+                return "[{}]", ""
+
+        calls = []
+        popen = subprocess.Popen
+        subprocess.Popen = Process
+        try:
+            dhcp_leases.dhcp_leases_add({"expiry_time": "1460000000",
+                                         "mac_address": "00:11:22:33:44:55",
+                                         "ip_address": "10.0.0.2",
+                                         "client_hostname": "x'; reboot; '",
+                                         "client_id": "*"})
+        finally:
+            subprocess.Popen = popen
+
+        (args, kwargs), = calls
+        self.assertFalse(kwargs.get("shell"))
+        self.assertEqual(args[:2], ["ovsdb-client", "transact"])
+        self.assertEqual(len(args), 3)
+        database, operation = json.loads(args[2])
+        self.assertEqual(database, "dhcp_leases")
+        self.assertEqual(operation["op"], "insert")
+        self.assertEqual(operation["row"]["client_hostname"],
+                         "x'; reboot; '")
+
+    def test_init_entry_has_no_expiry(self):
+        entry = dhcp_leases.dhcp_lease_entry_from_argv(["dhcp_leases",
+                                                        "init"])
+        self.assertEqual(set(entry.values()), set(["*"]))
+
+
+class LeaseRow(object):
+    def __init__(self, mac, ip):
+        self.expiry_time = "1460000000"
+        self.mac_address = mac
+        self.ip_address = ip
+        self.client_hostname = []
+        self.client_id = []
+
+
+class Table(object):
+    def __init__(self, rows):
+        self.rows = dict((row.mac_address, row) for row in rows)
+
+
+class Idl(object):
+    def __init__(self, rows):
+        self.tables = {"DHCP_Lease": Table(rows)}
+
+
+class LeaseDB(object):
+    '''
+    Stands for the DHCPLeaseDB of get_lease_db().
+    '''
+    def __init__(self, rows):
+        self.idl = Idl(rows)
+
+    def find_row_by_mac_addr(self, mac_addr):
+        row = self.idl.tables["DHCP_Lease"].rows.get(mac_addr)
+        return row, row is not None
+
+    def delete_row(self, mac_addr):
+        row = self.idl.tables["DHCP_Lease"].rows.pop(mac_addr, None)
+        return row is not None, ovs.db.idl.Transaction.SUCCESS
+
+
+@unittest.skipIf(dhcp_lease_db is None, "needs the ovs python library")
+class LeaseShardTest(unittest.TestCase):
+    def setUp(self):
+        self.environ = dict(os.environ)
+        self.get_lease_db = dhcp_lease_db.get_lease_db
+        self.db = LeaseDB([LeaseRow("aa:00:00:00:00:01", "10.0.0.5"),
+                           LeaseRow("aa:00:00:00:00:02", "10.0.1.5"),
+                           LeaseRow("aa:00:00:00:00:03", "192.168.0.5")])
+        dhcp_lease_db.get_lease_db = lambda: self.db
+
+    def tearDown(self):
+        dhcp_lease_db.get_lease_db = self.get_lease_db
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+    def shard(self, shard):
+        os.environ.update(item.split("=", 1) for item in
+                          dhcp_lease_shard.shard_env(
+                              shard, dhcp_lease_shard.parse_networks(
+                                  "0=10.0.0.0/24 1=10.0.1.0/24")))
+
+    def init(self):
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            dhcp_leases.dhcp_leases_init({})
+            out = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        return sorted(line.split()[1] for line in out.splitlines())
+
+    def delete(self, mac):
+        dhcp_leases.dhcp_leases_delete({"mac_address": mac})
+        return mac not in self.db.idl.tables["DHCP_Lease"].rows
+
+    def test_init_loads_leases_of_shard(self):
+        self.shard(1)
+        self.assertEqual(self.init(), ["aa:00:00:00:00:02"])
+        self.shard(0)
+        self.assertEqual(self.init(), ["aa:00:00:00:00:01",
+                                       "aa:00:00:00:00:03"])
+
+    def test_single_dnsmasq_loads_every_lease(self):
+        self.assertEqual(len(self.init()), 3)
+
+    def test_del_leaves_leases_of_other_shards(self):
+        self.shard(0)
+        self.assertFalse(self.delete("aa:00:00:00:00:02"))
+        self.assertTrue(self.delete("aa:00:00:00:00:01"))
+        self.shard(1)
+        self.assertTrue(self.delete("aa:00:00:00:00:02"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import fcntl
+import os
+import signal
+import sys
+import time
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+import dhcp_tftp_profile  # noqa
+
+
+def burn(seconds):
+    end = time.clock() + seconds
+    while time.clock() < end:
+        pass
+
+
+def read_all(fd):
+    data = ''
+    try:
+        while True:
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                break
+            data += chunk
+    except OSError:
+        pass
+    return data
+
+
+class SampleTest(unittest.TestCase):
+    def setUp(self):
+        self.read_fd, self.write_fd = os.pipe()
+        for fd in (self.read_fd, self.write_fd):
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self.wakeup_fd = signal.set_wakeup_fd(self.write_fd)
+        self.profiler = dhcp_tftp_profile.Profiler()
+
+    def tearDown(self):
+        if self.profiler.mode is not None:
+            self.profiler.stop()
+        signal.set_wakeup_fd(self.wakeup_fd)
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+    def test_samples_do_not_write_wakeup_fd(self):
+        self.profiler.start('sample')
+        self.assertTrue(self.profiler.sampling())
+        burn(0.2)
+        self.assertEqual(read_all(self.read_fd), '')
+        self.assertTrue(self.profiler.samples)
+
+        self.profiler.stop()
+        self.assertFalse(self.profiler.sampling())
+        self.assertEqual(signal.set_wakeup_fd(self.write_fd), self.write_fd)
+
+    def test_cprofile_keeps_wakeup_fd(self):
+        self.profiler.start('cprofile')
+        self.assertFalse(self.profiler.sampling())
+        self.assertEqual(signal.set_wakeup_fd(self.write_fd), self.write_fd)
+        self.profiler.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import logging
+import os
+import sys
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO, "opsplugins"))
+
+import dhcpoptions  # noqa
+import dhcptftpservervalidations  # noqa
+
+
+class Handler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class CatalogTest(unittest.TestCase):
+    def test_names_of_newer_dnsmasq(self):
+        for number, name in ((100, "posix-timezone"),
+                             (101, "tzdb-timezone"),
+                             (150, "tftp-server-address")):
+            self.assertEqual(dhcpoptions.lookup_name(name).number, number)
+            self.assertEqual(dhcpoptions.lookup_number(number).name, name)
+
+    def test_lookup_ignores_case(self):
+        self.assertEqual(dhcpoptions.lookup_name("Router").number, 3)
+        self.assertEqual(dhcpoptions.lookup_name("dns-server", True).number,
+                         23)
+
+
+class OptionErrorTest(unittest.TestCase):
+    def setUp(self):
+        self.handler = Handler()
+        dhcptftpservervalidations.log.addHandler(self.handler)
+
+    def tearDown(self):
+        dhcptftpservervalidations.log.removeHandler(self.handler)
+
+    def error(self, name=None, number=None, value=None, ipv6=False):
+        return dhcptftpservervalidations.get_option_error(
+            [name] if name else [], [number] if number else [],
+            [value] if value else [], [ipv6])
+
+    def test_unknown_name_warns(self):
+        self.assertEqual(self.error("captive-portal", value="x"), None)
+        self.assertEqual(len(self.handler.messages), 1)
+        self.assertIn("captive-portal", self.handler.messages[0])
+
+    def test_value_checked(self):
+        self.assertEqual(self.error("tftp-server-address", value="10.0.0.1"),
+                         None)
+        self.assertNotEqual(self.error("tftp-server-address", value="x"),
+                            None)
+        self.assertNotEqual(self.error(number=26, value="70000"), None)
+        self.assertEqual(self.error(number=224, value="anything"), None)
+        self.assertEqual(self.handler.messages, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
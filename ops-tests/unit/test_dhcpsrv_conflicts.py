@@ -0,0 +1,158 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import sys
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO, "benchmarks"))
+
+import validator_standins  # noqa
+from validator_standins import Idl, Row, ValidationArgs  # noqa
+
+validator_standins.install()
+
+import dhcpsrv_conflicts  # noqa
+from opsvalidator.error import ValidationError  # noqa
+
+
+def dhcp_range(name, start, end=None, netmask=None, prefix_len=None,
+               is_static=False):
+    return Row(name=name, start_ip_address=start,
+               end_ip_address=[end] if end else [],
+               netmask=[netmask] if netmask else [],
+               prefix_len=[prefix_len] if prefix_len is not None else [],
+               is_static=[True] if is_static else [])
+
+
+def host(ip, *macs):
+    return Row(ip_address=ip, mac_addresses=list(macs))
+
+
+def server_idl(ranges=(), hosts=()):
+    server = Row(ranges=list(ranges), static_hosts=list(hosts))
+    return Idl(DHCP_Server=[server], DHCPSrv_Range=ranges,
+               DHCPSrv_Static_Host=hosts)
+
+
+def details(idl):
+    return sorted(conflict.details
+                  for conflict in dhcpsrv_conflicts.find_conflicts(idl))
+
+
+class CoverageTest(unittest.TestCase):
+    def test_host_in_subnet_outside_pool(self):
+        idl = server_idl([dhcp_range("r", "10.0.0.100", "10.0.0.200",
+                                     "255.255.255.0")],
+                         [host("10.0.0.5", "aa:00:00:00:00:01")])
+        self.assertEqual(details(idl), [])
+
+    def test_host_outside_subnet(self):
+        ranges = [dhcp_range("r1", "10.0.0.100", "10.0.0.200",
+                             "255.255.255.0"),
+                  dhcp_range("r2", "10.0.2.1", "10.0.2.10",
+                             "255.255.255.0")]
+        stranded = host("10.0.1.5", "aa:00:00:00:00:01")
+        idl = server_idl(ranges, [stranded])
+
+        conflicts = dhcpsrv_conflicts.find_conflicts(idl)
+        self.assertEqual(len(conflicts), 1)
+        self.assertEqual(conflicts[0].uuids,
+                         frozenset([stranded.uuid, ranges[0].uuid,
+                                    ranges[1].uuid]))
+
+    def test_static_range_covers_subnet(self):
+        idl = server_idl([dhcp_range("r", "192.168.1.0",
+                                     netmask="255.255.255.0",
+                                     is_static=True)],
+                         [host("192.168.1.77", "aa:00:00:00:00:01")])
+        self.assertEqual(details(idl), [])
+
+    def test_range_without_netmask_is_not_checked(self):
+        idl = server_idl([dhcp_range("r1", "10.0.0.1", "10.0.0.10",
+                                     "255.255.255.0"),
+                          dhcp_range("r2", "10.1.0.1", "10.1.0.10")],
+                         [host("172.16.0.1", "aa:00:00:00:00:01")])
+        self.assertEqual(details(idl), [])
+
+    def test_ipv6_prefix_len(self):
+        ranges = [dhcp_range("r", "2001:db8::100", "2001:db8::200")]
+        inside = host("2001:db8::ffff:1", "aa:00:00:00:00:01")
+        outside = host("2001:db8:0:1::1", "aa:00:00:00:00:02")
+        self.assertEqual(details(server_idl(ranges, [inside, outside])),
+                         ["Static host 2001:db8:0:1::1 is outside the "
+                          "subnet of every range."])
+
+        ranges = [dhcp_range("r", "2001:db8::100", "2001:db8::200",
+                             prefix_len=48)]
+        self.assertEqual(details(server_idl(ranges, [inside, outside])), [])
+
+    def test_other_family_is_not_checked(self):
+        idl = server_idl([dhcp_range("r", "10.0.0.1", "10.0.0.10",
+                                     "255.255.255.0")],
+                         [host("2001:db8::1", "aa:00:00:00:00:01")])
+        self.assertEqual(details(idl), [])
+
+    def test_range_stranding_host_fails(self):
+        shrunk = dhcp_range("r", "10.0.1.1", "10.0.1.10", "255.255.255.0")
+        idl = server_idl([shrunk], [host("10.0.0.5", "aa:00:00:00:00:01")])
+
+        self.assertRaises(ValidationError, dhcpsrv_conflicts.validate_row,
+                          ValidationArgs(shrunk, idl))
+
+
+class ConflictTest(unittest.TestCase):
+    def test_overlapping_ranges(self):
+        idl = server_idl([dhcp_range("r1", "10.0.0.1", "10.0.0.100",
+                                     "255.255.255.0"),
+                          dhcp_range("r2", "10.0.0.50", "10.0.0.150",
+                                     "255.255.255.0"),
+                          dhcp_range("r3", "10.0.0.151", "10.0.0.200",
+                                     "255.255.255.0")])
+        self.assertEqual(details(idl), ["Range r1 overlaps range r2."])
+
+    def test_duplicate_ip_and_mac(self):
+        hosts = [host("10.0.0.1", "AA:00:00:00:00:01"),
+                 host("10.0.0.1", "aa:00:00:00:00:02"),
+                 host("10.0.0.3", "aa:00:00:00:00:01")]
+        self.assertEqual(details(server_idl(hosts=hosts)), [
+            "IP address 10.0.0.1 is used by 2 static hosts.",
+            "MAC address aa:00:00:00:00:01 is used by static hosts "
+            "10.0.0.1, 10.0.0.3."])
+
+    def test_uninvolved_row_passes(self):
+        hosts = [host("10.0.0.1", "aa:00:00:00:00:01"),
+                 host("10.0.0.1", "aa:00:00:00:00:02"),
+                 host("10.0.0.3", "aa:00:00:00:00:03")]
+        idl = server_idl(hosts=hosts)
+
+        dhcpsrv_conflicts.validate_row(ValidationArgs(hosts[2], idl))
+        self.assertRaises(ValidationError, dhcpsrv_conflicts.validate_row,
+                          ValidationArgs(hosts[0], idl))
+
+    def test_conflicts_cached_per_transaction(self):
+        hosts = [host("10.0.0.1", "aa:00:00:00:00:01")]
+        idl = server_idl(hosts=hosts)
+        first = dhcpsrv_conflicts.get_conflicts(idl)
+        self.assertTrue(dhcpsrv_conflicts.get_conflicts(idl) is first)
+
+        idl.change_seqno += 1
+        self.assertFalse(dhcpsrv_conflicts.get_conflicts(idl) is first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import sys
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+import dnsmasq_config  # noqa
+from dnsmasq_config import DnsmasqConfig  # noqa
+
+RANGES = [('10.0.0.10', '--dhcp-range=10.0.0.10,10.0.0.20'),
+          ('2001:db8::1', '--dhcp-range=2001:db8::1,2001:db8::ff'),
+          ('10.0.0.9', '--dhcp-range=10.0.0.9,10.0.0.9')]
+HOSTS = [('10.0.0.100', '--dhcp-host=aa:00:00:00:00:01,10.0.0.100'),
+         (None, '--dhcp-host=aa:00:00:00:00:02,host'),
+         ('10.0.0.20', '--dhcp-host=aa:00:00:00:00:03,10.0.0.20')]
+OPTIONS = ['--dhcp-option=tag:b,3,10.0.0.1', '--dhcp-option=tag:a,6,8.8.8.8']
+
+
+def config(reverse=False, **kinds):
+    def order(values):
+        return list(reversed(values)) if reverse else list(values)
+
+    kinds.setdefault('command', ['/usr/bin/dnsmasq', '--keep-in-foreground'])
+    kinds.setdefault('ranges', order(RANGES))
+    kinds.setdefault('hosts', order(HOSTS))
+    kinds.setdefault('options', order(OPTIONS))
+    return DnsmasqConfig(**kinds)
+
+
+class DnsmasqConfigTest(unittest.TestCase):
+    def test_order_independent(self):
+        self.assertEqual(config(), config(reverse=True))
+        self.assertEqual(hash(config()), hash(config(reverse=True)))
+        self.assertEqual(config().fingerprint(),
+                         config(reverse=True).fingerprint())
+        self.assertEqual(config().diff(config(reverse=True)), [])
+
+    def test_addressed_kinds_in_numeric_order(self):
+        self.assertEqual([address for address, _ in config().ranges],
+                         ['10.0.0.9', '10.0.0.10', '2001:db8::1'])
+        self.assertEqual([address for address, _ in config().hosts],
+                         [None, '10.0.0.20', '10.0.0.100'])
+
+    def test_ordered_kinds_kept(self):
+        command = ['/usr/bin/dnsmasq', '--keep-in-foreground']
+        interfaces = ['--bind-interfaces', '--except-interface=eth1']
+        c = config(interfaces=interfaces)
+        self.assertEqual(list(c.command), command)
+        self.assertEqual(c.argv()[:2], command)
+        self.assertEqual(list(c.interfaces), interfaces)
+        self.assertNotEqual(config(command=list(reversed(command))), c)
+
+    def test_argv(self):
+        c = config(log=['--log-facility=/tmp/fifo', '--log-async'],
+                   tftp=['--tftp-root=/tftpboot', '--enable-tftp'])
+        self.assertEqual(c.argv(), [
+            '/usr/bin/dnsmasq', '--keep-in-foreground',
+            '--log-facility=/tmp/fifo', '--log-async',
+            '--dhcp-range=10.0.0.9,10.0.0.9',
+            '--dhcp-range=10.0.0.10,10.0.0.20',
+            '--dhcp-range=2001:db8::1,2001:db8::ff',
+            '--dhcp-host=aa:00:00:00:00:02,host',
+            '--dhcp-host=aa:00:00:00:00:03,10.0.0.20',
+            '--dhcp-host=aa:00:00:00:00:01,10.0.0.100',
+            '--dhcp-option=tag:a,6,8.8.8.8',
+            '--dhcp-option=tag:b,3,10.0.0.1',
+            '--enable-tftp', '--tftp-root=/tftpboot'])
+        self.assertEqual(c.conf_lines()[:2],
+                         ['keep-in-foreground', 'log-facility=/tmp/fifo'])
+
+    def test_diff(self):
+        old = config()
+        new = config(options=OPTIONS[:1] + ['--dhcp-option=tag:c,1,x'])
+        changes = new.diff(old)
+        self.assertEqual(changes, [('options',
+                                    ['--dhcp-option=tag:a,6,8.8.8.8'],
+                                    ['--dhcp-option=tag:c,1,x'])])
+        self.assertEqual(dnsmasq_config.format_diff(changes), [
+            'options: ---dhcp-option=tag:a,6,8.8.8.8 '
+            '+--dhcp-option=tag:c,1,x'])
+
+    def test_diff_from_nothing(self):
+        changes = config().diff(None)
+        self.assertEqual([kind for kind, _, _ in changes],
+                         ['command', 'ranges', 'hosts', 'options'])
+        self.assertTrue(all(not removed for _, removed, _ in changes))
+
+    def test_dict_round_trip(self):
+        c = config(settings=['--dhcp-lease-max=1000'])
+        data = json.loads(json.dumps(c.to_dict()))
+        self.assertEqual(DnsmasqConfig.from_dict(data), c)
+        self.assertNotIn('tftp', data)
+
+    def test_replace(self):
+        c = config()
+        replaced = c.replace(hosts=[])
+        self.assertEqual(replaced.hosts, ())
+        self.assertEqual(replaced.ranges, c.ranges)
+        self.assertEqual(c.hosts, config().hosts)
+
+    def test_unknown_kind(self):
+        self.assertRaises(TypeError, DnsmasqConfig, nope=['--x'])
+
+    def test_env(self):
+        c = config(env=['B=2', 'A=1'])
+        self.assertEqual(c.env, ('A=1', 'B=2'))
+        self.assertNotIn('A=1', c.argv())
+        self.assertEqual(c.environ({'PATH': '/bin', 'A': '0'}),
+                         {'PATH': '/bin', 'A': '1', 'B': '2'})
+        self.assertTrue(str(c).startswith('A=1 B=2 /usr/bin/dnsmasq '))
+
+        self.assertNotEqual(c, config())
+        self.assertNotEqual(c.fingerprint(), config().fingerprint())
+        self.assertEqual(c.fingerprint(),
+                         config(env=['A=1', 'B=2']).fingerprint())
+        self.assertEqual(c.diff(config(env=['A=1'])),
+                         [('env', [], ['B=2'])])
+        self.assertEqual(DnsmasqConfig.from_dict(c.to_dict()), c)
+        self.assertEqual(c.replace(hosts=[]).env, c.env)
+
+    def test_configs_fingerprint(self):
+        shards = [config(), None]
+        self.assertEqual(dnsmasq_config.configs_fingerprint(shards),
+                         dnsmasq_config.configs_fingerprint(
+                             [config(reverse=True), None]))
+        self.assertNotEqual(dnsmasq_config.configs_fingerprint(shards),
+                            dnsmasq_config.configs_fingerprint(
+                                [None, config()]))
+        self.assertNotEqual(dnsmasq_config.configs_fingerprint(shards),
+                            dnsmasq_config.configs_fingerprint(
+                                [config(), config(hosts=[])]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import random
+import subprocess
+import sys
+import unittest
+import uuid
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+import idl_snapshot  # noqa
+
+try:
+    import dnsmasq_render
+except ImportError:
+    dnsmasq_render = None
+
+
+# Runs ops_dhcp_tftp, as a script or as its console script, where the
+# switch libraries cannot be imported
+OFF_SWITCH = '''
+import runpy, sys
+sys.path.insert(0, %r)
+sys.modules['ops_eventlog'] = sys.modules['ops_diagdump'] = None
+sys.argv = ['ops_dhcp_tftp'] + %r
+if %r:
+    import dnsmasq_render
+    sys.exit(dnsmasq_render.ops_dhcp_tftp_main())
+runpy.run_path(%r, run_name='__main__')
+'''
+
+
+def run_off_switch(argv, console_script):
+    script = OFF_SWITCH % (REPO, argv, console_script,
+                           os.path.join(REPO, 'ops_dhcp_tftp.py'))
+    process = subprocess.Popen([sys.executable, '-c', script],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = process.communicate()
+    return process.returncode, out, err
+
+
+def render(tables):
+    return dnsmasq_render.render(tables, dnsmasq_render.DNSMASQ_COMMAND, [],
+                                 dnsmasq_render.MAX_SHARDS)[0]
+
+
+def with_new_uuids(tables, seed):
+    '''
+    The same rows, under other UUIDs and in another order.
+    '''
+    rnd = random.Random(seed)
+    renamed = {}
+    for name, table in tables.iteritems():
+        rows = table.rows.values()
+        rnd.shuffle(rows)
+        for row in rows:
+            row.uuid = uuid.UUID(int=rnd.getrandbits(128))
+        renamed[name] = idl_snapshot.Table(rows)
+    return renamed
+
+
+@unittest.skipIf(dnsmasq_render is None, "needs the ovs python library")
+class RenderTest(unittest.TestCase):
+    def test_render_does_not_depend_on_uuids(self):
+        config = render(idl_snapshot.synthetic(300))
+        for seed in xrange(3):
+            other = render(with_new_uuids(idl_snapshot.synthetic(300),
+                                          seed))
+            self.assertEqual(other.argv(), config.argv())
+            self.assertEqual(other.fingerprint(), config.fingerprint())
+
+    def test_addresses_in_numeric_order(self):
+        tables = idl_snapshot.empty_tables()
+        tables['DHCPSrv_Static_Host'] = idl_snapshot.Table(
+            idl_snapshot.Row('DHCPSrv_Static_Host', ip,
+                             ip_address=ip, mac_addresses=[mac])
+            for ip, mac in (('10.0.0.10', 'aa:00:00:00:00:01'),
+                            ('2001:db8::1', 'aa:00:00:00:00:02'),
+                            ('10.0.0.9', 'aa:00:00:00:00:03'),
+                            ('', 'aa:00:00:00:00:04')))
+
+        self.assertEqual([address for address, _ in render(tables).hosts],
+                         [None, '10.0.0.9', '10.0.0.10', '2001:db8::1'])
+
+    def test_tokens(self):
+        tables = idl_snapshot.synthetic(3)
+        config = render(tables)
+        self.assertEqual(config.ranges, (
+            ('10.0.0.10', '--dhcp-range=tag:m1,set:tag0,10.0.0.10,'
+             '10.0.0.200,255.255.255.0,10.0.0.255,60m'),))
+        self.assertEqual(config.hosts[0], (
+            '10.0.0.100', '--dhcp-host=00:00:00:00:00:00,set:tag0,'
+            '10.0.0.100,host0,3600m'))
+        self.assertEqual(config.boots, ('--dhcp-boot=pxelinux.0',))
+        self.assertEqual(config.settings, ('--dhcp-lease-max=1000',))
+        self.assertEqual(config.tftp, ('--enable-tftp',
+                                       '--tftp-root=/tftpboot'))
+
+
+@unittest.skipIf(dnsmasq_render is None, "needs the ovs python library")
+class OffSwitchTest(unittest.TestCase):
+    def test_render_without_switch_libraries(self):
+        for console_script in (False, True):
+            for shards in ('1', '2'):
+                status, out, err = run_off_switch(
+                    ['render', '--synthetic', '20', '--shards', shards],
+                    console_script)
+                self.assertEqual(status, 0, err)
+                self.assertIn('/usr/bin/dnsmasq', out)
+                self.assertIn('render:', err)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,374 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+import dhcp_lease_shard  # noqa
+from dnsmasq_config import DnsmasqConfig  # noqa
+
+try:
+    import dnsmasq_supervisor as supervisor
+except ImportError:
+    supervisor = None
+
+try:
+    import ops_eventlog
+except ImportError:
+    ops_eventlog = None
+
+# Stands for dnsmasq: passes --test after the check delay given, then exits
+# with the status given or binds the UDP port given after a delay, and runs
+# until killed
+FAKE_DNSMASQ = '''
+import socket, sys, time
+args = dict(arg.split('=', 1) for arg in sys.argv[1:] if '=' in arg)
+if '--test' in sys.argv:
+    time.sleep(float(args.get('check', 0)))
+    sys.exit(int(args.get('check_exit', 0)))
+if 'exit' in args:
+    sys.exit(int(args['exit']))
+if 'port' in args:
+    time.sleep(float(args.get('delay', 0)))
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', int(args['port'])))
+time.sleep(60)
+'''
+
+
+def fake_config(ranges=(), **args):
+    return DnsmasqConfig(command=[sys.executable, '-c', FAKE_DNSMASQ],
+                         ranges=ranges,
+                         settings=['%s=%s' % item
+                                   for item in sorted(args.iteritems())])
+
+
+def free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class Poller(object):
+    def __init__(self):
+        self.timers = []
+
+    def timer_wait(self, msec):
+        self.timers.append(msec)
+
+
+class ExitedProcess(object):
+    def __init__(self, returncode=1):
+        self.pid = 0
+        self.returncode = returncode
+
+    def poll(self):
+        return self.returncode
+
+
+@unittest.skipIf(supervisor is None or ops_eventlog is None,
+                 "needs the ovs and ops_eventlog python libraries")
+class ShardTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.saved = dict((name, getattr(supervisor, name))
+                          for name in ('START_TIMEOUT', 'READY_TIMEOUT',
+                                       'DHCP_SERVER_PORTS'))
+        supervisor.START_TIMEOUT = 0.2
+        supervisor.READY_TIMEOUT = 2.0
+        supervisor.DHCP_SERVER_PORTS = (free_port(),)
+
+        self.shard = supervisor.DnsmasqShard(0)
+        self.shard.pid_file = os.path.join(self.dir, 'dnsmasq.pid')
+        self.shard.state_file = os.path.join(self.dir, 'dnsmasq.state')
+
+    def tearDown(self):
+        self.shard.stop()
+        for name, value in self.saved.iteritems():
+            setattr(supervisor, name, value)
+        shutil.rmtree(self.dir)
+
+    def settle(self, timeout=5.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            ready = self.shard.start_run()
+            if ready is not None:
+                return ready
+            time.sleep(0.02)
+        self.fail("dnsmasq neither ready nor failed")
+
+    def ranges(self):
+        return (('10.0.0.1', 'port=%d' % supervisor.DHCP_SERVER_PORTS[0]),)
+
+    def test_start_does_not_wait(self):
+        self.shard.config = fake_config()
+        start = time.time()
+        self.shard.start()
+        self.assertTrue(time.time() - start < supervisor.START_TIMEOUT)
+        self.assertEqual(self.shard.start_run(), None)
+
+        poller = Poller()
+        self.shard.wait(poller)
+        self.assertEqual(poller.timers, [supervisor.READY_POLL_MSEC])
+
+        self.assertTrue(self.settle())
+        self.assertEqual(self.shard.good_config, self.shard.config)
+        self.assertEqual(self.shard.stats['starts'], 1)
+        with open(self.shard.state_file) as f:
+            state = json.load(f)
+        self.assertEqual(state['pid'], self.shard.process.pid)
+        self.assertEqual(state['fingerprint'],
+                         self.shard.config.fingerprint())
+
+    def test_ready_on_dhcp_socket(self):
+        self.shard.config = fake_config(self.ranges(), delay='0.1')
+        self.shard.start()
+        self.assertTrue(self.settle())
+        self.assertTrue(self.shard.is_running())
+
+    def test_not_ready_is_killed(self):
+        supervisor.READY_TIMEOUT = 0.2
+        self.shard.config = fake_config((('10.0.0.1', 'wait=1'),))
+        self.shard.start()
+        self.assertFalse(self.settle())
+        self.assertEqual(self.shard.stats['failures'], 1)
+        self.assertFalse(self.shard.is_running())
+
+        # A failed start without config to roll back to is a crash
+        self.shard.check_exit()
+        self.assertEqual(self.shard.stats['crashes'], 1)
+        self.assertTrue(self.shard.respawn_at is not None)
+
+    def test_failed_config_rolls_back(self):
+        good = fake_config()
+        self.shard.apply(good)
+        self.assertTrue(self.settle())
+
+        self.shard.apply(fake_config(exit='3'))
+        self.assertFalse(self.settle())
+        self.assertEqual(self.shard.config, good)
+        self.assertEqual(self.shard.stats['failures'], 1)
+
+        self.assertTrue(self.settle())
+        self.assertTrue(self.shard.is_running())
+        self.assertEqual(self.shard.good_config, good)
+        self.assertEqual(self.shard.stats['crashes'], 0)
+
+    def test_starting_config_is_not_restarted(self):
+        config = fake_config()
+        self.shard.apply(config)
+        process = self.shard.process
+        self.shard.apply(config)
+        self.assertTrue(self.shard.process is process)
+        self.assertEqual(self.shard.stats['restarts'], 1)
+
+    def test_new_config_while_starting(self):
+        self.shard.apply(fake_config(version='1'))
+        process = self.shard.process
+        self.shard.apply(fake_config(version='2'))
+        self.assertTrue(process.poll() is not None)
+        self.assertTrue(self.settle())
+        self.assertEqual(self.shard.good_config, fake_config(version='2'))
+
+    def test_preflight_failure_keeps_running(self):
+        good = fake_config()
+        self.shard.apply(good)
+        self.assertTrue(self.settle())
+        process = self.shard.process
+
+        self.shard.apply(fake_config(check_exit='1'))
+        self.assertTrue(self.shard.process is process)
+        self.assertEqual(self.shard.config, good)
+
+    def test_needs_preflight(self):
+        config = fake_config()
+        self.assertFalse(self.shard.needs_preflight(None))
+        self.assertTrue(self.shard.needs_preflight(config))
+        self.shard.apply(config, checked=True)
+        self.assertFalse(self.shard.needs_preflight(config))
+        self.assertTrue(self.settle())
+        self.assertFalse(self.shard.needs_preflight(config))
+        self.assertTrue(self.shard.needs_preflight(fake_config(version='2')))
+
+    def test_stop_while_starting(self):
+        self.shard.apply(fake_config())
+        self.shard.stop()
+        self.assertEqual(self.shard.starting, None)
+        self.assertEqual(self.shard.start_run(), None)
+
+
+@unittest.skipIf(supervisor is None or ops_eventlog is None,
+                 "needs the ovs and ops_eventlog python libraries")
+class PreflightTest(unittest.TestCase):
+    def test_checks_run_at_once(self):
+        configs = [fake_config(check='0.5', version=str(i))
+                   for i in xrange(4)]
+        start = time.time()
+        self.assertEqual(supervisor.preflight_configs(configs),
+                         [True] * 4)
+        self.assertTrue(time.time() - start < 1.5)
+
+    def test_results_in_order(self):
+        configs = [fake_config(), fake_config(check_exit='1'),
+                   DnsmasqConfig(command=['/nonexistent/dnsmasq'])]
+        self.assertEqual(supervisor.preflight_configs(configs),
+                         [True, False, False])
+
+
+@unittest.skipIf(supervisor is None or ops_eventlog is None,
+                 "needs the ovs and ops_eventlog python libraries")
+class RespawnTest(unittest.TestCase):
+    def setUp(self):
+        self.shard = supervisor.DnsmasqShard(0)
+
+    def crash(self):
+        self.shard.process = ExitedProcess()
+        self.shard.check_exit()
+        return self.shard.respawn_at - time.time()
+
+    def test_backoff_doubles_up_to_max(self):
+        delays = [self.crash() for _ in xrange(9)]
+        expected = [min(supervisor.RESPAWN_BACKOFF_MIN * 2 ** i,
+                        supervisor.RESPAWN_BACKOFF_MAX) for i in xrange(9)]
+        for delay, backoff in zip(delays, expected):
+            self.assertAlmostEqual(delay, backoff, places=1)
+
+    def test_backoff_reset_after_stable_run(self):
+        self.crash()
+        self.crash()
+        self.shard.stats['last_start'] = \
+            time.time() - supervisor.RESPAWN_STABLE_TIME - 1
+        self.assertAlmostEqual(self.crash(), supervisor.RESPAWN_BACKOFF_MIN,
+                               places=1)
+
+    def test_crash_loop(self):
+        for _ in xrange(supervisor.CRASH_LOOP_COUNT - 1):
+            self.crash()
+        self.assertFalse(self.shard.crash_loop)
+        self.crash()
+        self.assertTrue(self.shard.crash_loop)
+        self.assertIn('Crash loop', self.shard.report())
+
+        # Crashes out of the window are forgotten
+        now = time.time()
+        self.shard.crash_times = type(self.shard.crash_times)(
+            [now - supervisor.CRASH_LOOP_WINDOW - 1] *
+            supervisor.CRASH_LOOP_COUNT)
+        self.crash()
+        self.assertFalse(self.shard.crash_loop)
+
+    def test_respawn_waits_for_backoff(self):
+        self.crash()
+        poller = Poller()
+        self.shard.wait(poller)
+        self.assertEqual(len(poller.timers), 1)
+        self.assertTrue(0 < poller.timers[0] <=
+                        supervisor.RESPAWN_BACKOFF_MIN * 1000)
+
+        self.shard.respawn_run()
+        self.assertEqual(self.shard.stats['respawns'], 0)
+
+
+@unittest.skipIf(supervisor is None, "needs the ovs python library")
+class ShardingTest(unittest.TestCase):
+    def test_interface_of_longest_prefix(self):
+        networks = [supervisor.Network('eth0', 4, 0x0a, 8),
+                    supervisor.Network('eth1', 4, 0x0a0001, 24)]
+        self.assertEqual(supervisor.interface_of('10.0.1.5', networks),
+                         'eth1')
+        self.assertEqual(supervisor.interface_of('10.2.0.1', networks),
+                         'eth0')
+        self.assertEqual(supervisor.interface_of('192.168.0.1', networks),
+                         None)
+
+    def test_shard_serves_one_interface(self):
+        networks = [supervisor.Network('eth%d' % i, 4, 0x0a0000 + i, 24)
+                    for i in xrange(8)]
+        by_shard = {}
+        for network in networks:
+            by_shard.setdefault(supervisor.interface_shard(
+                network.interface, 4), []).append(network.interface)
+        # Some shard other than 0 has several interfaces hashed to it
+        self.assertTrue(any(len(interfaces) > 1
+                            for shard, interfaces in by_shard.iteritems()
+                            if shard > 0))
+
+        config = DnsmasqConfig(
+            command=['dnsmasq'],
+            ranges=[('10.0.%d.10' % i, '--dhcp-range=r%d' % i)
+                    for i in xrange(8)],
+            hosts=[('10.0.%d.20' % i, '--dhcp-host=h%d' % i)
+                   for i in xrange(8)] + [(None, '--dhcp-host=any')])
+        interface_networks = supervisor.interface_networks
+        supervisor.interface_networks = lambda: networks
+        try:
+            configs = supervisor.shard_configs(config, 4)
+        finally:
+            supervisor.interface_networks = interface_networks
+
+        served = []
+        for shard, shard_config in enumerate(configs):
+            if shard == 0 or shard_config is None:
+                continue
+            interfaces = [arg for arg in shard_config.interfaces
+                          if arg.startswith('--interface=')]
+            self.assertEqual(len(interfaces), 1)
+            served.append(interfaces[0].split('=', 1)[1])
+            self.assertEqual(min(by_shard[shard]), served[-1])
+        self.assertEqual(sorted(arg.split('=', 1)[1]
+                                for arg in configs[0].interfaces
+                                if arg.startswith('--except-interface=')),
+                         sorted(served))
+
+        # Every range and host is served once, by the shard of its
+        # interface, and the lease script of a shard owns its leases
+        ranges = [address for c in configs if c is not None
+                  for address, _ in c.ranges]
+        self.assertEqual(sorted(ranges), sorted(a for a, _ in config.ranges))
+        for shard, shard_config in enumerate(configs):
+            if shard_config is None:
+                continue
+            owner = dhcp_lease_shard.LeaseOwner(
+                shard_config.environ({}))
+            self.assertEqual(owner.shard, shard)
+            for address, _ in shard_config.hosts:
+                if address is not None:
+                    self.assertTrue(owner.owns(address))
+            self.assertIn((None, '--dhcp-host=any'), shard_config.hosts)
+            for address, _ in shard_config.ranges:
+                self.assertTrue(owner.owns(address))
+
+    def test_interface_shard_is_stable(self):
+        shards = [supervisor.interface_shard('eth%d' % i, 4)
+                  for i in xrange(32)]
+        self.assertEqual(shards, [supervisor.interface_shard('eth%d' % i, 4)
+                                  for i in xrange(32)])
+        self.assertTrue(all(0 <= shard < 4 for shard in shards))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import sys
+import unittest
+from StringIO import StringIO
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+import idl_snapshot  # noqa
+
+HOST_UUID = '0c8b7d6e-1111-4a2b-9c3d-000000000001'
+
+# As printed by "ovsdb-client dump -f json", one value per table
+DUMP = '''
+{"caption":"DHCPSrv_Static_Host table",
+ "data":[[["uuid","%s"],"10.0.0.5",["set",["aa:00:00:00:00:01",
+          "aa:00:00:00:00:02"]],"host5",["set",[]],["map",[["k","v"]]]]],
+ "headings":["_uuid","ip_address","mac_addresses","client_hostname",
+             "set_tags","external_ids"]}
+{"caption":"Interface table",
+ "data":[[["uuid","0c8b7d6e-1111-4a2b-9c3d-000000000002"],"eth0"]],
+ "headings":["_uuid","name"]}
+{"caption":"DHCP_Server table",
+ "data":[[["uuid","0c8b7d6e-1111-4a2b-9c3d-000000000003"],
+          ["map",[["no_matching_tag","pxelinux.0"]]],["map",[]]]],
+ "headings":["_uuid","bootp","other_config"]}
+''' % HOST_UUID
+
+
+def load(text):
+    return idl_snapshot.load(StringIO(text))
+
+
+class LoadTest(unittest.TestCase):
+    def test_ovsdb_client_dump(self):
+        tables = load(DUMP)
+        self.assertEqual(sorted(tables), sorted(idl_snapshot.COLUMNS))
+
+        row = tables['DHCPSrv_Static_Host'].rows[HOST_UUID]
+        self.assertEqual(row.uuid, HOST_UUID)
+        self.assertEqual(row.ip_address, '10.0.0.5')
+        self.assertEqual(row.mac_addresses, ['aa:00:00:00:00:01',
+                                             'aa:00:00:00:00:02'])
+        self.assertEqual(row.client_hostname, ['host5'])
+        self.assertEqual(row.set_tags, [])
+        self.assertEqual(row.client_id, [])
+        # Columns the renderer does not read are kept
+        self.assertEqual(row.external_ids, {'k': 'v'})
+        self.assertTrue(isinstance(row.ip_address, str))
+
+        server, = tables['DHCP_Server'].rows.values()
+        self.assertEqual(server.bootp, {'no_matching_tag': 'pxelinux.0'})
+        self.assertEqual(server.other_config, {})
+
+    def test_dump_as_one_list(self):
+        tables = load(json.dumps(idl_snapshot.json_values(DUMP)))
+        self.assertEqual(tables['DHCPSrv_Static_Host'].rows.keys(),
+                         [HOST_UUID])
+        self.assertEqual(len(tables['DHCP_Server'].rows), 1)
+
+    def test_table_of_row_list(self):
+        tables = load(json.dumps({
+            'DHCPSrv_Range': [
+                {'start_ip_address': '10.0.0.1',
+                 'end_ip_address': '10.0.0.9', 'is_static': False,
+                 'match_tags': ['set', ['a', 'b']], 'prefix_len': []},
+                {'_uuid': ['uuid', 'r2'], 'start_ip_address': '10.0.1.1'}],
+            'Port': [{'name': 'eth0'}]}))
+
+        self.assertNotIn('Port', tables)
+        rows = tables['DHCPSrv_Range'].rows
+        self.assertEqual(sorted(rows), ['0', 'r2'])
+        self.assertEqual(rows['0'].end_ip_address, ['10.0.0.9'])
+        self.assertEqual(rows['0'].is_static, [False])
+        self.assertEqual(rows['0'].match_tags, ['a', 'b'])
+        self.assertEqual(rows['0'].prefix_len, [])
+        self.assertEqual(rows['r2'].end_ip_address, [])
+
+    def test_table_of_uuid_to_row(self):
+        tables = load(json.dumps({
+            'DHCPSrv_Match': {'m1': {'set_tag': ['set', ['pxe']],
+                                     'option_number': 60}},
+            'System': {'s': {'cur_cfg': 7,
+                             'other_config': ['map', [['a', '1']]]}}}))
+
+        match = tables['DHCPSrv_Match'].rows['m1']
+        self.assertEqual(match.uuid, 'm1')
+        self.assertEqual(match.set_tag, 'pxe')
+        self.assertEqual(match.option_number, [60])
+        system = tables['System'].rows['s']
+        self.assertEqual(system.cur_cfg, 7)
+        self.assertEqual(system.other_config, {'a': '1'})
+
+    def test_empty(self):
+        tables = load('')
+        self.assertTrue(all(not table.rows for table in tables.values()))
+
+
+class SyntheticTest(unittest.TestCase):
+    def test_counts(self):
+        tables = idl_snapshot.synthetic(120)
+        self.assertEqual(len(tables['DHCPSrv_Static_Host'].rows), 120)
+        self.assertEqual(len(tables['DHCPSrv_Range'].rows), 40)
+        self.assertEqual(len(tables['DHCPSrv_Option'].rows), 30)
+        self.assertEqual(len(tables['DHCPSrv_Match'].rows), 10)
+        self.assertEqual(len(tables['DHCPSrv_Range'].rows),
+                         len(idl_snapshot.synthetic(120, ranges=40)
+                             ['DHCPSrv_Range'].rows))
+
+    def test_hosts_are_distinct(self):
+        hosts = idl_snapshot.synthetic(600)['DHCPSrv_Static_Host'].rows
+        self.assertEqual(len(set(row.ip_address for row in hosts.values())),
+                         600)
+        self.assertEqual(len(set(row.mac_addresses[0]
+                                 for row in hosts.values())), 600)
+
+
+class Poller(object):
+    def __init__(self):
+        self.woken = False
+
+    def immediate_wake(self):
+        self.woken = True
+
+
+class IdlTest(unittest.TestCase):
+    def test_changes_applied_on_run(self):
+        idl = idl_snapshot.Idl()
+        idl.insert('DHCPSrv_Static_Host', 'h1', ip_address='10.0.0.1',
+                   mac_addresses=['aa:00:00:00:00:01'])
+        self.assertEqual(idl.tables['DHCPSrv_Static_Host'].rows, {})
+        poller = Poller()
+        idl.wait(poller)
+        self.assertTrue(poller.woken)
+
+        idl.run()
+        self.assertEqual(idl.change_seqno, 2)
+        row = idl.tables['DHCPSrv_Static_Host'].rows['h1']
+        self.assertEqual(row.client_hostname, [])
+
+        idl.update('DHCPSrv_Static_Host', 'h1', client_hostname=['h'])
+        idl.run()
+        self.assertEqual(row.client_hostname, ['h'])
+
+        idl.delete('DHCPSrv_Static_Host', 'h1')
+        idl.run()
+        self.assertEqual(idl.tables['DHCPSrv_Static_Host'].rows, {})
+        self.assertEqual(idl.change_seqno, 4)
+
+    def test_run_without_changes(self):
+        idl = idl_snapshot.Idl(idl_snapshot.synthetic(3))
+        idl.run()
+        self.assertEqual(idl.change_seqno, 1)
+        poller = Poller()
+        idl.wait(poller)
+        self.assertFalse(poller.woken)
+
+
+if __name__ == '__main__':
+    unittest.main()
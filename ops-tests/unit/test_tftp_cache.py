@@ -0,0 +1,181 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+try:
+    import tftp_cache
+except ImportError:
+    tftp_cache = None
+
+
+class Poller(object):
+    def __init__(self):
+        self.fds = []
+        self.woken = False
+
+    def fd_wait(self, fd, unused_events):
+        self.fds.append(fd)
+
+    def immediate_wake(self):
+        self.woken = True
+
+
+@unittest.skipIf(tftp_cache is None, "needs the ovs python library")
+class TftpCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = tftp_cache.TftpCache()
+        self.read_chunk = tftp_cache.READ_CHUNK
+
+    def tearDown(self):
+        tftp_cache.READ_CHUNK = self.read_chunk
+        self.cache.close()
+        shutil.rmtree(self.root)
+
+    def write(self, rel, data):
+        path = os.path.join(self.root, rel)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def hash_all(self):
+        while self.cache.pending or self.cache.hashing is not None:
+            self.cache.hash_pending()
+
+    def test_configure_defers_hashing(self):
+        self.write("pxelinux.0", "boot")
+        self.write("images/kernel", "k" * 100)
+        self.cache.configure(self.root, 1 << 20, [])
+
+        self.assertEqual(sorted(self.cache.index), ["images/kernel",
+                                                    "pxelinux.0"])
+        self.assertEqual(self.cache.index["pxelinux.0"].sha1, None)
+        poller = Poller()
+        self.cache.wait(poller)
+        self.assertTrue(poller.woken)
+
+        self.hash_all()
+        self.assertEqual(self.cache.index["pxelinux.0"].sha1,
+                         hashlib.sha1("boot").hexdigest())
+        poller = Poller()
+        self.cache.wait(poller)
+        self.assertFalse(poller.woken)
+
+    def test_hashing_is_bounded(self):
+        tftp_cache.READ_CHUNK = 10
+        self.write("image", "x" * 100)
+        self.cache.configure(self.root, 1 << 20, [])
+
+        passes = 0
+        while self.cache.index["image"].sha1 is None:
+            self.cache.hash_pending(budget=30)
+            passes += 1
+        self.assertTrue(passes >= 3)
+        self.assertEqual(self.cache.index["image"].sha1,
+                         hashlib.sha1("x" * 100).hexdigest())
+
+    def test_changed_while_hashing_is_hashed_again(self):
+        tftp_cache.READ_CHUNK = 10
+        path = self.write("image", "x" * 100)
+        self.cache.configure(self.root, 1 << 20, [])
+        self.cache.hash_pending(budget=10)
+
+        self.write("image", "y" * 50)
+        os.utime(path, (1, 1))
+        self.cache.update([path])
+        self.hash_all()
+        self.assertEqual(self.cache.index["image"].sha1,
+                         hashlib.sha1("y" * 50).hexdigest())
+
+    def test_rename_keeps_hash(self):
+        old = self.write("old", "data")
+        self.cache.configure(self.root, 1 << 20, [])
+        self.hash_all()
+
+        new = os.path.join(self.root, "new")
+        os.rename(old, new)
+        changed = self.cache.update([old, new])
+        self.assertEqual(changed, set())
+        self.assertEqual(self.cache.index.keys(), ["new"])
+        self.assertEqual(self.cache.index["new"].sha1,
+                         hashlib.sha1("data").hexdigest())
+
+    def test_update_removed_directory(self):
+        self.write("a/one", "1")
+        self.write("a/b/two", "2")
+        self.write("three", "3")
+        self.cache.configure(self.root, 1 << 20, [])
+
+        directory = os.path.join(self.root, "a")
+        shutil.rmtree(directory)
+        self.cache.update([directory])
+        self.assertEqual(self.cache.index.keys(), ["three"])
+        self.assertFalse(any(path.startswith(directory)
+                             for path in self.cache.watches))
+
+    def test_prewarm_budget(self):
+        self.write("big", "b" * 300)
+        self.write("small", "s" * 100)
+        self.write("boot.img", "i" * 250)
+        self.cache.configure(self.root, 400,
+                             [os.path.join(self.root, "boot.img")])
+
+        self.assertEqual(self.cache.warm, set(["boot.img", "small"]))
+        self.assertEqual(self.cache.warm_bytes, 350)
+
+    def test_inotify_events(self):
+        self.write("one", "1")
+        self.cache.configure(self.root, 1 << 20, [])
+        if self.cache.inotify_fd is None:
+            self.skipTest("inotify unavailable")
+        poller = Poller()
+        self.cache.wait(poller)
+        self.assertEqual(poller.fds, [self.cache.inotify_fd])
+
+        self.write("sub/two", "2")
+        os.remove(os.path.join(self.root, "one"))
+        self.cache.run()
+        # Files created before the watch of a new directory are found by
+        # the scan of the directory
+        self.assertEqual(self.cache.index.keys(), ["sub/two"])
+        self.assertEqual(self.cache.index["sub/two"].sha1,
+                         hashlib.sha1("2").hexdigest())
+
+        self.write("sub/three", "3")
+        self.cache.run()
+        self.assertEqual(sorted(self.cache.index), ["sub/three", "sub/two"])
+
+    def test_report(self):
+        self.write("one", "1")
+        self.cache.configure(self.root, 1 << 20, [])
+        self.assertIn("pending", self.cache.report())
+        self.hash_all()
+        self.assertIn(hashlib.sha1("1").hexdigest(), self.cache.report())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import socket
+import sys
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO, "opsplugins"))
+
+import ipaddress  # noqa
+import typedaddress  # noqa
+
+
+class ParseTest(unittest.TestCase):
+    def test_ipv4(self):
+        address = typedaddress.parse("10.0.0.1")
+        self.assertEqual(address, (typedaddress.IPV4, 0x0a000001, 32))
+        self.assertTrue(address.is_ipv4)
+        self.assertFalse(address.is_ipv6)
+
+    def test_ipv6(self):
+        address = typedaddress.parse("2001:db8::1")
+        self.assertEqual(address.family, typedaddress.IPV6)
+        self.assertEqual(address.value, (0x20010db8 << 96) | 1)
+        self.assertEqual(address.prefix, 128)
+
+    def test_invalid(self):
+        for text in ("", "10.0.0", "10.0.0.256", "host", "1::2::3", None,
+                     42):
+            self.assertEqual(typedaddress.parse(text), None)
+            # Invalid strings are cached as such
+            self.assertEqual(typedaddress.parse(text), None)
+
+    def test_netmask(self):
+        self.assertEqual(typedaddress.parse_netmask("255.255.255.0").prefix,
+                         24)
+        self.assertEqual(typedaddress.parse_netmask("255.255.255.255")
+                         .prefix, 32)
+        self.assertEqual(typedaddress.parse_netmask("0.0.0.0").prefix, 0)
+        self.assertEqual(typedaddress.parse_netmask("128.0.0.0").prefix, 1)
+
+    def test_invalid_netmask(self):
+        for text in ("255.0.255.0", "0.255.255.255", "ffff::", "mask",
+                     None):
+            self.assertEqual(typedaddress.parse_netmask(text), None)
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_bounded(self):
+        cache = typedaddress.LRUCache(size=4)
+        for i in xrange(10):
+            cache.put(i, i)
+        self.assertTrue(len(cache) <= 4)
+        self.assertEqual(cache.get(9), 9)
+        self.assertEqual(cache.get(0), None)
+
+    def test_hits_are_kept(self):
+        cache = typedaddress.LRUCache(size=4)
+        cache.put("a", 1)
+        for i in xrange(5):
+            cache.put(i, i)
+            self.assertEqual(cache.get("a"), 1)
+
+
+class IpAddressTest(unittest.TestCase):
+    def test_ip2int(self):
+        self.assertEqual(ipaddress.ip2int("192.168.1.1"), 0xc0a80101)
+
+    def test_ipv6_to_int(self):
+        self.assertEqual(ipaddress.ipv6_to_int("::1"), 1)
+
+    def test_wrong_family_raises(self):
+        self.assertRaises(socket.error, ipaddress.ip2int, "::1")
+        self.assertRaises(socket.error, ipaddress.ipv6_to_int, "10.0.0.1")
+
+    def test_invalid_raises(self):
+        for text in ("10.0.0.256", "host", ""):
+            self.assertRaises(socket.error, ipaddress.ip2int, text)
+            self.assertRaises(socket.error, ipaddress.ipv6_to_int, text)
+
+    def test_ip_type(self):
+        self.assertEqual(ipaddress.ip_type("10.0.0.1"), 0)
+        self.assertEqual(ipaddress.ip_type("2001:db8::1"), 1)
+        self.assertEqual(ipaddress.ip_type("host"), -1)
+        self.assertEqual(ipaddress.ip_type(None), -2)
+
+    def test_is_valid_ip_address(self):
+        self.assertTrue(ipaddress.is_valid_ip_address("10.0.0.1"))
+        self.assertTrue(ipaddress.is_valid_ip_address("2001:db8::1"))
+        for text in ("255.255.255.255", "127.0.0.1", "224.0.0.1", "0.0.0.0",
+                     "host"):
+            self.assertFalse(ipaddress.is_valid_ip_address(text))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -26,11 +26,19 @@ NOTES:
 '''
 
 import argparse
+import fcntl
 import os
 import sys
 import subprocess
 from time import sleep
 import signal
+import tempfile
+
+# "ops_dhcp_tftp render" runs offline, before the imports of the daemon
+# that need the switch libraries
+if __name__ == '__main__' and sys.argv[1:2] == ['render']:
+    import dnsmasq_render
+    sys.exit(dnsmasq_render.main(sys.argv[2:]))
 
 import ovs.dirs
 from ovs.db import error
@@ -42,6 +50,12 @@ import ovs.unixctl.server
 from ops_eventlog import event_log_init
 from ops_eventlog import log_event
 import ops_diagdump
+import tftp_cache
+import dnsmasq_log
+import dnsmasq_config
+import dnsmasq_render
+import dnsmasq_supervisor
+import dhcp_tftp_profile
 
 # OVS definitions
 idl = None
@@ -100,19 +114,43 @@ vlog = ovs.vlog.Vlog("dhcp_tftp")
 exiting = False
 seqno = 0
 
-dnsmasq_process = None
 dnsmasq_started = False
-dnsmasq_command = None
 dhcp_range_config = False
 
-# OPS_TODO: Remove the log facility option before final release
-dnsmasq_default_command = ('/usr/bin/dnsmasq --port=0 --user=root '
-                           '--dhcp-script=/usr/bin/dhcp_leases --leasefile-ro '
-                           '--log-facility=/tmp/dnsmasq.log ')
-dnsmasq_dhcp_range_option = '--dhcp-range='
-dnsmasq_dhcp_host_option = '--dhcp-host='
-dnsmasq_dhcp_option_arg = '--dhcp-option='
-dnsmasq_dhcp_boot_option = '--dhcp-boot='
+dnsmasq_default_command = dnsmasq_render.DNSMASQ_COMMAND
+
+# Index and page cache prewarming of the TFTP root
+tftp_root_cache = None
+
+# dnsmasq log stream, read from a FIFO into a bounded ring
+dnsmasq_log_stream = None
+
+# SHA-1 of the last rendered dnsmasq commands
+dnsmasq_fingerprint = None
+
+# dnsmasq shards, each a dnsmasq serving a subset of the interfaces, and
+# their rendered configs
+dnsmasq_shards = []
+dnsmasq_configs = []
+
+# Ends of the pipe the SIGCHLD handler wakes the main loop through
+sigchld_fd = None
+sigchld_write_fd = None
+
+# Interval at which the exit of the children is checked while the sample
+# profiler has turned the signal wakeup fd off
+SIGCHLD_POLL_MSEC = 1000
+
+# Profiler of the daemon, created on the first profile command
+daemon_profiler = None
+
+# dhcp_leases clear run before the first dnsmasq start without DHCP
+# ranges, and the file of its stderr, checked from the main loop
+DHCP_LEASES_CLEAR_COMMAND = ["/usr/bin/dhcp_leases", "clear"]
+dhcp_leases_clear = None
+
+# Bound of the dnsmasq log in a diagnostic dump
+DIAG_LOG_BYTES = 256 * 1024
 
 
 def unixctl_exit(conn, unused_argv, unused_aux):
@@ -151,6 +189,54 @@ def system_is_configured():
     return True
 
 
+def unixctl_tftp_cache(conn, unused_argv, unused_aux):
+    if tftp_root_cache is None:
+        conn.reply("TFTP cache disabled\n")
+    else:
+        conn.reply(tftp_root_cache.report())
+
+
+def unixctl_dnsmasq_stats(conn, unused_argv, unused_aux):
+    conn.reply(dnsmasq_stats_report())
+
+
+def unixctl_profile(conn, argv, unused_aux):
+    global daemon_profiler
+
+    if daemon_profiler is None:
+        daemon_profiler = dhcp_tftp_profile.Profiler()
+
+    try:
+        if argv[0] == 'start':
+            daemon_profiler.start(*argv[1:])
+        elif argv[0] == 'stop' and len(argv) == 1:
+            daemon_profiler.stop()
+        elif argv[0] == 'dump' and len(argv) == 2:
+            daemon_profiler.dump(argv[1])
+        elif argv[0] != 'show' or len(argv) != 1:
+            conn.reply_error("usage: dhcp-tftp/profile start [cprofile|"
+                             "sample] | stop | dump FILE | show\n")
+            return
+    except (ValueError, IOError) as e:
+        conn.reply_error("%s\n" % (e))
+        return
+
+    conn.reply(daemon_profiler.report())
+
+
+# ------------------ dnsmasq_stats_report() ----------------
+def dnsmasq_stats_report():
+    '''
+    Text report of the dnsmasq start, restart and respawn counters of
+    every shard.
+    '''
+    if len(dnsmasq_shards) == 1:
+        return dnsmasq_shards[0].report()
+
+    return ''.join('Shard %d:\n%s' % (shard.index, shard.report())
+                   for shard in dnsmasq_shards)
+
+
 # ------------------ terminate() ----------------
 def terminate():
     global exiting
@@ -164,26 +250,43 @@ def ops_dhcp_tftp_diagnostics_handler(argv):
     # argv[0] is basic
     # argv[1] is feature name
     feature = argv.pop()
-    buff = 'Diagnostic dump response for feature ' + feature + '.\n'
-
-    # Capture the contents of dnsmasq log file
-    with open("/tmp/dnsmasq.log", "r") as log:
-        fbuff = ['Dnsmasq log file\n']
-        fbuff += ['========================================================\n']
-        fbuff += log.readlines()
+    separator = '========================================================\n'
+    buff = ['Diagnostic dump response for feature ' + feature + '.\n']
 
-    for x in fbuff:
-        buff += x
+    # Capture the tail of the dnsmasq log
+    buff.append('Dnsmasq log file\n')
+    buff.append(separator)
+    if dnsmasq_log_stream is not None:
+        dnsmasq_log_stream.run()
+        buff.append(dnsmasq_log_stream.tail(DIAG_LOG_BYTES))
 
     # Capture the parameters to dnsmasq
-    dnsmasq_param = subprocess.check_output("ps -ef| grep dnsmasq", shell=True,
-                                            env={'LANG': 'C'})
-
-    buff = buff + 'Dnsmasq parameters\n'
-    buff = buff + '========================================================\n'
-    buff = buff + dnsmasq_param + '\n'
-
-    return buff
+    buff.append('Dnsmasq parameters\n')
+    buff.append(separator)
+    for shard in dnsmasq_shards:
+        pid = shard.pid()
+        if pid is None:
+            buff.append('shard %d: dnsmasq is not running\n' % (shard.index))
+        else:
+            buff.append('shard %d: pid %d\n' % (shard.index, pid))
+        if shard.good_config is not None:
+            buff.append('shard %d: running: %s\n'
+                        % (shard.index, shard.good_config))
+            buff.append('shard %d: fingerprint: %s\n'
+                        % (shard.index, shard.good_config.fingerprint()))
+        if shard.config is not None and shard.config != shard.good_config:
+            for line in dnsmasq_config.format_diff(
+                    shard.config.diff(shard.good_config)):
+                buff.append('shard %d: not applied: %s\n'
+                            % (shard.index, line))
+    buff.append('Render fingerprint: %s\n' % (dnsmasq_fingerprint))
+
+    buff.append('Dnsmasq restart statistics\n')
+    buff.append(separator)
+    buff.append(dnsmasq_stats_report())
+    buff.append('\n')
+
+    return ''.join(buff)
 
 
 # ------------------ dhcp_tftp_init() ----------------
@@ -214,257 +317,219 @@ def dhcp_tftp_init(remote):
 def dhcp_tftp_get_config():
 
     global idl
-    global dnsmasq_command
     global dnsmasq_default_command
     global dhcp_range_config
     global dnsmasq_started
+    global dnsmasq_fingerprint
+    global dnsmasq_configs
 
-    vrf_row = None
-    dhcp_server_rec = None
-    dhcpsrv_range_table = None
-    ovs_rec = None
-    dhcp_leases_command = None
+    log = []
+    if dnsmasq_log_stream is not None:
+        log = dnsmasq_log_stream.facility()
 
-    range_options = None
-    static_host_options = None
+    # Get the dhcp-tftp config, the dhcp server ranges and static hosts
+    # are split across the dnsmasq shards, the other options are given to
+    # every shard
+    config, dhcp_shards = dnsmasq_render.render(
+        idl.tables, dnsmasq_default_command, log,
+        dnsmasq_render.MAX_SHARDS)
 
-    tags = []
-    dhcp_range = []
-    dhcp_host = []
-    dhcp_option = []
-    dhcp_boot = []
+    if config.ranges:
+        dhcp_range_config = True
 
-    dnsmasq_command = dnsmasq_default_command
-    vlog.dbg("dhcp_tftp_debug - dnsmasq_command(1) %s "
-             % (dnsmasq_command))
+    if dhcp_range_config == False and dnsmasq_started == False:
+        dhcp_leases_clear_start()
 
-    # Get the dhcp server ranges config first
-    for ovs_rec in idl.tables[DHCP_SERVER_RANGE_TABLE].rows.itervalues():
-        dhcp_range_config = True
-        range_options = ""
-        if ovs_rec.match_tags and ovs_rec.match_tags is not None:
-            tags = ovs_rec.match_tags
-            for each_tag in tags:
-                range_options = range_options + 'tag:' + each_tag + ','
+    dnsmasq_configs = dnsmasq_supervisor.shard_configs(config, dhcp_shards)
+    for shard, shard_config in enumerate(dnsmasq_configs):
+        vlog.info("dhcp_tftp_debug - dnsmasq_command(2) shard %d %s "
+                  % (shard, shard_config))
+    dnsmasq_fingerprint = dnsmasq_config.configs_fingerprint(dnsmasq_configs)
 
-        if ovs_rec.set_tag and ovs_rec.set_tag is not None:
-            tags = ovs_rec.set_tag
-            for each_tag in tags:
-                range_options = range_options + 'set:' + each_tag + ','
 
-        if ovs_rec.start_ip_address and ovs_rec.start_ip_address is not None:
-            range_options = range_options + ovs_rec.start_ip_address
+# ------------------ dhcp_leases_clear_start() ---------
+def dhcp_leases_clear_start():
+    '''
+    Clears the DHCP lease DB when dnsmasq first starts without DHCP
+    ranges. The daemon does not wait for it, dhcp_leases_clear_run()
+    checks its exit from the main loop.
+    '''
+    global dhcp_leases_clear
 
-        if ovs_rec.end_ip_address and ovs_rec.end_ip_address is not None:
-            range_options = range_options + ',' + ovs_rec.end_ip_address[0]
+    if dhcp_leases_clear is not None:
+        return
 
-        if ovs_rec.is_static and ovs_rec.is_static is not None:
-            if ovs_rec.is_static[0] == True:
-                range_options = range_options + ',' + 'static'
+    err_file = tempfile.TemporaryFile()
+    try:
+        with open(os.devnull, 'w') as devnull:
+            process = subprocess.Popen(
+                DHCP_LEASES_CLEAR_COMMAND, stdout=devnull, stderr=err_file,
+                close_fds=True, env=dnsmasq_supervisor.CHILD_ENV)
+    except OSError as e:
+        err_file.close()
+        vlog.err("dhcp_tftp_debug - cannot run %s: %s"
+                 % (" ".join(DHCP_LEASES_CLEAR_COMMAND), e))
+        return
 
-        if ovs_rec.netmask and ovs_rec.netmask is not None:
-            range_options = range_options + ',' + ovs_rec.netmask[0]
+    dhcp_leases_clear = (process, err_file)
 
-        if ovs_rec.broadcast and ovs_rec.broadcast is not None:
-            range_options = range_options + ',' + ovs_rec.broadcast[0]
 
-        if ovs_rec.prefix_len and ovs_rec.prefix_len is not None:
-            if ovs_rec.prefix_len[0] != 64:
-                range_options = range_options + ',' + \
-                                str(ovs_rec.prefix_len[0])
+# ------------------ dhcp_leases_clear_run() ---------
+def dhcp_leases_clear_run():
+    '''
+    Logs the failure of the dhcp_leases clear started by
+    dhcp_leases_clear_start() once it exited.
+    '''
+    global dhcp_leases_clear
 
-        if ovs_rec.lease_duration and ovs_rec.lease_duration is not None:
-            if ovs_rec.lease_duration[0] == 0:
-                range_options = range_options + ',' + 'infinite'
-            else:
-                range_options = range_options + ',' + \
-                                str(ovs_rec.lease_duration[0]) + 'm'
+    if dhcp_leases_clear is None:
+        return
 
-        vlog.dbg("dhcp_tftp_debug - dhcp_range %s "
-                 % (range_options))
-        dnsmasq_command = dnsmasq_command + ' --dhcp-range=' + range_options
-        vlog.dbg("dhcp_tftp_debug - dnsmasq cmd %s "
-                 % (dnsmasq_command))
-        # print dnsmasq_command
+    process, err_file = dhcp_leases_clear
+    if err_file is None or process.poll() is None:
+        return
 
-    if dhcp_range_config == False and dnsmasq_started == False:
-        dhcp_leases_command = "/usr/bin/dhcp_leases clear"
-        dnsmasq_process = subprocess.Popen(dhcp_leases_command,
-                                           stdout=subprocess.PIPE,
-                                           stderr=subprocess.PIPE, shell=True)
-
-        sleep(5)
-        dnsmasq_process.poll()
-        err = dnsmasq_process.stderr.read()
-        print err
-        if err != "":
-           vlog.emer("%s" % (err))
-           vlog.emer("Error with config, dnsmasq failed, command %s" %
-                  (dhcp_leases_command))
-
-    # Get the dhcp server static hosts config
-    for ovs_rec in idl.tables[DHCP_SERVER_STATIC_HOST_TABLE].rows.itervalues():
-        static_host_options = ""
-        if ovs_rec.mac_addresses and ovs_rec.mac_addresses is not None:
-            macs = ovs_rec.mac_addresses
-            for each_mac in macs:
-                static_host_options = static_host_options + each_mac + ','
-
-        if ovs_rec.client_id and ovs_rec.client_id is not None:
-            static_host_options = static_host_options + 'id:' + \
-                                  ovs_rec.client_id[0] + ','
-
-        if ovs_rec.set_tags and ovs_rec.set_tags is not None:
-            tags = ovs_rec.set_tags
-            for each_tag in tags:
-                static_host_options = static_host_options + 'set:' + \
-                                      each_tag + ','
-
-        if ovs_rec.ip_address and ovs_rec.ip_address is not None:
-            static_host_options = static_host_options + ovs_rec.ip_address
-
-        if ovs_rec.client_hostname and ovs_rec.client_hostname is not None:
-            static_host_options = static_host_options + ',' + \
-                                  ovs_rec.client_hostname[0]
-
-        if ovs_rec.lease_duration and ovs_rec.lease_duration is not None:
-            if ovs_rec.lease_duration[0] == 0:
-                static_host_options = static_host_options + ',' + 'infinite'
-            else:
-                static_host_options = static_host_options + ',' + \
-                                      str(ovs_rec.lease_duration[0]) + 'm'
-
-        vlog.dbg("dhcp_tftp_debug - dhcp_host %s "
-                 % (static_host_options))
-        dnsmasq_command = dnsmasq_command + ' --dhcp-host=' + \
-            static_host_options
-        vlog.dbg("dhcp_tftp_debug - dnsmasq cmd %s "
-                 % (dnsmasq_command))
-        # print dnsmasq_command
-
-    # Get the dhcp server options config
-    for ovs_rec in idl.tables[DHCP_SERVER_OPTION_TABLE].rows.itervalues():
-        dhcp_options = ""
-        if ovs_rec.match_tags and ovs_rec.match_tags is not None:
-            tags = ovs_rec.match_tags
-            for each_tag in tags:
-                dhcp_options = dhcp_options + 'set:' + each_tag + ','
-
-        if ovs_rec.option_name and ovs_rec.option_name is not None:
-            if ovs_rec.ipv6 and ovs_rec.ipv6 is not None:
-                if ovs_rec.ipv6[0] == True:
-                    dhcp_options = dhcp_options + 'option6:'
-                else:
-                    dhcp_options = dhcp_options + 'option:'
-            else:
-                dhcp_options = dhcp_options + 'option:'
+    err_file.seek(0)
+    err = err_file.read().strip()
+    err_file.close()
+    # The process stays recorded, the lease DB is cleared once
+    dhcp_leases_clear = (process, None)
 
-            dhcp_options = dhcp_options + ovs_rec.option_name[0]
-        else:
-            dhcp_options = dhcp_options + str(ovs_rec.option_number[0])
-
-        if ovs_rec.option_value and ovs_rec.option_value is not None:
-            dhcp_options = dhcp_options + ',' + ovs_rec.option_value[0]
-
-        vlog.dbg("dhcp_tftp_debug - dhcp_option %s "
-                 % (dhcp_options))
-        dnsmasq_command = dnsmasq_command + ' --dhcp-option=' + dhcp_options
-        vlog.dbg("dhcp_tftp_debug - dnsmasq cmd %s "
-                 % (dnsmasq_command))
-        # print dnsmasq_command
-
-    # Get the dhcp server matches config
-    for ovs_rec in idl.tables[DHCP_SERVER_MATCH_TABLE].rows.itervalues():
-        match_options = ""
-        if ovs_rec.set_tag and ovs_rec.set_tag is not None:
-            match_options = match_options + 'set:' + ovs_rec.set_tag + ','
-
-        if ovs_rec.option_name and ovs_rec.option_name is not None:
-            match_options = match_options + 'option:' + ovs_rec.option_name[0]
-        else:
-            match_options = match_options + str(ovs_rec.option_number[0])
+    if process.returncode != 0 or err:
+        vlog.err("dhcp_tftp_debug - lease DB clear failed, command %s, "
+                 "exit status %d: %s"
+                 % (" ".join(DHCP_LEASES_CLEAR_COMMAND), process.returncode,
+                    err))
 
-        if ovs_rec.option_value and ovs_rec.option_value is not None:
-            match_options = match_options + ',' + ovs_rec.option_value[0]
 
-        vlog.dbg("dhcp_tftp_debug - dhcp match %s "
-                 % (match_options))
-        dnsmasq_command = dnsmasq_command + ' --dhcp-match=' + match_options
-        vlog.dbg("dhcp_tftp_debug - dnsmasq cmd %s "
-                 % (dnsmasq_command))
-        # print dnsmasq_command
+# ------------------ tftp_cache_configure() ---------
+def tftp_cache_configure():
+    '''
+    Points the TFTP root cache at the configured TFTP root, with the boot
+    images of the DHCP bootp config as the files to prewarm first.
+    '''
+    global idl
+    global tftp_root_cache
 
-    # Get the dhcp server bootp config
-    for ovs_rec in idl.tables[DHCP_SERVER_TABLE].rows.itervalues():
-        if ovs_rec.bootp and ovs_rec.bootp is not None:
-            bootp_options = ""
-            bootp = {}
-            bootp = ovs_rec.bootp
-            for key, value in bootp.iteritems():
-                bootp_options = ""
-                if key == 'no_matching_tag':
-                    bootp_options = value
-                else:
-                    bootp_options = 'tag:' + key + ',' + value
-
-                vlog.dbg("dhcp_tftp_debug - dhcp boot %s "
-                         % (bootp_options))
-                dnsmasq_command = dnsmasq_command + ' --dhcp-boot=' + \
-                    bootp_options
-                vlog.dbg("dhcp_tftp_debug - dnsmasq cmd %s "
-                         % (dnsmasq_command))
-        # print dnsmasq_command
-
-    # Get the tftp server config
+    root = None
+    budget = tftp_cache.DEFAULT_BUDGET_MB
     for ovs_rec in idl.tables[SYSTEM_TABLE].rows.itervalues():
         if ovs_rec.other_config and ovs_rec.other_config is not None:
-            for key, value in ovs_rec.other_config.iteritems():
-                if key == 'tftp_server_enable':
-                    if value and value == 'true':
-                        dnsmasq_command = dnsmasq_command + ' --enable-tftp '
-                if key == 'tftp_server_secure':
-                    if value and value == 'true':
-                        dnsmasq_command = dnsmasq_command + ' --tftp-secure '
-                if key == 'tftp_server_path':
-                    if value and value is not None:
-                        dnsmasq_command = dnsmasq_command + ' --tftp-root=' + \
-                                          value
-
-                vlog.dbg("dhcp_tftp_debug - dnsmasq cmd %s "
-                         % (dnsmasq_command))
-                # print dnsmasq_command
-
-    vlog.info("dhcp_tftp_debug - dnsmasq_command(2) %s "
-              % (dnsmasq_command))
-
-
-# ------------------ dnsmasq_start_process() ----------
-def dnsmasq_start_process():
-
-    global dnsmasq_process
-    global dnsmasq_command
-
-    dnsmasq_process = None
-
-    vlog.info("dhcp_tftp_debug - dnsmasq_command(3) %s "
-              % (dnsmasq_command))
-
-    dnsmasq_process = subprocess.Popen(dnsmasq_command,
-                                       stdout=subprocess.PIPE,
-                                       stderr=subprocess.PIPE, shell=True)
-
-    err = dnsmasq_process.stderr.read()
-    print err
-    if err != "":
-        vlog.emer("%s" % (err))
-        vlog.emer("Error with config, dnsmasq failed, command %s" %
-                  (dnsmasq_command))
-        log_event("DNSMASQ_FAILURE",
-                  ["dnsmasq_command", dnsmasq_command])
-    else:
-        vlog.info("dhcp_tftp_debug - dnsmasq started")
-        log_event("DNSMASQ_SUCCESS",
-                  ["dnsmasq_command", dnsmasq_command])
+            if ovs_rec.other_config.get('tftp_server_enable') == 'true':
+                root = ovs_rec.other_config.get('tftp_server_path')
+            value = ovs_rec.other_config.get('tftp_server_prewarm_budget')
+            if value and value.isdigit():
+                budget = int(value)
+
+    hot_files = []
+    for ovs_rec in idl.tables[DHCP_SERVER_TABLE].rows.itervalues():
+        if ovs_rec.bootp and ovs_rec.bootp is not None:
+            for value in ovs_rec.bootp.itervalues():
+                # The file name may be followed by the server name/address
+                hot_files.append(value.split(',')[0])
+
+    if root is None and tftp_root_cache is None:
+        return
+
+    if tftp_root_cache is None:
+        tftp_root_cache = tftp_cache.TftpCache()
+
+    try:
+        tftp_root_cache.configure(root, budget << 20, hot_files)
+    except (IOError, OSError) as e:
+        vlog.err("dhcp_tftp_debug - TFTP root cache failed: %s" % (e))
+
+
+# ------------------ dnsmasq_apply() ----------
+def dnsmasq_apply(adopt=False):
+    '''
+    Runs the rendered config of every shard. Only the shards whose config
+    changed are restarted, after the new configs of all the shards were
+    checked together. With adopt, a shard first adopts the dnsmasq
+    started before a restart of the daemon if it still runs the rendered
+    config.
+    '''
+    global dnsmasq_shards
+
+    while len(dnsmasq_shards) < len(dnsmasq_configs):
+        dnsmasq_shards.append(
+            dnsmasq_supervisor.DnsmasqShard(len(dnsmasq_shards)))
+
+    applied = []
+    for shard in dnsmasq_shards:
+        config = None
+        if shard.index < len(dnsmasq_configs):
+            config = dnsmasq_configs[shard.index]
+        if adopt and config is not None and \
+           shard.adopt(config, dnsmasq_log_stream is not None):
+            continue
+        applied.append((shard, config))
+
+    # Check the new configs of all the shards at once, then start them
+    checks = [(shard, config) for shard, config in applied
+              if shard.needs_preflight(config)]
+    checked = dict(zip([shard.index for shard, _ in checks],
+                       dnsmasq_supervisor.preflight_configs(
+                           [config for _, config in checks])))
+    for shard, config in applied:
+        shard.apply(config, checked.get(shard.index))
+
+    # Stop the shards a previous daemon ran with a larger shard count
+    if adopt:
+        for index in xrange(len(dnsmasq_shards),
+                            dnsmasq_render.MAX_SHARDS):
+            shard = dnsmasq_supervisor.DnsmasqShard(index)
+            if shard.pid() is not None:
+                shard.stop()
+
+    # Forget the stopped shards past the shard count
+    while len(dnsmasq_shards) > max(1, len(dnsmasq_configs)) and \
+            dnsmasq_shards[-1].process is None:
+        dnsmasq_shards.pop()
+
+
+# ------------------ sigchld_init() ----------
+def sigchld_init():
+    '''
+    Wakes the main loop up when a child exits, through a pipe written by
+    the python signal wakeup fd. The handler writes to the pipe too, as
+    the sample profiler turns the wakeup fd off, see dhcp_tftp_profile.
+    '''
+    global sigchld_fd
+    global sigchld_write_fd
+
+    read_fd, write_fd = os.pipe()
+    for fd in (read_fd, write_fd):
+        flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+        fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+        fcntl.fcntl(fd, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+
+    signal.signal(signal.SIGCHLD, sigchld_handler)
+    # Restart the system calls the signal interrupts
+    signal.siginterrupt(signal.SIGCHLD, False)
+    signal.set_wakeup_fd(write_fd)
+    sigchld_fd = read_fd
+    sigchld_write_fd = write_fd
+
+
+def sigchld_handler(unused_signum, unused_frame):
+    try:
+        os.write(sigchld_write_fd, '\0')
+    except OSError:
+        # The pipe is full, the main loop wakes up already
+        pass
+
+
+def sigchld_drain():
+    if sigchld_fd is None:
+        return
+
+    try:
+        while os.read(sigchld_fd, 4096):
+            pass
+    except OSError:
+        pass
 
 
 # ------------------ dnsmasq_run() ----------------
@@ -488,45 +553,88 @@ def dnsmasq_run():
             # Get the dhcp-tftp config
             dhcp_tftp_get_config()
 
-            # Start the dnsmasq
-            dnsmasq_start_process()
+            # Start the dnsmasq, unless the one started before a restart
+            # of the daemon still runs this config
+            dnsmasq_apply(adopt=True)
             dnsmasq_started = True
 
+            # Indexed once dnsmasq serves, the files are hashed later on
+            tftp_cache_configure()
+
 
 # --------------------- dnsmasq_restart() --------------
 def dnsmasq_restart():
 
+    # Get the config
+    dhcp_tftp_get_config()
+
+    # Restart the dnsmasq shards whose config changed
+    dnsmasq_apply()
+
+    tftp_cache_configure()
+
+
+# ------------------ dhcp_tftp_wait() ----------------
+def dhcp_tftp_wait(poller):
+
     global idl
-    global dnsmasq_process
-
-    if dnsmasq_process is not None:
-        vlog.dbg("dhcp_tftp_debug - killing dnsmasq")
-        try:
-            dnsmasq_process.kill()
-        except OSError:
-            vlog.info("dhcp_tftp_debug - unable to kill dnsmasq process")
-            pass
 
-    # Also check if any other dnsmasq process is running and kill
-    # This needs to be done as dnsmasq binary forks multiple processes
-    vlog.info("dhcp_tftp_debug (2) - killing dnsmasq")
-    p = subprocess.Popen(['ps', '-A'], stdout=subprocess.PIPE)
-    out, err = p.communicate()
-
-    for line in out.splitlines():
-        if 'dnsmasq' in line:
-            pid = int(line.split(None, 1)[0])
-            try:
-                os.kill(pid, signal.SIGKILL)
-            except OSError:
-                vlog.info("dhcp_tftp_debug - unable to kill previous process")
-                pass
+    idl.wait(poller)
+    if sigchld_fd is not None:
+        poller.fd_wait(sigchld_fd, ovs.poller.POLLIN)
+        # A SIGCHLD received right before blocking wakes the loop through
+        # the wakeup fd only
+        if daemon_profiler is not None and daemon_profiler.sampling():
+            poller.timer_wait(SIGCHLD_POLL_MSEC)
+    for shard in dnsmasq_shards:
+        shard.wait(poller)
+    if tftp_root_cache is not None:
+        tftp_root_cache.wait(poller)
+    if dnsmasq_log_stream is not None:
+        dnsmasq_log_stream.wait(poller)
+
+
+# ------------------ dhcp_tftp_run() ----------------
+def dhcp_tftp_run(poller):
+    '''
+    One pass of the main loop once dnsmasq is started: checks the
+    readiness of the starting dnsmasq, respawns the dnsmasq that exited,
+    blocks on the poller unless an OVSDB change is pending and applies
+    the OVSDB changes.
+    '''
 
-    # Get the config
-    dhcp_tftp_get_config()
+    global idl
+    global seqno
+
+    # Check the starting dnsmasq, respawn dnsmasq if it exited
+    sigchld_drain()
+    dhcp_leases_clear_run()
+    for shard in dnsmasq_shards:
+        shard.start_run()
+        shard.check_exit()
+        shard.respawn_run()
+
+    if seqno == idl.change_seqno:
+        dhcp_tftp_wait(poller)
+        poller.block()
+
+    if tftp_root_cache is not None:
+        tftp_root_cache.run()
+    if dnsmasq_log_stream is not None:
+        dnsmasq_log_stream.run()
 
-    # Start the dnsmasq process
-    dnsmasq_start_process()
+    idl.run()  # Better reload the tables
+
+    vlog.dbg("dhcp_tftp_debug main - seqno change from %d to %d "
+             % (seqno, idl.change_seqno))
+    if seqno != idl.change_seqno:
+        '''
+          If seqno is changed, the DHCP/TFTP server config is rendered
+          again and dnsmasq is restarted only if the rendered config
+          changed and passes the dnsmasq preflight check.
+        '''
+        dnsmasq_restart()
+        seqno = idl.change_seqno
 
 
 # ------------------ main() ----------------
@@ -536,12 +644,20 @@ def main():
     global idl
     global seqno
     global dnsmasq_started
-    global dnsmasq_process
+    global dnsmasq_log_stream
 
     parser = argparse.ArgumentParser()
     parser.add_argument('-d', '--database', metavar="DATABASE",
                         help="A socket on which ovsdb-server is listening.",
                         dest='database')
+    parser.add_argument('--dnsmasq-log-ring', metavar="BYTES", type=int,
+                        default=dnsmasq_log.DEFAULT_RING_BYTES,
+                        help="Bytes of dnsmasq log kept in memory.")
+    parser.add_argument('--dnsmasq-log-file', metavar="FILE",
+                        help="Also append the dnsmasq log to FILE.")
+    parser.add_argument('--dnsmasq-log-file-size', metavar="BYTES", type=int,
+                        default=dnsmasq_log.DEFAULT_FILE_BYTES,
+                        help="Size at which the dnsmasq log file is rotated.")
 
     ovs.vlog.add_args(parser)
     ovs.daemon.add_args(parser)
@@ -560,7 +676,29 @@ def main():
     ovs.daemon.set_pidfile(None)
     ovs.daemon._make_pidfile()
 
+    # The log FIFO must have a reader before dnsmasq is started
+    dnsmasq_log_stream = dnsmasq_log.DnsmasqLog(
+        ring_bytes=args.dnsmasq_log_ring, log_file=args.dnsmasq_log_file,
+        file_bytes=args.dnsmasq_log_file_size)
+    try:
+        dnsmasq_log_stream.open()
+    except OSError as e:
+        vlog.err("dhcp_tftp_debug - dnsmasq log FIFO failed, logging to "
+                 "syslog: %s" % (e))
+        dnsmasq_log_stream.close()
+        dnsmasq_log_stream = None
+
+    sigchld_init()
+
     ovs.unixctl.command_register("exit", "", 0, 0, unixctl_exit, None)
+    ovs.unixctl.command_register("dhcp-tftp/tftp-cache", "", 0, 0,
+                                 unixctl_tftp_cache, None)
+    ovs.unixctl.command_register("dhcp-tftp/dnsmasq-stats", "", 0, 0,
+                                 unixctl_dnsmasq_stats, None)
+    ovs.unixctl.command_register("dhcp-tftp/profile",
+                                 "start [cprofile|sample] | stop | "
+                                 "dump FILE | show", 1, 2,
+                                 unixctl_profile, None)
     error, unixctl_server = ovs.unixctl.server.UnixctlServer.create(None)
 
     if error:
@@ -587,37 +725,16 @@ def main():
         if exiting:
             break
 
-        # Check if dnsmasq process is exited to avoid zombie process
-        if dnsmasq_process is not None:
-            dnsmasq_process.poll()
-
-        if seqno == idl.change_seqno:
-            poller = ovs.poller.Poller()
-            unixctl_server.wait(poller)
-            idl.wait(poller)
-            poller.block()
-
-        idl.run()  # Better reload the tables
-
-        vlog.dbg("dhcp_tftp_debug main - seqno change from %d to %d "
-                 % (seqno, idl.change_seqno))
-        if seqno != idl.change_seqno:
-            '''
-            OPS_TODO:
-              If seqno is changed, it is assumed that DHCP/TFTP server config
-              parameters have been changed by user and hence dnsmasq is
-              is restarted with new config.
-
-              This needs to be fixed - even if seqno gets changed, we need
-              to check if the DHCP/TFTP server configuration is really changed
-              or not and restart the dnsmasq daemon only if the config had
-              been changed.
-            '''
-            dnsmasq_restart()
-            seqno = idl.change_seqno
+        poller = ovs.poller.Poller()
+        unixctl_server.wait(poller)
+        dhcp_tftp_run(poller)
 
     # Daemon exit
     unixctl_server.close()
+    if tftp_root_cache is not None:
+        tftp_root_cache.close()
+    if dnsmasq_log_stream is not None:
+        dnsmasq_log_stream.close()
     idl.close()
 
 
@@ -21,16 +21,51 @@ from opsrest.utils.utils import get_column_data_from_row
 from opsrest.utils import *
 import dhcptftpservervalidations
 
+# Bounds of the numeric dnsmasq keys of DHCP_Server:other_config
+DHCP_SERVER_NUMBER_KEYS = {
+    "lease_max": (1, 2147483647),
+    "shards": (1, 16),
+}
+DHCP_SERVER_BOOLEAN_KEYS = ("authoritative", "no_ping", "rapid_commit",
+                            "quiet_dhcp")
+
 
 class DhcpTftpServerBootpValidator(BaseValidator):
     resource = "dhcp_server"
 
     def validate_modification(self, validation_args):
         dhcp_server_row = validation_args.resource_row
-        if hasattr(dhcp_server_row, "bootp"):
+        changed = dhcptftpservervalidations.changed_columns(validation_args)
+        if hasattr(dhcp_server_row, "bootp") and \
+           dhcptftpservervalidations.is_changed(changed, "bootp"):
             bootp = get_column_data_from_row(dhcp_server_row, "bootp")
             tag_value = bootp.get("match tag", None)
             if (tag_value is not None) and \
                (not dhcptftpservervalidations.is_valid_tag(tag_value)):
                 details = "%s is invalid." % (tag_value)
                 raise ValidationError(error.VERIFICATION_FAILED, details)
+
+        if hasattr(dhcp_server_row, "other_config") and \
+           dhcptftpservervalidations.is_changed(changed, "other_config"):
+            other_config = get_column_data_from_row(dhcp_server_row,
+                                                    "other_config")
+            for key, (low, high) in DHCP_SERVER_NUMBER_KEYS.iteritems():
+                value = other_config.get(key, None)
+                if (value is not None) and \
+                   (not self.is_valid_number(value, low, high)):
+                    details = "%s is invalid for %s. It should be between " \
+                              "%d-%d." % (value, key, low, high)
+                    raise ValidationError(error.VERIFICATION_FAILED, details)
+
+            for key in DHCP_SERVER_BOOLEAN_KEYS:
+                value = other_config.get(key, None)
+                if (value is not None) and (value not in ("true", "false")):
+                    details = "%s is invalid for %s. It should be true " \
+                              "or false." % (value, key)
+                    raise ValidationError(error.VERIFICATION_FAILED, details)
+
+    def is_valid_number(self, value, low, high):
+        if not value.isdigit():
+            return False
+
+        return low <= int(value) <= high
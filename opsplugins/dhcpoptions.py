@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+'''
+Catalog of the DHCP options known to dnsmasq, with the type of their
+value, used to reject option values that dnsmasq would refuse to start
+with. The catalog follows the dnsmasq option tables (dhcp-common.c, as
+listed by "dnsmasq --help dhcp" and "dnsmasq --help dhcp6"), names are
+matched case-insensitively like dnsmasq does, and the lookup indexes are
+built once when the module is imported. A newer dnsmasq may know names
+missing here, so the validators only warn about an unknown name.
+'''
+
+import re
+from collections import namedtuple
+
+import typedaddress
+
+IP_LIST = "ip-list"
+UINT8 = "uint8"
+UINT16 = "uint16"
+UINT32 = "uint32"
+STRING = "string"
+BOOLEAN = "boolean"
+TIME = "time"
+# Values dnsmasq passes through without checking them
+OPAQUE = "opaque"
+
+DhcpOption = namedtuple("DhcpOption", "number name type")
+
+DHCP_OPTIONS = (
+    (1, "netmask", IP_LIST),
+    (2, "time-offset", UINT32),
+    (3, "router", IP_LIST),
+    (6, "dns-server", IP_LIST),
+    (7, "log-server", IP_LIST),
+    (9, "lpr-server", IP_LIST),
+    (12, "hostname", STRING),
+    (13, "boot-file-size", UINT16),
+    (15, "domain-name", STRING),
+    (16, "swap-server", IP_LIST),
+    (17, "root-path", STRING),
+    (18, "extension-path", STRING),
+    (19, "ip-forward-enable", BOOLEAN),
+    (20, "non-local-source-routing", BOOLEAN),
+    (21, "policy-filter", IP_LIST),
+    (22, "max-datagram-reassembly", UINT16),
+    (23, "default-ttl", UINT8),
+    (26, "mtu", UINT16),
+    (27, "all-subnets-local", BOOLEAN),
+    (28, "broadcast", IP_LIST),
+    (31, "router-discovery", BOOLEAN),
+    (32, "router-solicitation", IP_LIST),
+    (33, "static-route", IP_LIST),
+    (34, "trailer-encapsulation", BOOLEAN),
+    (35, "arp-timeout", UINT32),
+    (36, "ethernet-encap", BOOLEAN),
+    (37, "tcp-ttl", UINT8),
+    (38, "tcp-keepalive", UINT32),
+    (40, "nis-domain", STRING),
+    (41, "nis-server", IP_LIST),
+    (42, "ntp-server", IP_LIST),
+    (43, "vendor-encap", OPAQUE),
+    (44, "netbios-ns", IP_LIST),
+    (45, "netbios-dd", IP_LIST),
+    (46, "netbios-nodetype", UINT8),
+    (47, "netbios-scope", OPAQUE),
+    (48, "x-windows-fs", IP_LIST),
+    (49, "x-windows-dm", IP_LIST),
+    (50, "requested-address", IP_LIST),
+    (51, "lease-time", TIME),
+    (52, "option-overload", OPAQUE),
+    (53, "message-type", UINT8),
+    (54, "server-identifier", IP_LIST),
+    (55, "parameter-request", OPAQUE),
+    (56, "message", OPAQUE),
+    (57, "max-message-size", OPAQUE),
+    (58, "T1", TIME),
+    (59, "T2", TIME),
+    (60, "vendor-class", OPAQUE),
+    (61, "client-id", OPAQUE),
+    (64, "nis+-domain", STRING),
+    (65, "nis+-server", IP_LIST),
+    (66, "tftp-server", STRING),
+    (67, "bootfile-name", STRING),
+    (68, "mobile-ip-home", IP_LIST),
+    (69, "smtp-server", IP_LIST),
+    (70, "pop3-server", IP_LIST),
+    (71, "nntp-server", IP_LIST),
+    (74, "irc-server", IP_LIST),
+    (77, "user-class", OPAQUE),
+    (80, "rapid-commit", OPAQUE),
+    (81, "FQDN", OPAQUE),
+    (82, "agent-id", OPAQUE),
+    (93, "client-arch", UINT16),
+    (94, "client-interface-id", OPAQUE),
+    (97, "client-machine-id", OPAQUE),
+    (100, "posix-timezone", STRING),
+    (101, "tzdb-timezone", STRING),
+    (118, "subnet-select", OPAQUE),
+    (119, "domain-search", STRING),
+    (120, "sip-server", OPAQUE),
+    (121, "classless-static-route", OPAQUE),
+    (125, "vendor-id-encap", OPAQUE),
+    (150, "tftp-server-address", IP_LIST),
+    (255, "server-ip-address", IP_LIST),
+)
+
+DHCPV6_OPTIONS = (
+    (1, "client-id", OPAQUE),
+    (2, "server-id", OPAQUE),
+    (3, "ia-na", OPAQUE),
+    (4, "ia-ta", OPAQUE),
+    (5, "iaaddr", OPAQUE),
+    (6, "oro", OPAQUE),
+    (7, "preference", UINT8),
+    (12, "unicast", OPAQUE),
+    (13, "status", OPAQUE),
+    (14, "rapid-commit", OPAQUE),
+    (15, "user-class", OPAQUE),
+    (16, "vendor-class", OPAQUE),
+    (17, "vendor-opts", OPAQUE),
+    (21, "sip-server-domain", STRING),
+    (22, "sip-server", IP_LIST),
+    (23, "dns-server", IP_LIST),
+    (24, "domain-search", STRING),
+    (27, "nis-server", IP_LIST),
+    (28, "nis+-server", IP_LIST),
+    (29, "nis-domain", STRING),
+    (30, "nis+-domain", STRING),
+    (31, "sntp-server", IP_LIST),
+    (32, "information-refresh-time", TIME),
+    (39, "FQDN", OPAQUE),
+    (56, "ntp-server", OPAQUE),
+    (59, "bootfile-url", STRING),
+    (60, "bootfile-param", STRING),
+)
+
+UINT_BITS = {UINT8: 8, UINT16: 16, UINT32: 32}
+
+UINT_RE = re.compile("[0-9]+$")
+# dnsmasq times are seconds with an optional unit, or "infinite"
+TIME_RE = re.compile("([0-9]+[smhdw]?|infinite)$", re.IGNORECASE)
+
+
+def _index(options):
+    by_name = {}
+    by_number = {}
+    for number, name, value_type in options:
+        option = DhcpOption(number, name, value_type)
+        by_name[name.lower()] = option
+        by_number[number] = option
+    return by_name, by_number
+
+
+OPTIONS_BY_NAME, OPTIONS_BY_NUMBER = _index(DHCP_OPTIONS)
+OPTIONS6_BY_NAME, OPTIONS6_BY_NUMBER = _index(DHCPV6_OPTIONS)
+
+
+def lookup_name(name, ipv6=False):
+    '''
+    Return the DhcpOption for an option name, or None if it is not in the
+    catalog.
+    '''
+    by_name = OPTIONS6_BY_NAME if ipv6 else OPTIONS_BY_NAME
+    return by_name.get(name.lower())
+
+
+def lookup_number(number, ipv6=False):
+    '''
+    Return the DhcpOption for an option number, or None if it is not in
+    the catalog. dnsmasq accepts any option number, with an opaque value.
+    '''
+    by_number = OPTIONS6_BY_NUMBER if ipv6 else OPTIONS_BY_NUMBER
+    return by_number.get(number)
+
+
+def _is_valid_ip_list(value, ipv6):
+    family = typedaddress.IPV6 if ipv6 else typedaddress.IPV4
+    for ip in value.split(","):
+        if ipv6 and ip.startswith("[") and ip.endswith("]"):
+            ip = ip[1:-1]
+        address = typedaddress.parse(ip)
+        if address is None or address.family != family:
+            return False
+    return True
+
+
+def is_valid_value(option, value, ipv6=False):
+    '''
+    Check an option value against the type of the option. Options that
+    are not in the catalog accept any value.
+    '''
+    if option is None or option.type in (OPAQUE, STRING):
+        return True
+
+    if option.type == IP_LIST:
+        return _is_valid_ip_list(value, ipv6)
+
+    if option.type == BOOLEAN:
+        return value in ("0", "1")
+
+    if option.type == TIME:
+        return TIME_RE.match(value) is not None
+
+    return UINT_RE.match(value) is not None and \
+        int(value) < (1 << UINT_BITS[option.type])
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+'''
+Cross-row validation of the DHCP server configuration.
+
+The per-row validators cannot see conflicts between rows. This module
+looks at every DHCPSrv_Range and DHCPSrv_Static_Host row of the
+transaction at once and reports:
+ - ranges overlapping another range of the same DHCP server,
+ - static hosts sharing an IP address or a MAC address,
+ - static hosts outside the subnet of every range of their DHCP server,
+   when the server has ranges of that address family. A range covers the
+   subnet given by its start address and netmask, or prefix length, as
+   dnsmasq serves static hosts anywhere in it, whether the range is
+   static or not. The check is skipped when an IPv4 range has no netmask,
+   dnsmasq then takes the subnet from the interface. The ranges of the
+   server take part in the conflict, so a range change stranding a host
+   fails as well.
+
+The ranges are swept in address order and the static hosts are checked
+against the merged subnets with a binary search, so a transaction of n
+rows costs O(n log n). The result is computed once per transaction and
+shared by the validation of all its rows.
+'''
+
+from bisect import bisect_right
+from collections import namedtuple
+
+from opsvalidator import error
+from opsvalidator.error import ValidationError
+import typedaddress
+
+DHCP_SERVER_TABLE = "DHCP_Server"
+DHCP_SERVER_RANGE_TABLE = "DHCPSrv_Range"
+DHCP_SERVER_STATIC_HOST_TABLE = "DHCPSrv_Static_Host"
+
+# Prefix length of an IPv6 range without one, as dnsmasq assumes
+DEFAULT_IPV6_PREFIX_LEN = 64
+
+Conflict = namedtuple("Conflict", "uuids details")
+
+# Transaction and IDL sequence number the cached conflicts were found for
+cache_key = None
+cache_conflicts = None
+
+
+def _live_rows(idl, table_name):
+    table = idl.tables.get(table_name)
+    if table is None:
+        return []
+
+    # Rows deleted by the transaction have no changes dict
+    return [row for row in table.rows.itervalues()
+            if getattr(row, "_changes", {}) is not None]
+
+
+def _owners(idl):
+    owners = {}
+    for server in _live_rows(idl, DHCP_SERVER_TABLE):
+        for column in ("ranges", "static_hosts"):
+            for row in getattr(server, column, []):
+                owners[row.uuid] = server.uuid
+    return owners
+
+
+def _range_bounds(row):
+    start = typedaddress.parse(row.start_ip_address)
+    end = start
+    for ip in row.end_ip_address:
+        end = typedaddress.parse(ip)
+
+    # Invalid ranges are reported by the per-row validator
+    if start is None or end is None or start.family != end.family:
+        return None
+
+    return start.family, min(start.value, end.value), \
+        max(start.value, end.value)
+
+
+def _range_subnet(row, family, start):
+    '''
+    Return the first and last address of the subnet of a range, or None
+    if it is not configured.
+    '''
+    if family == typedaddress.IPV4:
+        bits = typedaddress.IPV4_BITS
+        prefix = None
+        for netmask in row.netmask:
+            mask = typedaddress.parse_netmask(netmask)
+            prefix = None if mask is None else mask.prefix
+    else:
+        bits = typedaddress.IPV6_BITS
+        prefix = DEFAULT_IPV6_PREFIX_LEN
+        for prefix in row.prefix_len:
+            pass
+
+    if prefix is None or not 0 <= prefix <= bits:
+        return None
+
+    size = 1 << (bits - prefix)
+    first = start & ~(size - 1)
+    return first, first + size - 1
+
+
+def find_conflicts(idl):
+    '''
+    Return the list of Conflicts between the DHCP server rows of idl.
+    '''
+    conflicts = []
+    owners = _owners(idl)
+
+    intervals = {}
+    subnets = {}
+    for row in _live_rows(idl, DHCP_SERVER_RANGE_TABLE):
+        bounds = _range_bounds(row)
+        if bounds is None:
+            continue
+        family, start, end = bounds
+        key = (owners.get(row.uuid), family)
+        intervals.setdefault(key, []).append((start, end, row.name, row.uuid))
+        subnets.setdefault(key, []).append(
+            (_range_subnet(row, family, start), row.uuid))
+
+    # Sweep the ranges of each server by start address. A range starting
+    # before the furthest end seen so far overlaps the range owning it.
+    for key in sorted(intervals):
+        reach = None
+        for start, end, name, uuid in sorted(intervals[key]):
+            if reach is not None and start <= reach[0]:
+                conflicts.append(Conflict(
+                    frozenset((reach[2], uuid)),
+                    "Range %s overlaps range %s." % (reach[1], name)))
+            if reach is None or end > reach[0]:
+                reach = (end, name, uuid)
+
+    # Merge the subnets of each server, subnets are nested or disjoint
+    coverage = {}
+    for key, ranges in subnets.iteritems():
+        if any(subnet is None for subnet, uuid in ranges):
+            continue
+        starts = []
+        ends = []
+        for first, last in sorted(subnet for subnet, uuid in ranges):
+            if ends and first <= ends[-1]:
+                ends[-1] = max(ends[-1], last)
+            else:
+                starts.append(first)
+                ends.append(last)
+        coverage[key] = (starts, ends,
+                         frozenset(uuid for subnet, uuid in ranges))
+
+    by_ip = {}
+    by_mac = {}
+    for row in _live_rows(idl, DHCP_SERVER_STATIC_HOST_TABLE):
+        address = typedaddress.parse(row.ip_address)
+        if address is None:
+            continue
+
+        owner = owners.get(row.uuid)
+        by_ip.setdefault((owner, address.family, address.value),
+                         []).append(row)
+        for mac in row.mac_addresses:
+            by_mac.setdefault((owner, mac.lower()), []).append(row)
+
+        covered = coverage.get((owner, address.family))
+        if covered is not None:
+            starts, ends, ranges = covered
+            i = bisect_right(starts, address.value) - 1
+            if i < 0 or address.value > ends[i]:
+                conflicts.append(Conflict(
+                    ranges | frozenset((row.uuid,)),
+                    "Static host %s is outside the subnet of every range."
+                    % (row.ip_address)))
+
+    for key in sorted(by_ip):
+        rows = by_ip[key]
+        if len(rows) > 1:
+            conflicts.append(Conflict(
+                frozenset(row.uuid for row in rows),
+                "IP address %s is used by %d static hosts."
+                % (rows[0].ip_address, len(rows))))
+
+    for key in sorted(by_mac):
+        rows = by_mac[key]
+        if len(rows) > 1:
+            conflicts.append(Conflict(
+                frozenset(row.uuid for row in rows),
+                "MAC address %s is used by static hosts %s."
+                % (key[1], ", ".join(sorted(row.ip_address
+                                            for row in rows)))))
+
+    return conflicts
+
+
+def get_conflicts(idl):
+    '''
+    Return the conflicts of the transaction in progress on idl, computed
+    once per transaction.
+    '''
+    global cache_key
+    global cache_conflicts
+
+    txn = getattr(idl, "txn", None)
+    key = (txn, getattr(idl, "change_seqno", None))
+    if txn is None or key != cache_key:
+        conflicts = find_conflicts(idl)
+        involved = set()
+        for conflict in conflicts:
+            involved.update(conflict.uuids)
+        cache_key = key
+        cache_conflicts = (conflicts, involved)
+
+    return cache_conflicts
+
+
+def validate_row(validation_args):
+    '''
+    Fail the validation of the resource row if it takes part in a
+    conflict, reporting every conflict of the transaction.
+    '''
+    idl = validation_args.idl
+    row = validation_args.resource_row
+    if idl is None or not hasattr(row, "uuid"):
+        return
+
+    conflicts, involved = get_conflicts(idl)
+    if row.uuid in involved:
+        details = " ".join(conflict.details for conflict in conflicts)
+        raise ValidationError(error.VERIFICATION_FAILED, details)
@@ -27,17 +27,21 @@ class DHCPSrvMatchValidator(BaseValidator):
     def validate_modification(self, validation_args):
         option_name = None
         option_number = None
+        option_value = None
         DHCPSrv_Match_row = validation_args.resource_row
+        changed = dhcptftpservervalidations.changed_columns(validation_args)
+        is_changed = dhcptftpservervalidations.is_changed
         set_tag = get_column_data_from_row(DHCPSrv_Match_row,
                                            "set_tag")
-        if not dhcptftpservervalidations.is_valid_tag(set_tag):
+        if is_changed(changed, "set_tag") and \
+           not dhcptftpservervalidations.is_valid_tag(set_tag):
             details = "%s is invalid." % (set_tag)
             raise ValidationError(error.VERIFICATION_FAILED, details)
 
         if hasattr(DHCPSrv_Match_row, "option_name"):
             option_name = get_column_data_from_row(DHCPSrv_Match_row,
                                                    "option_name")
-        if (option_name is not None):
+        if (option_name is not None) and is_changed(changed, "option_name"):
             for name in option_name:
                 if (not dhcptftpservervalidations.is_valid_tag(name)):
                     details = "%s is invalid." % (name)
@@ -46,9 +50,21 @@ class DHCPSrvMatchValidator(BaseValidator):
         if hasattr(DHCPSrv_Match_row, "option_number"):
             option_number = get_column_data_from_row(DHCPSrv_Match_row,
                                                      "option_number")
-        if (option_number is not None):
+        if (option_number is not None) and \
+           is_changed(changed, "option_number"):
             for number in option_number:
                 if (not dhcptftpservervalidations.is_valid_option_number(
                         number)):
                     details = "%d is invalid." % (number)
                     raise ValidationError(error.VERIFICATION_FAILED, details)
+
+        if hasattr(DHCPSrv_Match_row, "option_value"):
+            option_value = get_column_data_from_row(DHCPSrv_Match_row,
+                                                    "option_value")
+
+        if is_changed(changed, "option_name", "option_number",
+                      "option_value"):
+            details = dhcptftpservervalidations.get_option_error(
+                option_name, option_number, option_value, None)
+            if details is not None:
+                raise ValidationError(error.VERIFICATION_FAILED, details)
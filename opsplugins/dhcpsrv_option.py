@@ -27,13 +27,17 @@ class DHCPSrvOptionValidator(BaseValidator):
     def validate_modification(self, validation_args):
         option_name = None
         option_number = None
+        option_value = None
+        ipv6 = None
         match_tags = None
         DHCPSrv_Option_row = validation_args.resource_row
+        changed = dhcptftpservervalidations.changed_columns(validation_args)
+        is_changed = dhcptftpservervalidations.is_changed
 
         if hasattr(DHCPSrv_Option_row, "option_name"):
             option_name = get_column_data_from_row(DHCPSrv_Option_row,
                                                    "option_name")
-        if (option_name is not None):
+        if (option_name is not None) and is_changed(changed, "option_name"):
             for name in option_name:
                 if (not dhcptftpservervalidations.is_valid_tag(name)):
                     details = "%s is invalid." % (name)
@@ -43,6 +47,7 @@ class DHCPSrvOptionValidator(BaseValidator):
             match_tags = get_column_data_from_row(DHCPSrv_Option_row,
                                                   "match_tags")
         if (match_tags is not None) and \
+           is_changed(changed, "match_tags") and \
            (not dhcptftpservervalidations.is_valid_tags(match_tags)):
             details = "%s is invalid." % (match_tags)
             raise ValidationError(error.VERIFICATION_FAILED, details)
@@ -50,9 +55,23 @@ class DHCPSrvOptionValidator(BaseValidator):
         if hasattr(DHCPSrv_Option_row, "option_number"):
             option_number = get_column_data_from_row(DHCPSrv_Option_row,
                                                      "option_number")
-        if (option_number is not None):
+        if (option_number is not None) and \
+           is_changed(changed, "option_number"):
             for number in option_number:
                 if (not dhcptftpservervalidations.is_valid_option_number(
                         number)):
                     details = "%s is invalid." % (number)
                     raise ValidationError(error.VERIFICATION_FAILED, details)
+
+        if hasattr(DHCPSrv_Option_row, "option_value"):
+            option_value = get_column_data_from_row(DHCPSrv_Option_row,
+                                                    "option_value")
+        if hasattr(DHCPSrv_Option_row, "ipv6"):
+            ipv6 = get_column_data_from_row(DHCPSrv_Option_row, "ipv6")
+
+        if is_changed(changed, "option_name", "option_number",
+                      "option_value", "ipv6"):
+            details = dhcptftpservervalidations.get_option_error(
+                option_name, option_number, option_value, ipv6)
+            if details is not None:
+                raise ValidationError(error.VERIFICATION_FAILED, details)
@@ -18,8 +18,10 @@ from opsvalidator.base import BaseValidator
 from opsvalidator import error
 from opsvalidator.error import ValidationError
 from opsrest.utils.utils import get_column_data_from_row
+import dhcpsrv_conflicts
 import dhcptftpservervalidations
 import ipaddress
+import typedaddress
 
 
 class DHCPSrvRangeValidator(BaseValidator):
@@ -39,18 +41,27 @@ class DHCPSrvRangeValidator(BaseValidator):
         end_ip = None
         broad_cast = None
         prefixlen = None
+        end = None
+        mask = None
+        broadcast_addr = None
 
         DHCPSrv_Range_row = validation_args.resource_row
+        changed = dhcptftpservervalidations.changed_columns(validation_args)
+        is_changed = dhcptftpservervalidations.is_changed
+
         name = get_column_data_from_row(DHCPSrv_Range_row,
                                         "name")
-        if not dhcptftpservervalidations.is_valid_tag(name):
+        if is_changed(changed, "name") and \
+           not dhcptftpservervalidations.is_valid_tag(name):
             details = "%s is invalid." % (name)
             raise ValidationError(error.VERIFICATION_FAILED, details)
 
         start_ip_address = get_column_data_from_row(DHCPSrv_Range_row,
                                                     "start_ip_address")
 
-        if not ipaddress.is_valid_ip_address(start_ip_address):
+        start = typedaddress.parse(start_ip_address)
+        if is_changed(changed, "start_ip_address") and \
+           not ipaddress.is_valid_address(start):
             details = "%s is invalid." % (start_ip_address)
             raise ValidationError(error.VERIFICATION_FAILED, details)
 
@@ -61,7 +72,9 @@ class DHCPSrvRangeValidator(BaseValidator):
         if (end_ip_address is not None):
             for ip in end_ip_address:
                 end_ip = ip
-                if (not ipaddress.is_valid_ip_address(ip)):
+                end = typedaddress.parse(ip)
+                if is_changed(changed, "end_ip_address") and \
+                   (not ipaddress.is_valid_address(end)):
                     details = "%s is invalid." % (ip)
                     raise ValidationError(error.VERIFICATION_FAILED, details)
 
@@ -69,7 +82,8 @@ class DHCPSrvRangeValidator(BaseValidator):
             lease_duration = get_column_data_from_row(DHCPSrv_Range_row,
                                                       "lease_duration")
 
-        if (lease_duration is not None):
+        if (lease_duration is not None) and \
+           is_changed(changed, "lease_duration"):
             for duration in lease_duration:
                 if (not dhcptftpservervalidations.is_valid_lease_duration
                    (duration)):
@@ -77,9 +91,10 @@ class DHCPSrvRangeValidator(BaseValidator):
                               "between 2-65535."
                     raise ValidationError(error.VERIFICATION_FAILED, details)
 
-        if (start_ip_address is not None) and \
-           (end_ip is not None) and \
-           (ipaddress.ip_type(start_ip_address) != ipaddress.ip_type(end_ip)):
+        if (start is not None) and \
+           (end is not None) and \
+           is_changed(changed, "start_ip_address", "end_ip_address") and \
+           (start.family != end.family):
             details = "Invalid IP address range"
             raise ValidationError(error.VERIFICATION_FAILED, details)
 
@@ -87,7 +102,7 @@ class DHCPSrvRangeValidator(BaseValidator):
             set_tag = get_column_data_from_row(DHCPSrv_Range_row,
                                                "set_tag")
 
-        if (set_tag is not None):
+        if (set_tag is not None) and is_changed(changed, "set_tag"):
             for tag in set_tag:
                 if (not dhcptftpservervalidations.is_valid_tag(tag)):
                     details = "%s is invalid." % (tag)
@@ -98,6 +113,7 @@ class DHCPSrvRangeValidator(BaseValidator):
                                                   "match_tags")
 
         if (match_tags is not None) and \
+           is_changed(changed, "match_tags") and \
            (not dhcptftpservervalidations.is_valid_tags(match_tags)):
             details = "%s is invalid." % (match_tags)
             raise ValidationError(error.VERIFICATION_FAILED, details)
@@ -107,23 +123,27 @@ class DHCPSrvRangeValidator(BaseValidator):
                                                "netmask")
 
         if (netmask is not None):
-            for mask in netmask:
-                net_mask = mask
-                if (not ipaddress.is_valid_netmask(mask)):
-                    details = "%s is invalid." % (mask)
+            for value in netmask:
+                net_mask = value
+                mask = typedaddress.parse_netmask(net_mask)
+                if mask is None and is_changed(changed, "netmask"):
+                    details = "%s is invalid." % (net_mask)
                     raise ValidationError(error.VERIFICATION_FAILED, details)
 
-        if (start_ip_address is not None) and \
-           (end_ip is not None) and \
-           (net_mask is not None) and \
-           (ipaddress.ip_type(start_ip_address) == 0) and \
-           (not ipaddress.is_valid_net(start_ip_address, end_ip, net_mask)):
+        if (start is not None) and \
+           (end is not None) and \
+           (mask is not None) and \
+           is_changed(changed, "start_ip_address", "end_ip_address",
+                      "netmask") and \
+           start.is_ipv4 and \
+           (not ipaddress.in_same_net(start, end, mask)):
             details = "Invalid IP address range."
             raise ValidationError(error.VERIFICATION_FAILED, details)
 
-        if (start_ip_address is not None) and \
-           (ipaddress.ip_type(start_ip_address) == 1) and \
-           (net_mask is not None):
+        if (start is not None) and \
+           start.is_ipv6 and \
+           (net_mask is not None) and \
+           is_changed(changed, "start_ip_address", "netmask"):
             details = "Error : netmask configuration not allowed for IPv6"
             raise ValidationError(error.VERIFICATION_FAILED, details)
 
@@ -134,28 +154,34 @@ class DHCPSrvRangeValidator(BaseValidator):
         if broadcast is not None:
             for b in broadcast:
                 broad_cast = b
+                broadcast_addr = typedaddress.parse(b)
 
-        if (start_ip_address is not None) and \
-           (ipaddress.ip_type(start_ip_address) == 0) and \
-           (net_mask is not None) and \
+        if (start is not None) and \
+           start.is_ipv4 and \
+           (mask is not None) and \
            (broad_cast is not None) and \
-           (not ipaddress.is_valid_broadcast_addr(start_ip_address,
-                                                  net_mask,
-                                                  broad_cast)):
+           is_changed(changed, "start_ip_address", "netmask",
+                      "broadcast") and \
+           (broadcast_addr is None or
+            broadcast_addr.is_ipv6 or
+            not ipaddress.is_broadcast_of(start, mask, broadcast_addr)):
             details = "%s is invalid." % (broad_cast)
             raise ValidationError(error.VERIFICATION_FAILED, details)
 
         if (start_ip_address is not None) and \
            (broad_cast is not None) and \
-           (net_mask is None):
+           (net_mask is None) and \
+           is_changed(changed, "netmask", "broadcast"):
             details = "Error : netmask must be specified before broadcast " \
                       "address"
             raise ValidationError(error.VERIFICATION_FAILED, details)
 
-        if (start_ip_address is not None) and \
+        if (start is not None) and \
            (net_mask is not None) and \
            (broad_cast is not None) and \
-           (ipaddress.ip_type(start_ip_address) == 1):
+           is_changed(changed, "start_ip_address", "netmask",
+                      "broadcast") and \
+           start.is_ipv6:
             details = "Error : broadcast address not allowed for IPv6"
             raise ValidationError(error.VERIFICATION_FAILED, details)
 
@@ -167,9 +193,15 @@ class DHCPSrvRangeValidator(BaseValidator):
             for p in prefix_len:
                 prefixlen = p
 
-        if (start_ip_address is not None) and \
+        if (start is not None) and \
            (end_ip is not None) and \
            (prefixlen is not None) and \
-           (ipaddress.ip_type(start_ip_address) != 1):
+           is_changed(changed, "start_ip_address", "end_ip_address",
+                      "prefix_len") and \
+           (not start.is_ipv6):
             details = "Error: prefix length configuration not allowed for IPv4"
             raise ValidationError(error.VERIFICATION_FAILED, details)
+
+        if is_changed(changed, "start_ip_address", "end_ip_address",
+                      "netmask", "prefix_len"):
+            dhcpsrv_conflicts.validate_row(validation_args)
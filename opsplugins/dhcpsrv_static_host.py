@@ -18,8 +18,10 @@ from opsvalidator.base import BaseValidator
 from opsvalidator import error
 from opsvalidator.error import ValidationError
 from opsrest.utils.utils import get_column_data_from_row
+import dhcpsrv_conflicts
 import dhcptftpservervalidations
 import ipaddress
+import typedaddress
 
 
 class DHCPSrvStaticHostValidator(BaseValidator):
@@ -33,10 +35,14 @@ class DHCPSrvStaticHostValidator(BaseValidator):
         lease_duration = None
 
         DHCPSrv_Static_Host = validation_args.resource_row
+        changed = dhcptftpservervalidations.changed_columns(validation_args)
+        is_changed = dhcptftpservervalidations.is_changed
+
         ip_address = get_column_data_from_row(DHCPSrv_Static_Host,
                                               "ip_address")
 
-        if not ipaddress.is_valid_ip_address(ip_address):
+        if is_changed(changed, "ip_address") and \
+           not ipaddress.is_valid_address(typedaddress.parse(ip_address)):
             details = "%s is an invalid IP address." % (ip_address)
             raise ValidationError(error.VERIFICATION_FAILED, details)
 
@@ -44,6 +50,7 @@ class DHCPSrvStaticHostValidator(BaseValidator):
             mac_addresses = get_column_data_from_row(DHCPSrv_Static_Host,
                                                      "mac_addresses")
         if (mac_addresses is not None) and \
+           is_changed(changed, "mac_addresses") and \
            (not dhcptftpservervalidations.is_valid_mac_addresses(
                 mac_addresses)):
             details = "Invalid MAC addresses."
@@ -54,6 +61,7 @@ class DHCPSrvStaticHostValidator(BaseValidator):
                                                 "set_tags")
 
         if (set_tags is not None) and \
+           is_changed(changed, "set_tags") and \
            (not dhcptftpservervalidations.is_valid_tags(set_tags)):
             details = "%s is invalid." % (set_tags)
             raise ValidationError(error.VERIFICATION_FAILED, details)
@@ -62,7 +70,8 @@ class DHCPSrvStaticHostValidator(BaseValidator):
             client_hostname = get_column_data_from_row(DHCPSrv_Static_Host,
                                                        "client_hostname")
 
-        if (client_hostname is not None):
+        if (client_hostname is not None) and \
+           is_changed(changed, "client_hostname"):
             for hostname in client_hostname:
                 if (not dhcptftpservervalidations.is_valid_tag(hostname)):
                     details = "%s is invalid." % (hostname)
@@ -72,14 +81,16 @@ class DHCPSrvStaticHostValidator(BaseValidator):
             client_id = get_column_data_from_row(DHCPSrv_Static_Host,
                                                  "client_id")
 
-        if (client_id is not None):
+        if (client_id is not None) and is_changed(changed, "client_id"):
             for c_id in client_id:
                 if (not dhcptftpservervalidations.is_valid_tag(c_id)):
                     details = "%s is invalid." % (c_id)
                     raise ValidationError(error.VERIFICATION_FAILED, details)
 
         if (mac_addresses is None) and (client_hostname is None) and \
-           (client_id is None):
+           (client_id is None) and \
+           is_changed(changed, "mac_addresses", "client_hostname",
+                      "client_id"):
             details = "Any one of MAC address or hostname or client-id" \
                       " must be specified"
             raise ValidationError(error.VERIFICATION_FAILED, details)
@@ -88,10 +99,14 @@ class DHCPSrvStaticHostValidator(BaseValidator):
             lease_duration = get_column_data_from_row(DHCPSrv_Static_Host,
                                                       "lease_duration")
 
-        if (lease_duration is not None):
+        if (lease_duration is not None) and \
+           is_changed(changed, "lease_duration"):
             for duration in lease_duration:
                 if (not dhcptftpservervalidations.is_valid_lease_duration(
                         duration)):
                     details = "Lease duration should be 0 for infinite or" \
                               " between 2-65535."
                     raise ValidationError(error.VERIFICATION_FAILED, details)
+
+        if is_changed(changed, "ip_address", "mac_addresses"):
+            dhcpsrv_conflicts.validate_row(validation_args)
@@ -14,10 +14,15 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import logging
+
+import dhcpoptions
 import macaddress
 
 MAX_DHCP_CONFIG_NAME_LENGTH = 15
 
+log = logging.getLogger(__name__)
+
 
 def is_valid_tags(match_tags):
     for tag in match_tags:
@@ -40,6 +45,33 @@ def is_valid_option_number(num):
         return True
 
 
+def get_option_error(option_name, option_number, option_value, ipv6):
+    '''
+    Check the option name and value of an option or match row against the
+    DHCP option catalog. The columns are given as lists of at most one
+    value. Returns the error details, or None if the option is valid.
+
+    A name missing from the catalog may be known to the dnsmasq running,
+    it is only warned about and its value is not checked.
+    '''
+    ipv6 = bool(ipv6 and ipv6[0])
+    option = None
+    if option_name:
+        option = dhcpoptions.lookup_name(option_name[0], ipv6)
+        if option is None:
+            log.warning("DHCP option %s is not in the option catalog, "
+                        "its value is not checked", option_name[0])
+    elif option_number:
+        option = dhcpoptions.lookup_number(option_number[0], ipv6)
+
+    if option_value and \
+       not dhcpoptions.is_valid_value(option, option_value[0], ipv6):
+        return "%s is not a valid value for DHCP option %s (%s)." \
+               % (option_value[0], option.name, option.type)
+
+    return None
+
+
 def is_valid_lease_duration(lease_duration):
     if (lease_duration == 1) or (lease_duration > 65535):
         return False
@@ -52,3 +84,35 @@ def is_valid_mac_addresses(mac_addresses):
         if not macaddress.is_valid_mac_address(mac_address):
             return False
     return True
+
+
+def changed_columns(validation_args):
+    '''
+    Return the set of columns changed by the modification of the resource
+    row, or None if every column has to be checked (new rows, or rows
+    that do not track their changes).
+    '''
+    if getattr(validation_args, "is_new", True):
+        return None
+
+    changes = getattr(validation_args.resource_row, "_changes", None)
+    if changes is None:
+        return None
+
+    return set(changes)
+
+
+def is_changed(changed, *columns):
+    return changed is None or not changed.isdisjoint(columns)
+
+
+def old_column_data(row, column):
+    '''
+    Return the value of the column before the modification, or None if it
+    is not known.
+    '''
+    data = getattr(row, "_data", None)
+    if not data or column not in data:
+        return None
+
+    return data[column].to_python(lambda atom, unused_base: atom)
@@ -15,51 +15,53 @@
 # under the License.
 
 import socket
-import struct
 
+import typedaddress
 
-def is_valid_ip_address(ip):
-    is_ipv4 = True
-    try:
-        socket.inet_pton(socket.AF_INET, ip)
-    except socket.error:
-        try:
-            socket.inet_pton(socket.AF_INET6, ip)
-            is_ipv4 = False
-        except:
-            return False
-
-    if is_ipv4 and not is_valid_ipv4(ip2int(ip)):
-        return False
 
-    if not is_ipv4 and not is_ipv6_global_unicast(ipv6_to_int(ip)):
+def is_valid_address(address):
+    '''
+    Check a parsed typedaddress.Address for a usable host address.
+    '''
+    if address is None:
         return False
-    return True
+
+    if address.is_ipv4:
+        return is_valid_ipv4(address.value)
+
+    return is_ipv6_global_unicast(address.value)
+
+
+def is_valid_ip_address(ip):
+    return is_valid_address(typedaddress.parse(ip))
 
 
 def ip_type(ip):
     if ip is None:
         return -2
-    try:
-        socket.inet_pton(socket.AF_INET, ip)
-    except socket.error:
-        try:
-            socket.inet_pton(socket.AF_INET6, ip)
-        except:
-            return -1
-        else:
-            return 1
-    else:
-        return 0
+
+    address = typedaddress.parse(ip)
+    if address is None:
+        return -1
+
+    return 0 if address.is_ipv4 else 1
+
+
+def _address_value(ip, family):
+    # Raises as socket.inet_pton does for a string of another family
+    address = typedaddress.parse(ip)
+    if address is None or address.family != family:
+        raise socket.error("illegal IP address string passed to inet_pton")
+
+    return address.value
 
 
 def ip2int(ip):
-    return struct.unpack("!I", socket.inet_pton(socket.AF_INET, ip))[0]
+    return _address_value(ip, typedaddress.IPV4)
 
 
 def ipv6_to_int(ip):
-    tup1, tup2 = struct.unpack("!QQ", socket.inet_pton(socket.AF_INET6, ip))
-    return (tup1 << 64) | tup2
+    return _address_value(ip, typedaddress.IPV6)
 
 
 def is_valid_ipv4(ip):
@@ -127,40 +129,26 @@ def in6_is_addr_linklocal(ip):
 
 
 def is_valid_netmask(netmask):
-    temp = 0
-    i = 0
-    mask = netmask.split(".", 4)
-    mask.reverse()
-    for byte in mask:
-        temp = temp + (int(byte) << (i * 8))
-        i = i + 1
+    return typedaddress.parse_netmask(netmask) is not None
+
 
-    temp = ~temp + 1
-    if temp < 0:
-        temp = temp + (1 << 32)
-    if ((temp & (temp - 1)) == 0):
-        return True
+def is_valid_net(start_ip, end_ip, netmask):
+    return in_same_net(typedaddress.parse(start_ip),
+                       typedaddress.parse(end_ip),
+                       typedaddress.parse(netmask))
 
-    return False
 
+def is_valid_broadcast_addr(start_ip, netmask, broadcast_ip):
+    return is_broadcast_of(typedaddress.parse(start_ip),
+                           typedaddress.parse(netmask),
+                           typedaddress.parse(broadcast_ip))
 
-def is_valid_net(start_ip, end_ip, netmask):
-    start_ip_int = ip2int(start_ip)
-    end_ip_int = ip2int(end_ip)
-    netmask_int = ip2int(netmask)
 
-    if ((start_ip_int & netmask_int) == (end_ip_int & netmask_int)):
-        return True
-    return False
+def in_same_net(start, end, netmask):
+    return (start.value & netmask.value) == (end.value & netmask.value)
 
 
-def is_valid_broadcast_addr(start_ip, netmask, broadcast_ip):
-    start_ip_int = ip2int(start_ip)
-    netmask_int = ip2int(netmask)
-    broadcast_ip = ip2int(broadcast_ip)
-    expected_broadcast = (start_ip_int | ~netmask_int)
-    if expected_broadcast < 0:
-        expected_broadcast += (1 << 32)
-    if (broadcast_ip == expected_broadcast):
-        return True
-    return False
+def is_broadcast_of(start, netmask, broadcast):
+    expected_broadcast = (start.value | ~netmask.value) & \
+        typedaddress.IPV4_ALL_ONES
+    return broadcast.value == expected_broadcast
@@ -17,9 +17,9 @@
 import re
 
 
+MAC_ADDRESS_RE = re.compile(
+    "[0-9a-f]{2}([:])[0-9a-f]{2}(\\1[0-9a-f]{2}){4}$", re.IGNORECASE)
+
+
 def is_valid_mac_address(mac):
-    if re.match("[0-9a-f]{2}([:])[0-9a-f]{2}(\\1[0-9a-f]{2}){4}$",
-       mac.lower()):
-        return True
-    else:
-        return False
+    return MAC_ADDRESS_RE.match(mac) is not None
@@ -19,28 +19,90 @@ from opsvalidator import error
 from opsvalidator.error import ValidationError
 from opsrest.utils.utils import get_column_data_from_row
 from opsrest.utils import *
+import dhcptftpservervalidations
 from os.path import isabs
 from os.path import isdir
 
+# Bounds of the numeric TFTP tuning keys of System:other_config
+TFTP_SERVER_NUMBER_KEYS = {
+    "tftp_server_max": (1, 65535),
+    "tftp_server_mtu": (576, 65535),
+    "tftp_server_prewarm_budget": (0, 65535),
+}
+TFTP_SERVER_BOOLEAN_KEYS = ("tftp_server_no_blocksize",
+                            "tftp_server_single_port")
+
 
 class DhcpTftpServerValidator(BaseValidator):
     resource = "system"
 
     def validate_modification(self, validation_args):
         system_row = validation_args.resource_row
-        if hasattr(system_row, "other_config"):
+        changed = dhcptftpservervalidations.changed_columns(validation_args)
+        if hasattr(system_row, "other_config") and \
+           dhcptftpservervalidations.is_changed(changed, "other_config"):
             other_config = get_column_data_from_row(system_row, "other_config")
             tftp_server_path_value = other_config.get("tftp_server_path", None)
             if (tftp_server_path_value is not None) and \
+               self.is_tftp_server_path_changed(changed, system_row,
+                                                tftp_server_path_value) and \
                (not self.is_valid_tftp_server_path(tftp_server_path_value)):
                 details = "The directory %s does not exist. " \
                           "Please configure a valid absolute path." \
                           % (tftp_server_path_value)
                 raise ValidationError(error.VERIFICATION_FAILED, details)
 
+            for key, (low, high) in TFTP_SERVER_NUMBER_KEYS.iteritems():
+                value = other_config.get(key, None)
+                if (value is not None) and \
+                   (not self.is_valid_number(value, low, high)):
+                    details = "%s is invalid for %s. It should be between " \
+                              "%d-%d." % (value, key, low, high)
+                    raise ValidationError(error.VERIFICATION_FAILED, details)
+
+            value = other_config.get("tftp_server_port_range", None)
+            if (value is not None) and \
+               (not self.is_valid_port_range(value)):
+                details = "%s is invalid for tftp_server_port_range. It " \
+                          "should be START-END with ports between " \
+                          "1-65535." % (value)
+                raise ValidationError(error.VERIFICATION_FAILED, details)
+
+            for key in TFTP_SERVER_BOOLEAN_KEYS:
+                value = other_config.get(key, None)
+                if (value is not None) and (value not in ("true", "false")):
+                    details = "%s is invalid for %s. It should be true " \
+                              "or false." % (value, key)
+                    raise ValidationError(error.VERIFICATION_FAILED, details)
+
+    def is_tftp_server_path_changed(self, changed, system_row, path):
+        if changed is None:
+            return True
+
+        old_other_config = dhcptftpservervalidations.old_column_data(
+            system_row, "other_config")
+        if old_other_config is None:
+            return True
+
+        return old_other_config.get("tftp_server_path", None) != path
+
     def is_valid_tftp_server_path(self, path):
         if (path is not None) and \
            isabs(path) and isdir(path):
             return True
         else:
             return False
+
+    def is_valid_number(self, value, low, high):
+        if not value.isdigit():
+            return False
+
+        return low <= int(value) <= high
+
+    def is_valid_port_range(self, value):
+        ports = value.split("-")
+        if len(ports) != 2 or \
+           not all(self.is_valid_number(port, 1, 65535) for port in ports):
+            return False
+
+        return int(ports[0]) <= int(ports[1])
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+'''
+Parse-once address layer shared by the DHCP-TFTP validators.
+
+An address string is parsed a single time into an immutable Address
+(family, integer value, prefix length) and kept in a bounded LRU cache, so
+validators can run every check of a row on integers instead of going back
+to socket.inet_pton for each of them.
+'''
+
+import socket
+import struct
+from collections import namedtuple
+
+IPV4 = 4
+IPV6 = 6
+
+IPV4_BITS = 32
+IPV6_BITS = 128
+IPV4_ALL_ONES = (1 << IPV4_BITS) - 1
+
+CACHE_SIZE = 4096
+
+
+class Address(namedtuple("Address", "family value prefix")):
+    '''
+    A parsed IP address or netmask. value is the address as an integer
+    and prefix the number of leading one bits for a netmask, or the full
+    address length for a host address.
+    '''
+    __slots__ = ()
+
+    @property
+    def is_ipv4(self):
+        return self.family == IPV4
+
+    @property
+    def is_ipv6(self):
+        return self.family == IPV6
+
+
+class LRUCache(object):
+    '''
+    Bounded cache keeping the recently used entries. Entries live in two
+    generations of up to size / 2 entries: hits in the old generation are
+    moved to the young one, and when the young generation is full it
+    replaces the old one, dropping the entries unused since. This keeps
+    hits to a single dict lookup, which collections.OrderedDict does not.
+    '''
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.young = {}
+        self.old = {}
+
+    def get(self, key, default=None):
+        value = self.young.get(key, default)
+        if value is default:
+            value = self.old.get(key, default)
+            if value is not default:
+                self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        if len(self.young) >= self.size // 2:
+            self.old = self.young
+            self.young = {}
+        self.young[key] = value
+
+    def clear(self):
+        self.young.clear()
+        self.old.clear()
+
+    def __len__(self):
+        return len(self.young) + len(self.old)
+
+
+# Marks strings that are not addresses, so that they are not reparsed
+INVALID = object()
+
+address_cache = LRUCache()
+netmask_cache = LRUCache()
+
+
+def _parse(text):
+    if ":" not in text:
+        try:
+            return Address(IPV4,
+                           struct.unpack("!I",
+                                         socket.inet_pton(socket.AF_INET,
+                                                          text))[0],
+                           IPV4_BITS)
+        except (socket.error, TypeError, ValueError):
+            return None
+
+    try:
+        high, low = struct.unpack("!QQ",
+                                  socket.inet_pton(socket.AF_INET6, text))
+    except (socket.error, TypeError, ValueError):
+        return None
+    return Address(IPV6, (high << 64) | low, IPV6_BITS)
+
+
+def parse(text):
+    '''
+    Return the Address for an IPv4 or IPv6 address string, or None if it
+    is not one.
+    '''
+    if not isinstance(text, basestring):
+        return None
+
+    address = address_cache.get(text)
+    if address is None:
+        address = _parse(text)
+        address_cache.put(text, INVALID if address is None else address)
+    elif address is INVALID:
+        return None
+
+    return address
+
+
+def parse_netmask(text):
+    '''
+    Return the Address of an IPv4 netmask string with its prefix length,
+    or None if it is not a valid netmask (contiguous leading one bits).
+    '''
+    if not isinstance(text, basestring):
+        return None
+
+    netmask = netmask_cache.get(text)
+    if netmask is None:
+        address = parse(text)
+        netmask = INVALID
+        if address is not None and address.is_ipv4:
+            inverted = (-address.value) & IPV4_ALL_ONES
+            if inverted & (inverted - 1) == 0:
+                prefix = IPV4_BITS - (inverted.bit_length() - 1) \
+                    if inverted else 0
+                netmask = Address(IPV4, address.value, prefix)
+        netmask_cache.put(text, netmask)
+
+    if netmask is INVALID:
+        return None
+
+    return netmask
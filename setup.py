@@ -18,9 +18,14 @@ from setuptools import setup
 setup(
     name='ops_dhcp_tftp',
     version='1.0',
-    py_modules=['ops_dhcp_tftp', 'dhcp_leases', 'dhcp_lease_db'],
+    py_modules=['ops_dhcp_tftp', 'dhcp_leases', 'dhcp_lease_db',
+                'dhcp_lease_analytics', 'dhcp_lease_bulk',
+                'dhcp_lease_stats', 'dhcp_lease_shard', 'tftp_cache',
+                'dnsmasq_log', 'dnsmasq_supervisor', 'dnsmasq_render',
+                'dnsmasq_config', 'idl_snapshot', 'dhcp_tftp_profile'],
     entry_points={
-        'console_scripts': ['ops_dhcp_tftp = ops_dhcp_tftp:main',
-                            'dhcp_leases = dhcp_leases:main']
+        'console_scripts': [
+            'ops_dhcp_tftp = dnsmasq_render:ops_dhcp_tftp_main',
+            'dhcp_leases = dhcp_leases:main']
     }
 )
@@ -677,6 +677,66 @@ static int show_dhcp_bootp(void)
 }
 
 
+static int show_dhcp_settings(void)
+{
+    const struct ovsrec_dhcp_server *row = NULL;
+    const char *buff = NULL;
+
+    row = ovsrec_dhcp_server_first(idl);
+
+    vty_out(vty, "%sDHCP server settings%s",
+                  VTY_NEWLINE, VTY_NEWLINE);
+    vty_out(vty, "--------------------%s",
+                  VTY_NEWLINE);
+
+    if (!row) {
+        vty_out(vty, "DHCP server settings are not configured.%s",
+                      VTY_NEWLINE);
+        vty_out(vty, "%s", VTY_NEWLINE);
+
+        return CMD_SUCCESS;
+    }
+
+    buff = smap_get(&row->other_config, "authoritative");
+    vty_out(vty, "Authoritative : %s%s",
+                  (buff != NULL && strcmp(buff, "true") == 0) ?
+                  "Enabled" : "Disabled", VTY_NEWLINE);
+
+    buff = smap_get(&row->other_config, "no_ping");
+    vty_out(vty, "No ping : %s%s",
+                  (buff != NULL && strcmp(buff, "true") == 0) ?
+                  "Enabled" : "Disabled", VTY_NEWLINE);
+
+    buff = smap_get(&row->other_config, "rapid_commit");
+    vty_out(vty, "Rapid commit : %s%s",
+                  (buff != NULL && strcmp(buff, "true") == 0) ?
+                  "Enabled" : "Disabled", VTY_NEWLINE);
+
+    buff = smap_get(&row->other_config, "quiet_dhcp");
+    vty_out(vty, "Quiet DHCP logging : %s%s",
+                  (buff != NULL && strcmp(buff, "true") == 0) ?
+                  "Enabled" : "Disabled", VTY_NEWLINE);
+
+    buff = smap_get(&row->other_config, "lease_max");
+    if (buff != NULL) {
+        vty_out(vty, "Lease max : %s%s", buff, VTY_NEWLINE);
+    } else {
+        vty_out(vty, "Lease max : Default%s", VTY_NEWLINE);
+    }
+
+    buff = smap_get(&row->other_config, "shards");
+    if (buff != NULL) {
+        vty_out(vty, "Shards : %s%s", buff, VTY_NEWLINE);
+    } else {
+        vty_out(vty, "Shards : Default%s", VTY_NEWLINE);
+    }
+
+    vty_out(vty, "%s", VTY_NEWLINE);
+
+    return CMD_SUCCESS;
+}
+
+
 static int show_dhcp_server(void)
 {
     show_dhcp_range();
@@ -684,6 +744,7 @@ static int show_dhcp_server(void)
     show_dhcp_options();
     show_dhcp_match();
     show_dhcp_bootp();
+    show_dhcp_settings();
     return CMD_SUCCESS;
 }
 
@@ -737,6 +798,66 @@ static int show_tftp_server(void)
                       VTY_NEWLINE);
     }
 
+    buff = NULL;
+    buff = (char *)smap_get(&row->other_config,"tftp_server_max");
+    if (buff != NULL) {
+        vty_out(vty, "TFTP server max connections : %s%s",
+                      buff, VTY_NEWLINE);
+    } else {
+        vty_out(vty, "TFTP server max connections : Default%s",
+                      VTY_NEWLINE);
+    }
+
+    buff = NULL;
+    buff = (char *)smap_get(&row->other_config,"tftp_server_mtu");
+    if (buff != NULL) {
+        vty_out(vty, "TFTP server MTU : %s%s",
+                      buff, VTY_NEWLINE);
+    } else {
+        vty_out(vty, "TFTP server MTU : Default%s",
+                      VTY_NEWLINE);
+    }
+
+    buff = NULL;
+    buff = (char *)smap_get(&row->other_config,"tftp_server_port_range");
+    if (buff != NULL) {
+        vty_out(vty, "TFTP server port range : %s%s",
+                      buff, VTY_NEWLINE);
+    } else {
+        vty_out(vty, "TFTP server port range : Default%s",
+                      VTY_NEWLINE);
+    }
+
+    buff = NULL;
+    buff = (char *)smap_get(&row->other_config,"tftp_server_no_blocksize");
+    if (buff != NULL && strcmp(buff, "true") == 0) {
+        vty_out(vty, "TFTP server no blocksize : Enabled%s",
+                      VTY_NEWLINE);
+    } else {
+        vty_out(vty, "TFTP server no blocksize : Disabled%s",
+                      VTY_NEWLINE);
+    }
+
+    buff = NULL;
+    buff = (char *)smap_get(&row->other_config,"tftp_server_single_port");
+    if (buff != NULL && strcmp(buff, "true") == 0) {
+        vty_out(vty, "TFTP server single port : Enabled%s",
+                      VTY_NEWLINE);
+    } else {
+        vty_out(vty, "TFTP server single port : Disabled%s",
+                      VTY_NEWLINE);
+    }
+
+    buff = NULL;
+    buff = (char *)smap_get(&row->other_config,"tftp_server_prewarm_budget");
+    if (buff != NULL) {
+        vty_out(vty, "TFTP server prewarm budget : %s MB%s",
+                      buff, VTY_NEWLINE);
+    } else {
+        vty_out(vty, "TFTP server prewarm budget : Default%s",
+                      VTY_NEWLINE);
+    }
+
     vty_out(vty, "%s", VTY_NEWLINE);
 
     return CMD_SUCCESS;
@@ -0,0 +1,510 @@
+#!/usr/bin/env python
+# (C) Copyright 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License..
+
+'''
+NOTES:
+ - Index and page cache prewarming of the TFTP root directory, so that
+   the first wave of a PXE boot storm is served from memory instead of
+   cold flash storage.
+ - The index holds the inode, size, mtime and SHA-1 of every file under
+   the TFTP root. Files are hashed in the background, a bounded number of
+   bytes per pass of the daemon main loop, so that indexing never holds
+   up the daemon. A file keeps its hash while its inode, size and mtime
+   do not change, across renames too.
+ - Boot images referenced by the DHCP bootp configuration are prewarmed
+   first, then the other files from the smallest up, until the memory
+   budget is used. Prewarming asks the kernel for readahead with
+   posix_fadvise(WILLNEED). Files read for hashing that do not fit in
+   the budget are dropped from the page cache again.
+ - The index is kept fresh with inotify watches on every directory of
+   the TFTP root. The inotify descriptor is polled from the daemon main
+   loop and only the paths named by the events are looked at again. The
+   whole root is rescanned when the kernel event queue overflowed.
+ - The libc calls are made through ctypes, python 2 has no binding for
+   them. Without them the index still works, prewarming falls back to
+   reading the files and the cache residency is not reported.
+'''
+
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import os
+import stat
+import struct
+from collections import deque
+from collections import namedtuple
+
+import ovs.poller
+import ovs.vlog
+
+vlog = ovs.vlog.Vlog("tftp_cache")
+
+DEFAULT_BUDGET_MB = 64
+
+READ_CHUNK = 1 << 20
+
+# Bytes hashed per pass of the daemon main loop
+HASH_BYTES_PER_RUN = 4 * READ_CHUNK
+
+POSIX_FADV_WILLNEED = 3
+POSIX_FADV_DONTNEED = 4
+
+PROT_READ = 0x1
+MAP_SHARED = 0x1
+MAP_FAILED = ctypes.c_void_p(-1).value
+
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+# wd, mask, cookie, len
+INOTIFY_EVENT = struct.Struct("iIII")
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# sha1 is None until the file is hashed
+IndexEntry = namedtuple("IndexEntry", "inode size mtime sha1")
+
+libc = None
+
+
+def get_libc():
+    '''
+    Load libc with the prototypes of the calls used here, or return None
+    if it is not available.
+    '''
+    global libc
+
+    if libc is None:
+        try:
+            lib = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",
+                              use_errno=True)
+            lib.mmap.restype = ctypes.c_void_p
+            lib.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t,
+                                 ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                 ctypes.c_int64]
+            lib.mmap64 = getattr(lib, "mmap64", lib.mmap)
+            lib.mmap64.restype = ctypes.c_void_p
+            lib.mmap64.argtypes = lib.mmap.argtypes
+            lib.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+            lib.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t,
+                                    ctypes.POINTER(ctypes.c_ubyte)]
+            lib.posix_fadvise64.argtypes = [ctypes.c_int, ctypes.c_int64,
+                                            ctypes.c_int64, ctypes.c_int]
+            lib.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                              ctypes.c_uint32]
+            lib.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        except (OSError, AttributeError):
+            vlog.warn("libc calls unavailable, TFTP prewarm degraded")
+            lib = False
+        libc = lib
+
+    return libc or None
+
+
+def fadvise(fd, advice):
+    lib = get_libc()
+    return lib is not None and lib.posix_fadvise64(fd, 0, 0, advice) == 0
+
+
+def resident_bytes(path, size):
+    '''
+    Number of bytes of the file that are in the page cache, or None if
+    it cannot be told.
+    '''
+    lib = get_libc()
+    if lib is None:
+        return None
+    if size == 0:
+        return 0
+
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+
+    try:
+        addr = lib.mmap64(None, size, PROT_READ, MAP_SHARED, fd, 0)
+        if addr is None or addr == MAP_FAILED:
+            return None
+        try:
+            pages = (size + PAGE_SIZE - 1) // PAGE_SIZE
+            vec = (ctypes.c_ubyte * pages)()
+            if lib.mincore(addr, size, vec) != 0:
+                return None
+            return min(size, sum(b & 1 for b in vec) * PAGE_SIZE)
+        finally:
+            lib.munmap(addr, size)
+    finally:
+        os.close(fd)
+
+
+def prewarm_file(path):
+    '''
+    Start reading the file into the page cache.
+    '''
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return False
+
+    try:
+        if fadvise(fd, POSIX_FADV_WILLNEED):
+            return True
+        while os.read(fd, READ_CHUNK):
+            pass
+        return True
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
+
+def drop_file(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        fadvise(fd, POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+class TftpCache(object):
+    def __init__(self):
+        self.root = None
+        self.budget = DEFAULT_BUDGET_MB << 20
+        self.hot_files = []
+        # Path relative to the root -> IndexEntry
+        self.index = {}
+        self.warm = set()
+        self.warm_bytes = 0
+        self.inotify_fd = None
+        # Watched directory -> watch descriptor, and back
+        self.watches = {}
+        self.watched = {}
+        # Paths to hash, and the path, entry, file and SHA-1 being hashed
+        self.pending = deque()
+        self.hashing = None
+
+    def configure(self, root, budget, hot_files):
+        '''
+        Index and prewarm the TFTP root with a budget in bytes and the
+        boot image paths to prewarm first. A None root disables the cache.
+        '''
+        if root != self.root:
+            self.close()
+            self.root = root
+            self.budget = budget
+            self.hot_files = [self.relative_path(path) for path in hot_files]
+            if root is not None and os.path.isdir(root):
+                self.open_inotify()
+                self.refresh()
+            return
+
+        hot_files = [self.relative_path(path) for path in hot_files]
+        if budget != self.budget or hot_files != self.hot_files:
+            self.budget = budget
+            self.hot_files = hot_files
+            self.prewarm(set())
+
+    def relative_path(self, path):
+        if self.root is not None and os.path.isabs(path):
+            return os.path.relpath(path, self.root)
+        return os.path.normpath(path)
+
+    def open_inotify(self):
+        lib = get_libc()
+        if lib is None:
+            return
+
+        fd = lib.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            vlog.warn("inotify_init1 failed: %s"
+                      % os.strerror(ctypes.get_errno()))
+            return
+        self.inotify_fd = fd
+
+    def watch(self, directory):
+        if self.inotify_fd is None or directory in self.watches:
+            return
+
+        wd = get_libc().inotify_add_watch(self.inotify_fd, directory,
+                                          WATCH_MASK)
+        if wd < 0:
+            vlog.warn("cannot watch %s: %s"
+                      % (directory, os.strerror(ctypes.get_errno())))
+            return
+        self.watches[directory] = wd
+        self.watched[wd] = directory
+
+    def unwatch(self, directory):
+        wd = self.watches.pop(directory)
+        if self.watched.get(wd) == directory:
+            del self.watched[wd]
+        # The watch is already gone when the directory was deleted
+        get_libc().inotify_rm_watch(self.inotify_fd, wd)
+
+    def refresh(self):
+        '''
+        Rescan the whole TFTP root.
+        '''
+        changed = self.update([self.root])
+        vlog.info("TFTP root %s indexed: %d files, %d to hash, %d bytes "
+                  "prewarmed" % (self.root, len(self.index), len(changed),
+                                 self.warm_bytes))
+
+    def update(self, paths):
+        '''
+        Bring the index up to date for the paths, files or directory trees,
+        and prewarm the files that changed. Returns the paths of the files
+        queued for hashing.
+        '''
+        # Entries dropped, by inode, size and mtime, for a file moved
+        # elsewhere to keep its hash
+        removed = {}
+        for path in paths:
+            rel = self.relative_path(path)
+            if rel == os.curdir:
+                paths_under = list(self.index)
+            else:
+                prefix = rel + os.sep
+                paths_under = [p for p in self.index if p.startswith(prefix)]
+                if rel in self.index:
+                    paths_under.append(rel)
+            for p in paths_under:
+                entry = self.index.pop(p)
+                removed[entry[:3]] = entry.sha1
+
+            # Watches are dropped before any is added, a directory renamed
+            # within the root gets the watch descriptor back
+            for directory in list(self.watches):
+                if (directory == path or
+                    directory.startswith(path.rstrip(os.sep) + os.sep)) \
+                   and not os.path.isdir(directory):
+                    self.unwatch(directory)
+
+        changed = set()
+        for path in paths:
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                for directory, _, files in os.walk(path):
+                    self.watch(directory)
+                    for name in files:
+                        self.add(os.path.join(directory, name), removed,
+                                 changed)
+            elif stat.S_ISREG(st.st_mode):
+                self.add(path, removed, changed)
+
+        self.prewarm(changed)
+        return changed
+
+    def add(self, path, removed, changed):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        if not stat.S_ISREG(st.st_mode):
+            return
+
+        rel = os.path.relpath(path, self.root)
+        key = (st.st_ino, st.st_size, st.st_mtime)
+        entry = IndexEntry(st.st_ino, st.st_size, st.st_mtime,
+                           removed.get(key))
+        self.index[rel] = entry
+        if entry.sha1 is None:
+            self.pending.append(rel)
+            changed.add(rel)
+
+    def hash_pending(self, budget=HASH_BYTES_PER_RUN):
+        '''
+        Hash the files queued by the index updates, reading up to about
+        budget bytes. A file is dropped from the page cache once hashed
+        unless it is kept warm.
+        '''
+        while budget > 0 and (self.hashing is not None or self.pending):
+            if self.hashing is None:
+                rel = self.pending.popleft()
+                entry = self.index.get(rel)
+                if entry is None or entry.sha1 is not None:
+                    continue
+                try:
+                    f = open(os.path.join(self.root, rel), "rb")
+                except IOError:
+                    continue
+                self.hashing = (rel, entry, f, hashlib.sha1())
+
+            rel, entry, f, sha1 = self.hashing
+            try:
+                data = f.read(READ_CHUNK)
+            except IOError:
+                data = None
+            if data:
+                sha1.update(data)
+                budget -= len(data)
+                continue
+
+            f.close()
+            self.hashing = None
+            # A file changed since it was queued is queued again
+            if data is not None and self.index.get(rel) is entry:
+                self.index[rel] = entry._replace(sha1=sha1.hexdigest())
+                if rel not in self.warm:
+                    drop_file(os.path.join(self.root, rel))
+
+    def prewarm(self, changed):
+        '''
+        Prewarm the hot boot images, then the smallest files, within the
+        budget. The files already warm are only prewarmed again if they
+        are in changed.
+        '''
+        hot = [path for path in self.hot_files if path in self.index]
+        others = sorted((path for path in self.index if path not in hot),
+                        key=lambda path: (self.index[path].size, path))
+
+        warm = set()
+        used = 0
+        for path in hot + others:
+            size = self.index[path].size
+            if used + size > self.budget:
+                continue
+            if (path in self.warm and path not in changed) or \
+               prewarm_file(os.path.join(self.root, path)):
+                warm.add(path)
+                used += size
+
+        self.warm = warm
+        self.warm_bytes = used
+
+    def wait(self, poller):
+        if self.inotify_fd is not None:
+            poller.fd_wait(self.inotify_fd, ovs.poller.POLLIN)
+        if self.hashing is not None or self.pending:
+            poller.immediate_wake()
+
+    def run(self):
+        '''
+        Consume the pending inotify events, update the index for the
+        paths they name and hash some of the files queued.
+        '''
+        events = 0
+        overflow = False
+        paths = set()
+        while self.inotify_fd is not None:
+            try:
+                data = os.read(self.inotify_fd, 64 * 1024)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EINTR):
+                    break
+                raise
+            if not data:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset:offset + length].rstrip("\0")
+                offset += length
+                events += 1
+
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                directory = self.watched.get(wd)
+                if directory is None:
+                    continue
+                if name:
+                    paths.add(os.path.join(directory, name))
+                elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    paths.add(directory)
+
+        if events:
+            vlog.dbg("TFTP root %s: %d inotify events, %d paths"
+                     % (self.root, events, len(paths)))
+        if overflow:
+            self.refresh()
+        elif paths:
+            self.update(paths)
+
+        self.hash_pending()
+
+    def close(self):
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+        if self.hashing is not None:
+            self.hashing[2].close()
+        self.inotify_fd = None
+        self.watches = {}
+        self.watched = {}
+        self.pending = deque()
+        self.hashing = None
+        self.index = {}
+        self.warm = set()
+        self.warm_bytes = 0
+
+    def report(self):
+        '''
+        Text report of the index with the cached and cold bytes.
+        '''
+        if self.root is None:
+            return "TFTP cache disabled\n"
+
+        lines = []
+        cached = 0
+        total = 0
+        unknown = False
+        for path in sorted(self.index):
+            entry = self.index[path]
+            resident = resident_bytes(os.path.join(self.root, path),
+                                      entry.size)
+            total += entry.size
+            if resident is None:
+                unknown = True
+            else:
+                cached += resident
+            lines.append("%-40s %12d %12s %4s %s"
+                         % (path, entry.size,
+                            "-" if resident is None else resident,
+                            "warm" if path in self.warm else "",
+                            entry.sha1 or "pending"))
+
+        header = ["TFTP root: %s" % self.root,
+                  "Files: %d, watched directories: %d"
+                  % (len(self.index), len(self.watches)),
+                  "Prewarm budget: %d bytes, prewarmed: %d files, %d bytes"
+                  % (self.budget, len(self.warm), self.warm_bytes)]
+        if unknown:
+            header.append("Cached bytes: unknown")
+        else:
+            header.append("Cached bytes: %d" % cached)
+            header.append("Cold bytes: %d" % (total - cached))
+        header.append("%-40s %12s %12s %4s %s"
+                      % ("File", "Size", "Cached", "", "SHA-1"))
+
+        return "\n".join(header + lines) + "\n"